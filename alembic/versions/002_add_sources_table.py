@@ -0,0 +1,46 @@
+"""Add sources table
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Таблица могла быть создана раньше через Base.metadata.create_all
+    if sa.inspect(op.get_bind()).has_table('sources'):
+        return
+
+    op.create_table(
+        'sources',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_type', sa.String(length=50), nullable=False),
+        sa.Column('title', sa.String(length=500), nullable=False),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('url', sa.String(length=1000), nullable=True),
+        sa.Column('published_at', sa.DateTime(), nullable=True),
+        sa.Column('collected_at', sa.DateTime(), nullable=True),
+        sa.Column('used', sa.Boolean(), nullable=True),
+        sa.Column('relevance_score', sa.Float(), nullable=True),
+        sa.Column('extra_data', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('url')
+    )
+    op.create_index('ix_sources_id', 'sources', ['id'])
+
+
+def downgrade() -> None:
+    # Таблица sources есть в моделях с первой версии и обычно создана
+    # через create_all, а не этой миграцией (upgrade её тогда пропускает).
+    # Понять, кто её создал, откат не может, поэтому данные не трогаем.
+    pass
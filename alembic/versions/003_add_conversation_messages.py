@@ -0,0 +1,67 @@
+"""Add conversation_messages table
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversation_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('conversation_id', sa.Integer(), nullable=False),
+        sa.Column('role', sa.String(length=20), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_conversation_messages_conversation_id_id',
+        'conversation_messages',
+        ['conversation_id', 'id']
+    )
+
+    # Переносим историю из JSON-массива conversations.messages построчно,
+    # сохраняя порядок сообщений
+    op.execute("""
+        INSERT INTO conversation_messages (conversation_id, role, content, created_at)
+        SELECT c.id,
+               COALESCE(m.value->>'role', 'user'),
+               COALESCE(m.value->>'content', ''),
+               c.updated_at
+        FROM conversations c
+        CROSS JOIN LATERAL json_array_elements(
+            CASE WHEN json_typeof(c.messages) = 'array' THEN c.messages ELSE '[]'::json END
+        ) WITH ORDINALITY AS m(value, position)
+        ORDER BY c.id, m.position
+    """)
+    op.execute("UPDATE conversations SET messages = '[]'::json")
+
+
+def downgrade() -> None:
+    # Собираем историю обратно в JSON-массив
+    op.execute("""
+        UPDATE conversations c
+        SET messages = COALESCE(
+            (
+                SELECT json_agg(json_build_object('role', cm.role, 'content', cm.content) ORDER BY cm.id)
+                FROM conversation_messages cm
+                WHERE cm.conversation_id = c.id
+            ),
+            '[]'::json
+        )
+    """)
+
+    op.drop_index('ix_conversation_messages_conversation_id_id', table_name='conversation_messages')
+    op.drop_table('conversation_messages')
@@ -3,17 +3,24 @@ AI Content Agent для генерации постов через Claude API
 """
 import re
 import json
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, AsyncIterator, Awaitable, Callable
 
 import httpx
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 
 from app.config import settings
+from app.utils.cache import SQLiteCache
+from app.utils.dedup import create_index
 from app.utils.prompts import (
     SYSTEM_PROMPT,
+    CONTENT_GENERATION_SYSTEM_PROMPT,
     CONTENT_GENERATION_PROMPT,
     RELEVANCE_EVALUATION_PROMPT,
+    RELEVANCE_BATCH_EVALUATION_PROMPT,
     AUTHOR_EXPERIENCE_EXAMPLES,
     REALISTIC_NUMBERS_GUIDE,
     POST_TYPE_PROMPTS,
@@ -21,40 +28,252 @@ from app.utils.prompts import (
 
 logger = logging.getLogger(__name__)
 
+# Версия промптов оценки входит в ключ кэша: после изменения промпта старые
+# оценки не находятся и со временем вытесняются по LRU/TTL
+RELEVANCE_PROMPT_VERSION = hashlib.sha256(
+    (RELEVANCE_EVALUATION_PROMPT + RELEVANCE_BATCH_EVALUATION_PROMPT).encode("utf-8")
+).hexdigest()[:16]
+
+_relevance_cache: Optional[SQLiteCache] = None
+
+
+def get_relevance_cache() -> Optional[SQLiteCache]:
+    """Общий дисковый кэш оценок релевантности (None, если кэш выключен)"""
+    global _relevance_cache
+    if not settings.relevance_cache_enabled:
+        return None
+    if _relevance_cache is None:
+        _relevance_cache = SQLiteCache(
+            path=settings.base_dir / settings.relevance_cache_path,
+            namespace="relevance",
+            max_entries=settings.relevance_cache_max_entries
+        )
+    return _relevance_cache
+
+
+# Вступительные фразы Claude перед постом ("Вот пост:", "Конечно! ...:")
+PREAMBLE_PATTERN = re.compile(
+    r"^(Вот что я написал|Вот пост|Готово|Конечно|Хорошо).{0,100}?:\s*$",
+    re.IGNORECASE
+)
+LABEL_PATTERN = re.compile(
+    r"^(ПОСТ|POST|КОНТЕНТ|CONTENT|ТЕГИ|TAGS|ИСТОЧНИКИ|SOURCES|ХЕШТЕГИ):\s*",
+    re.IGNORECASE
+)
+
+
+class GenerationAborted(Exception):
+    """Потоковая генерация прервана ранней проверкой"""
+
+
+class _IncrementalCleaner:
+    """
+    Построчная очистка потока текста
+
+    Повторяет правила _clean_post на уровне строк: готовые строки чистятся
+    и отдаются сразу, незаконченная ждёт следующих дельт. Заодно проверяет
+    поток: длина сверх max_length или вступление (при abort_on_preamble)
+    прерывают генерацию исключением GenerationAborted.
+    """
+
+    def __init__(self, max_length: int, abort_on_preamble: bool = False):
+        self.max_length = max_length
+        self.abort_on_preamble = abort_on_preamble
+        self.raw = ""
+        self.length = 0
+        self.usage = None
+        self._buffer = ""
+        self._started = False
+        self._blank_pending = False
+
+    def feed(self, delta: str) -> List[str]:
+        """Принять дельту, вернуть очищенные готовые строки"""
+        self.raw += delta
+        self._buffer += delta
+
+        chunks = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            chunk = self._clean_line(line)
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def finish(self) -> List[str]:
+        """Дочистить хвост после окончания потока"""
+        line, self._buffer = self._buffer, ""
+        chunk = self._clean_line(line)
+        return [chunk] if chunk else []
+
+    def _clean_line(self, line: str) -> str:
+        line = re.sub(r"^-+\s*", "", line)
+        line = re.sub(r"\s*-+$", "", line)
+
+        if not self._started:
+            if not line.strip():
+                return ""
+            if PREAMBLE_PATTERN.match(line):
+                if self.abort_on_preamble:
+                    raise GenerationAborted(f"Output starts with a preamble: {line[:50]!r}")
+                return ""
+
+        line = LABEL_PATTERN.sub("", line)
+        if not line.strip():
+            # Несколько пустых строк подряд схлопываются в одну
+            self._blank_pending = self._started
+            return ""
+
+        chunk = ("\n\n" if self._blank_pending else "\n" if self._started else "") + line
+        self._started = True
+        self._blank_pending = False
+
+        self.length += len(chunk)
+        if self.length > self.max_length:
+            raise GenerationAborted(f"Output exceeded {self.max_length} characters")
+        return chunk
+
+
+# Грубая оценка токенов: ~3 символа на токен для смеси кириллицы и латиницы
+CHARS_PER_TOKEN = 3
+MIN_SNIPPET_TOKENS = 40
+RECENCY_HALF_LIFE_DAYS = 7
+
+# Приоритет типов источников при упаковке в промпт
+SOURCE_TYPE_PRIORITY = {
+    'api_docs': 1.0,
+    'exa_news': 0.8,
+    'habr': 0.7,
+    'exa_tech': 0.7,
+    'exa_company': 0.5,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка числа токенов текста без вызова токенизатора"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def rank_source(source: Dict[str, Any]) -> float:
+    """Ранг источника: 0.5 * релевантность + 0.3 * свежесть + 0.2 * приоритет типа"""
+    relevance = source.get('relevance_score')
+    relevance = 0.5 if relevance is None else float(relevance)
+
+    published_at = _parse_published_at(source.get('published_at'))
+    if published_at is None:
+        recency = 0.5
+    else:
+        age_days = max((datetime.now(timezone.utc) - published_at).total_seconds() / 86400, 0.0)
+        recency = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+    priority = SOURCE_TYPE_PRIORITY.get(source.get('source_type'), 0.5)
+    return 0.5 * relevance + 0.3 * recency + 0.2 * priority
+
+
+def _parse_published_at(value: Any) -> Optional[datetime]:
+    """Дата публикации из datetime (Habr) или ISO-строки (Exa)"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def score_post_quality(content: str) -> Dict[str, Any]:
+    """
+    Дешёвая локальная оценка поста по требованиям промпта
+
+    Проверяет длину, наличие конкретных цифр, разделитель ━━━,
+    вопрос к аудитории в конце и 3-5 хештегов.
+
+    Returns:
+        {'score': 0.0-1.0, 'checks': {проверка: 0.0-1.0}}
+    """
+    length = len(content)
+    if settings.min_post_length <= length <= settings.max_post_length:
+        length_score = 1.0
+    else:
+        distance = min(abs(length - settings.min_post_length), abs(length - settings.max_post_length))
+        length_score = max(0.0, 1.0 - distance / settings.max_post_length)
+
+    numbers = re.findall(r'\d+(?:[.,]\d+)?\s*(?:%|₽|руб|час|мин|дн|раз|x|х)', content, re.IGNORECASE)
+    hashtags = re.findall(r'#\w+', content)
+
+    # Вопрос к аудитории — в последних строках перед хештегами (CTA идёт после них)
+    lines = [line.strip() for line in content.splitlines() if line.strip()]
+    first_tag_line = next((i for i, line in enumerate(lines) if line.startswith('#')), len(lines))
+    has_question = any('?' in line for line in lines[max(0, first_tag_line - 3):first_tag_line])
+
+    checks = {
+        'length': length_score,
+        'numbers': min(len(numbers) / 2, 1.0),
+        'divider': 1.0 if '━━━' in content else 0.0,
+        'question': 1.0 if has_question else 0.0,
+        'hashtags': 1.0 if 3 <= len(hashtags) <= 5 else 0.5 if hashtags else 0.0,
+    }
+    weights = {'length': 0.3, 'numbers': 0.2, 'divider': 0.15, 'question': 0.15, 'hashtags': 0.2}
+
+    return {
+        'score': sum(checks[name] * weight for name, weight in weights.items()),
+        'checks': checks,
+    }
+
 
 class ContentGenerator:
     """Генератор контента с использованием Claude API"""
 
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        relevance_cache: Optional[SQLiteCache] = None
+    ):
         """
         Инициализация Content Generator
 
         Args:
             api_key: API ключ Anthropic (если None, берётся из настроек)
             model: Модель Claude (если None, берётся из настроек)
+            relevance_cache: Кэш оценок релевантности (если None, общий
+                дисковый кэш из настроек)
         """
         self.api_key = api_key or settings.anthropic_api_key
         self.model = model or settings.claude_model
-
-        # Настройка HTTP клиента с proxy
+        self.relevance_cache = relevance_cache if relevance_cache is not None else get_relevance_cache()
+
+        # Асинхронный HTTP клиент с пулом соединений и proxy:
+        # генерация не блокирует event loop, общий с ботами и планировщиком
+        client_kwargs = {
+            'timeout': 60.0,
+            'limits': httpx.Limits(
+                max_connections=settings.claude_max_connections,
+                max_keepalive_connections=settings.claude_max_connections
+            ),
+        }
         proxy_url = settings.proxy_url
         if proxy_url:
             logger.info(f"Using proxy: {proxy_url.split('@')[-1]}")
             # httpx 0.28+ использует proxy=, более ранние версии - proxies=
             try:
-                http_client = httpx.Client(proxy=proxy_url, timeout=60.0)
+                http_client = httpx.AsyncClient(proxy=proxy_url, **client_kwargs)
             except TypeError:
-                http_client = httpx.Client(proxies=proxy_url, timeout=60.0)
+                http_client = httpx.AsyncClient(proxies=proxy_url, **client_kwargs)
         else:
-            http_client = httpx.Client(timeout=60.0)
+            http_client = httpx.AsyncClient(**client_kwargs)
 
-        self.client = Anthropic(
+        self.client = AsyncAnthropic(
             api_key=self.api_key,
             http_client=http_client
         )
 
         logger.info(f"ContentGenerator initialized with model: {self.model}")
 
+    async def close(self):
+        """Закрыть HTTP клиент"""
+        await self.client.close()
+
     async def generate_post(
         self,
         sources: List[Dict[str, Any]],
@@ -62,7 +281,8 @@ class ContentGenerator:
         topic_instruction: str = "",
         add_cta: bool = False,
         cta_text: str = "",
-        add_personal_experience: bool = False
+        add_personal_experience: bool = False,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
         """
         Генерация поста на основе источников
@@ -74,12 +294,256 @@ class ContentGenerator:
             add_cta: Нужно ли добавлять CTA-блок
             cta_text: Текст CTA-блока
             add_personal_experience: Нужно ли добавлять личный опыт
+            on_delta: Если задан — потоковая генерация, корутина получает
+                очищенные куски текста по мере генерации (живое превью)
 
         Returns:
             Словарь с контентом поста
         """
         logger.info(f"Generating post type '{post_type_key}' from {len(sources)} sources")
 
+        request = self._build_request(
+            sources,
+            post_type_key=post_type_key,
+            topic_instruction=topic_instruction,
+            add_cta=add_cta,
+            cta_text=cta_text,
+            add_personal_experience=add_personal_experience
+        )
+
+        try:
+            raw_text, usage = await self._complete(request, on_delta)
+            logger.info("Post generated successfully")
+            return self._build_post_result(raw_text, sources, usage)
+
+        except Exception as e:
+            logger.error(f"Error generating post: {e}")
+            raise
+
+    async def generate_candidates(
+        self,
+        sources: List[Dict[str, Any]],
+        k: Optional[int] = None,
+        post_type_key: str = "useful",
+        topic_instruction: str = "",
+        add_cta: bool = False,
+        cta_text: str = "",
+        add_personal_experience: bool = False,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Параллельная генерация нескольких вариантов поста
+
+        Все варианты генерируются из одного подготовленного промпта и
+        ранжируются локальными проверками score_post_quality — без
+        дополнительных запросов к LLM. Запись кэша промпта становится
+        доступна только с началом первого ответа, поэтому при включённом
+        claude_prompt_cache первый вариант стримится, а остальные стартуют
+        после его первого куска и читают префикс из кэша (иначе на
+        холодном кэше каждый вариант оплачивал бы свою запись).
+
+        Args:
+            sources: Список источников информации
+            k: Количество вариантов (если None, из настроек)
+            on_delta: Колбэк живого превью — стримится первый вариант
+            Остальные аргументы — как у generate_post
+
+        Returns:
+            Варианты поста по убыванию оценки, оценка в metadata['quality']
+        """
+        k = k or settings.generation_candidates
+        logger.info(f"Generating {k} candidates of post type '{post_type_key}'")
+
+        request = self._build_request(
+            sources,
+            post_type_key=post_type_key,
+            topic_instruction=topic_instruction,
+            add_cta=add_cta,
+            cta_text=cta_text,
+            add_personal_experience=add_personal_experience
+        )
+
+        if settings.claude_prompt_cache and k > 1:
+            warmed = asyncio.Event()
+            first = asyncio.ensure_future(self._complete(request, on_delta, started=warmed))
+            await warmed.wait()
+            results = await asyncio.gather(
+                first,
+                *(self._complete(request) for _ in range(k - 1)),
+                return_exceptions=True
+            )
+        else:
+            results = await asyncio.gather(
+                *(self._complete(request, on_delta if i == 0 else None) for i in range(k)),
+                return_exceptions=True
+            )
+
+        candidates = []
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error(f"Error generating candidate: {result}")
+                continue
+            raw_text, usage = result
+            post = self._build_post_result(raw_text, sources, usage)
+            post['metadata']['quality'] = score_post_quality(post['content'])
+            candidates.append(post)
+
+        if not candidates:
+            raise results[0]
+
+        candidates.sort(key=lambda post: post['metadata']['quality']['score'], reverse=True)
+        logger.info(
+            f"Generated {len(candidates)}/{k} candidates, scores: "
+            f"{[round(c['metadata']['quality']['score'], 2) for c in candidates]}"
+        )
+        return candidates
+
+    async def _complete(
+        self,
+        request: Dict[str, Any],
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+        started: Optional[asyncio.Event] = None
+    ) -> tuple:
+        """
+        Один запрос генерации: (сырой текст, расход токенов)
+
+        С on_delta или started запрос стримится; started выставляется на
+        первой дельте ответа (или при ошибке, чтобы ожидающие не зависли).
+        """
+        if on_delta is not None or started is not None:
+            # Потоковая генерация с живым превью
+            cleaner = self._create_cleaner()
+            try:
+                async for chunk in self._stream_text(request, cleaner, started):
+                    if on_delta is not None:
+                        await on_delta(chunk)
+            finally:
+                if started is not None:
+                    started.set()
+            return cleaner.raw, self._log_usage(cleaner.usage)
+
+        # Генерация через Claude
+        response = await self.client.messages.create(
+            model=self.model,
+            max_tokens=settings.claude_max_tokens,
+            temperature=settings.claude_temperature,
+            **request
+        )
+        return response.content[0].text, self._log_usage(response.usage)
+
+    async def stream_post(
+        self,
+        sources: List[Dict[str, Any]],
+        post_type_key: str = "useful",
+        topic_instruction: str = "",
+        add_cta: bool = False,
+        cta_text: str = "",
+        add_personal_experience: bool = False,
+        abort_on_preamble: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Потоковая генерация поста
+
+        Отдаёт очищенный текст по мере генерации. Поток обрывается
+        исключением GenerationAborted, если пост явно длиннее допустимого
+        или (при abort_on_preamble) начинается со вступления — запрос
+        закрывается, и лишние токены не оплачиваются.
+
+        Yields:
+            Очищенные куски текста поста
+        """
+        request = self._build_request(
+            sources,
+            post_type_key=post_type_key,
+            topic_instruction=topic_instruction,
+            add_cta=add_cta,
+            cta_text=cta_text,
+            add_personal_experience=add_personal_experience
+        )
+        cleaner = self._create_cleaner(abort_on_preamble)
+
+        async for chunk in self._stream_text(request, cleaner):
+            yield chunk
+
+    def _create_cleaner(self, abort_on_preamble: bool = False) -> _IncrementalCleaner:
+        return _IncrementalCleaner(
+            max_length=int(settings.max_post_length * settings.stream_max_length_factor),
+            abort_on_preamble=abort_on_preamble
+        )
+
+    async def _stream_text(
+        self,
+        request: Dict[str, Any],
+        cleaner: _IncrementalCleaner,
+        started: Optional[asyncio.Event] = None
+    ) -> AsyncIterator[str]:
+        """Стрим ответа Claude через инкрементальную очистку"""
+        # Выход из async with при GenerationAborted закрывает соединение
+        async with self.client.messages.stream(
+            model=self.model,
+            max_tokens=settings.claude_max_tokens,
+            temperature=settings.claude_temperature,
+            **request
+        ) as stream:
+            async for delta in stream.text_stream:
+                if started is not None:
+                    started.set()
+                for chunk in cleaner.feed(delta):
+                    yield chunk
+            message = await stream.get_final_message()
+
+        cleaner.usage = message.usage
+        for chunk in cleaner.finish():
+            yield chunk
+
+    def _build_post_result(
+        self,
+        raw_text: str,
+        sources: List[Dict[str, Any]],
+        usage: Dict[str, int]
+    ) -> Dict[str, Any]:
+        """Очистить ответ модели и собрать словарь поста"""
+        # Очистка поста от служебных меток
+        cleaned_text = self._clean_post(raw_text)
+
+        # Извлекаем теги из текста (хештеги)
+        tags = re.findall(r'#(\w+)', cleaned_text)
+        if not tags:
+            # Генерируем теги из ключевых слов если их нет в посте
+            tags = ['маркетплейсы', 'аналитика', 'автоматизация']
+
+        return {
+            'content': cleaned_text,
+            'tags': tags,
+            'sources': [{'name': s.get('title', ''), 'url': s.get('url', '')} for s in sources[:3]],
+            'metadata': {
+                'raw_output': raw_text,
+                'model': self.model,
+                'sources_count': len(sources),
+                'usage': usage
+            }
+        }
+
+    def _build_request(
+        self,
+        sources: List[Dict[str, Any]],
+        post_type_key: str = "useful",
+        topic_instruction: str = "",
+        add_cta: bool = False,
+        cta_text: str = "",
+        add_personal_experience: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Собрать system и messages для запроса генерации
+
+        Стабильная часть (правила, гайды, промпт типа поста) уходит в system
+        и помечается cache_control — Anthropic кэширует этот префикс, и при
+        повторных генерациях он не обрабатывается заново. Источники, тема и
+        CTA идут небольшим сообщением пользователя.
+
+        Returns:
+            Аргументы system и messages для messages.create
+        """
         # Подготовка текста источников
         sources_text = self._prepare_sources_text(sources)
 
@@ -105,71 +569,90 @@ class ContentGenerator:
         else:
             cta_instruction = "БЕЗ CTA-БЛОКА в конце поста."
 
-        # Формируем промпт с полной структурой
-        prompt = CONTENT_GENERATION_PROMPT.format(
+        system_text = CONTENT_GENERATION_SYSTEM_PROMPT.format(
             system_prompt=SYSTEM_PROMPT,
-            author_experience_examples=author_experience_examples,
             realistic_numbers_guide=REALISTIC_NUMBERS_GUIDE,
+            author_experience_examples=author_experience_examples,
+            post_type_prompt=post_type_prompt
+        )
+
+        prompt = CONTENT_GENERATION_PROMPT.format(
             sources=sources_text,
-            post_type_prompt=post_type_prompt,
             topic_instruction=topic_instruction,
             cta_instruction=cta_instruction
         )
 
-        try:
-            # Генерация через Claude
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=settings.claude_max_tokens,
-                temperature=settings.claude_temperature,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-
-            raw_text = response.content[0].text
-            logger.info("Post generated successfully")
-
-            # Очистка поста от служебных меток
-            cleaned_text = self._clean_post(raw_text)
-
-            # Извлекаем теги из текста (хештеги)
-            tags = re.findall(r'#(\w+)', cleaned_text)
-            if not tags:
-                # Генерируем теги из ключевых слов если их нет в посте
-                tags = ['маркетплейсы', 'аналитика', 'автоматизация']
+        if settings.claude_prompt_cache:
+            system = [{"type": "text", "text": system_text, "cache_control": {"type": "ephemeral"}}]
+        else:
+            system = system_text
+
+        return {
+            'system': system,
+            'messages': [
+                {"role": "user", "content": prompt}
+            ]
+        }
+
+    def _log_usage(self, usage: Any) -> Dict[str, int]:
+        """Залогировать расход токенов, включая чтение/запись кэша промпта"""
+        stats = {
+            'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+            'output_tokens': getattr(usage, 'output_tokens', 0) or 0,
+            'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', 0) or 0,
+            'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+        }
+        logger.info(
+            f"Claude usage: input={stats['input_tokens']}, output={stats['output_tokens']}, "
+            f"cache_read={stats['cache_read_input_tokens']}, "
+            f"cache_write={stats['cache_creation_input_tokens']}"
+        )
+        return stats
 
-            return {
-                'content': cleaned_text,
-                'tags': tags,
-                'sources': [{'name': s.get('title', ''), 'url': s.get('url', '')} for s in sources[:3]],
-                'metadata': {
-                    'raw_output': raw_text,
-                    'model': self.model,
-                    'sources_count': len(sources)
-                }
-            }
+    def _prepare_sources_text(self, sources: List[Dict[str, Any]]) -> str:
+        """
+        Подготовка текста источников для промпта
 
-        except Exception as e:
-            logger.error(f"Error generating post: {e}")
-            raise
+        Источники ранжируются (rank_source), почти одинаковые сниппеты
+        отбрасываются (тем же MinHash/LSH, что и при сборе —
+        app/utils/dedup.py), и текст набирается до бюджета
+        settings.sources_token_budget — последний не влезающий сниппет
+        обрезается, остальные пропускаются.
+        """
+        budget = settings.sources_token_budget
+        snippet_chars = settings.source_snippet_chars
+        ranked = sorted(sources, key=rank_source, reverse=True)
 
-    def _prepare_sources_text(self, sources: List[Dict[str, Any]]) -> str:
-        """Подготовка текста источников для промпта"""
         parts = []
+        packed_index = create_index()
+        used_tokens = 0
 
-        for i, source in enumerate(sources, 1):
+        for source in ranked:
             title = source.get('title', 'Без заголовка')
-            content = source.get('content', '')[:500]
+            content = source.get('content', '')[:snippet_chars]
             url = source.get('url', '')
             source_type = source.get('source_type', 'web')
 
-            parts.append(
-                f"{i}. [{source_type}] {title}\n"
-                f"   URL: {url}\n"
-                f"   Контент: {content}...\n"
-            )
-
+            signature = packed_index.hasher.signature(f"{title} {content}")
+            if packed_index.query(signature):
+                continue
+
+            header = f"{len(parts) + 1}. [{source_type}] {title}\n   URL: {url}\n   Контент: "
+            remaining = budget - used_tokens - estimate_tokens(header)
+            if remaining <= 0:
+                break
+            if estimate_tokens(content) > remaining:
+                # Обрезаем сниппет под остаток бюджета, слишком короткий не нужен
+                if remaining < MIN_SNIPPET_TOKENS:
+                    continue
+                content = content[:remaining * CHARS_PER_TOKEN]
+
+            entry = f"{header}{content}...\n"
+            parts.append(entry)
+            packed_index.add(str(len(parts)), signature)
+            used_tokens += estimate_tokens(entry)
+
+        logger.info(f"Packed {len(parts)}/{len(sources)} sources into ~{used_tokens} tokens")
         return "\n".join(parts)
 
     def _clean_post(self, text: str) -> str:
@@ -219,13 +702,18 @@ class ContentGenerator:
         """
         content_preview = content[:500] if len(content) > 500 else content
 
+        cache_key = self._relevance_cache_key(title, content)
+        cached = (await self._get_cached_scores([cache_key])).get(cache_key)
+        if cached is not None:
+            return {**cached, 'is_relevant': cached['relevance_score'] >= min_score}
+
         prompt = RELEVANCE_EVALUATION_PROMPT.format(
             title=title,
             content_preview=content_preview
         )
 
         try:
-            response = self.client.messages.create(
+            response = await self.client.messages.create(
                 model=self.model,
                 max_tokens=500,
                 temperature=0.3,
@@ -240,6 +728,7 @@ class ContentGenerator:
             json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
             if json_match:
                 evaluation = json.loads(json_match.group(0))
+                await self._set_cached_scores({cache_key: evaluation})
                 return evaluation
             else:
                 logger.warning("Could not parse relevance evaluation, returning default")
@@ -257,6 +746,170 @@ class ContentGenerator:
                 'is_relevant': False
             }
 
+    async def score_sources(
+        self,
+        sources: List[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Пакетная оценка релевантности источников
+
+        Источники упаковываются по batch_size в один запрос, пакеты
+        оцениваются параллельно (не больше max_concurrency одновременно).
+        Оценка записывается в relevance_score каждого источника,
+        объяснение — в metadata['relevance_reason']. Если пакет не удалось
+        оценить, у его источников остаётся прежняя оценка.
+
+        Args:
+            sources: Список источников (изменяется на месте)
+            batch_size: Источников в одном запросе (если None, из настроек)
+            max_concurrency: Параллельных запросов (если None, из настроек)
+
+        Returns:
+            Тот же список источников
+        """
+        batch_size = batch_size or settings.relevance_batch_size
+        semaphore = asyncio.Semaphore(max_concurrency or settings.relevance_max_concurrency)
+
+        # Уже оценённые источники берём из кэша (одним запросом), в LLM
+        # уходят только новые
+        keys = [
+            self._relevance_cache_key(source.get('title', ''), source.get('content', ''))
+            for source in sources
+        ]
+        cached_scores = await self._get_cached_scores(keys)
+
+        to_score = []
+        for key, source in zip(keys, sources):
+            cached = cached_scores.get(key)
+            if cached is not None:
+                self._apply_score(source, cached)
+            else:
+                to_score.append((key, source))
+
+        batches = [to_score[i:i + batch_size] for i in range(0, len(to_score), batch_size)]
+        new_scores: Dict[str, Dict[str, Any]] = {}
+
+        async def score_batch(batch: List[tuple]) -> None:
+            async with semaphore:
+                scores = await self._score_batch([source for _, source in batch])
+
+            for i, (key, source) in enumerate(batch, 1):
+                if i in scores:
+                    self._apply_score(source, scores[i])
+                    new_scores[key] = scores[i]
+
+        await asyncio.gather(*(score_batch(batch) for batch in batches))
+        await self._set_cached_scores(new_scores)
+        logger.info(
+            f"Scored {len(sources)} sources: {len(sources) - len(to_score)} from cache, "
+            f"{len(to_score)} in {len(batches)} batches"
+        )
+        return sources
+
+    @staticmethod
+    def _apply_score(source: Dict[str, Any], score: Dict[str, Any]) -> None:
+        """Записать оценку в источник"""
+        source['relevance_score'] = score['relevance_score']
+        source.setdefault('metadata', {})['relevance_reason'] = score.get('reason', '')
+
+    @staticmethod
+    def _relevance_cache_key(title: str, content: str) -> str:
+        """Ключ кэша оценки: (заголовок, начало контента, версия промпта)"""
+        return SQLiteCache.make_key(title, content[:500], RELEVANCE_PROMPT_VERSION)
+
+    async def _get_cached_scores(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Оценки из кэша одним запросом (в пуле потоков, не блокируя event loop)"""
+        if self.relevance_cache is None or not keys:
+            return {}
+        return await asyncio.to_thread(self.relevance_cache.get_many, keys)
+
+    async def _set_cached_scores(self, scores: Dict[str, Dict[str, Any]]) -> None:
+        """Сохранить оценки в кэш одной транзакцией"""
+        items = {
+            key: {'relevance_score': score['relevance_score'], 'reason': score.get('reason', '')}
+            for key, score in scores.items()
+            if 'relevance_score' in score
+        }
+        if self.relevance_cache is None or not items:
+            return
+        await asyncio.to_thread(self.relevance_cache.set_many, items, settings.relevance_cache_ttl)
+
+    async def _score_batch(self, batch: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """Оценить один пакет источников, вернуть {id: оценка}"""
+        sources_text = "\n".join(
+            f"{i}. {source.get('title', 'Без заголовка')}\n"
+            f"   {source.get('content', '')[:500]}\n"
+            for i, source in enumerate(batch, 1)
+        )
+        prompt = RELEVANCE_BATCH_EVALUATION_PROMPT.format(sources=sources_text)
+
+        try:
+            response = await self.client.messages.create(
+                model=self.model,
+                max_tokens=100 + 80 * len(batch),
+                temperature=0.3,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            )
+
+            result_text = response.content[0].text
+
+            # Парсинг JSON-массива из ответа
+            json_match = re.search(r'\[.*\]', result_text, re.DOTALL)
+            if not json_match:
+                logger.warning("Could not parse batch relevance evaluation")
+                return {}
+
+            scores = {}
+            for item in json.loads(json_match.group(0)):
+                try:
+                    score = min(max(float(item['relevance_score']), 0.0), 1.0)
+                    scores[int(item['id'])] = {'relevance_score': score, 'reason': item.get('reason', '')}
+                except (KeyError, TypeError, ValueError):
+                    continue
+            return scores
+
+        except Exception as e:
+            logger.error(f"Error evaluating batch relevance: {e}")
+            return {}
+
+    async def select_sources(
+        self,
+        sources: List[Dict[str, Any]],
+        top_n: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Оценить источники и оставить лучшие для генерации
+
+        Args:
+            sources: Список источников
+            top_n: Сколько источников оставить (если None, из настроек)
+            min_score: Минимальная релевантность (если None, из настроек)
+
+        Returns:
+            Не больше top_n источников по убыванию релевантности. Если ни один
+            не прошёл порог — просто top_n лучших, чтобы было из чего писать.
+        """
+        top_n = top_n or settings.relevance_top_n
+        min_score = settings.min_relevance_score if min_score is None else min_score
+
+        await self.score_sources(sources)
+
+        ranked = sorted(sources, key=lambda s: s.get('relevance_score') or 0.0, reverse=True)
+        relevant = [s for s in ranked if (s.get('relevance_score') or 0.0) >= min_score]
+
+        if not relevant:
+            logger.warning(f"No sources passed relevance threshold {min_score}, using top {top_n}")
+            relevant = ranked
+
+        selected = relevant[:top_n]
+        logger.info(f"Selected {len(selected)} of {len(sources)} sources for generation")
+        return selected
+
 
 # Вспомогательная функция
 
@@ -275,7 +928,10 @@ async def generate_post_from_sources(
         Сгенерированный пост
     """
     generator = ContentGenerator(api_key=api_key)
-    return await generator.generate_post(sources)
+    try:
+        return await generator.generate_post(sources)
+    finally:
+        await generator.close()
 
 
 if __name__ == "__main__":
@@ -300,6 +956,7 @@ if __name__ == "__main__":
 
         generator = ContentGenerator()
         post = await generator.generate_post(example_sources)
+        await generator.close()
 
         print("GENERATED POST:")
         print(post['content'])
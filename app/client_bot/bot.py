@@ -6,12 +6,16 @@ import logging
 from telegram.ext import Application
 
 from app.config import settings
+from app.client_bot.handlers.activity import ACTIVITY_HANDLER_GROUP, get_activity_handler
+from app.client_bot.handlers.rate_limit import RATE_LIMIT_HANDLER_GROUP, get_rate_limit_handler
 from app.client_bot.handlers.start import get_start_handlers
 from app.client_bot.handlers.calculator import get_calculator_handler
 from app.client_bot.handlers.faq import get_faq_handler, get_faq_direct_handlers
 from app.client_bot.handlers.audit import get_audit_handler
 from app.client_bot.handlers.application import get_application_handler
 from app.client_bot.handlers.contact import get_contact_handler
+from app.database.activity import get_activity_buffer
+from app.database.session import dispose_engines
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +34,10 @@ def create_client_bot_application() -> Application:
 
     application = Application.builder().token(token).build()
 
+    # Ограничение частоты и учёт активности — до всех остальных обработчиков
+    application.add_handler(get_rate_limit_handler(), group=RATE_LIMIT_HANDLER_GROUP)
+    application.add_handler(get_activity_handler(), group=ACTIVITY_HANDLER_GROUP)
+
     # ConversationHandlers (порядок важен!)
     application.add_handler(get_calculator_handler())
     application.add_handler(get_faq_handler())
@@ -55,9 +63,12 @@ async def run_client_bot() -> None:
 
     logger.info("Starting client bot...")
 
+    activity_buffer = get_activity_buffer()
+
     await application.initialize()
     await application.start()
     await application.updater.start_polling(drop_pending_updates=True)
+    activity_buffer.start()
 
     logger.info("Client bot is running")
 
@@ -70,7 +81,10 @@ async def run_client_bot() -> None:
     finally:
         await application.updater.stop()
         await application.stop()
+        # Остаток касаний пишем после остановки обработки апдейтов
+        await activity_buffer.stop()
         await application.shutdown()
+        await dispose_engines()
 
 
 if __name__ == "__main__":
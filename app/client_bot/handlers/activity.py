@@ -0,0 +1,77 @@
+"""
+Учёт активности пользователей клиентского бота
+"""
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import ContextTypes, TypeHandler
+
+from app.config import settings
+from app.database.activity import get_activity_buffer
+from app.database.client_crud import get_or_create_user
+from app.database.session import run_in_session
+
+logger = logging.getLogger(__name__)
+
+# Группа раньше остальных обработчиков: видит каждый апдейт и не мешает им
+ACTIVITY_HANDLER_GROUP = -1
+
+# Потолок паузы между попытками регистрации при недоступной БД
+REGISTER_BACKOFF_MAX = 300.0
+
+# Пауза общая на процесс: при упавшей БД ошибаются все пользователи сразу
+_register_failures = 0
+_register_retry_at = 0.0
+
+
+def _registration_paused() -> bool:
+    return time.monotonic() < _register_retry_at
+
+
+def _registration_failed() -> None:
+    """Отложить следующие попытки регистрации (экспоненциально)"""
+    global _register_failures, _register_retry_at
+    backoff = min(settings.activity_register_backoff * 2 ** _register_failures, REGISTER_BACKOFF_MAX)
+    _register_failures += 1
+    _register_retry_at = time.monotonic() + backoff
+
+
+def _registration_succeeded() -> None:
+    global _register_failures, _register_retry_at
+    _register_failures = 0
+    _register_retry_at = 0.0
+
+
+async def track_activity(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Отметить активность пользователя
+
+    При первом апдейте пользователя в процессе он заводится в БД (upsert),
+    дальше last_activity только копится в ActivityBuffer без записи в БД.
+    После ошибки БД регистрация откладывается с нарастающей паузой, чтобы
+    апдейты не ждали каждый раз недоступную базу.
+    """
+    user = update.effective_user
+    if user is None:
+        return
+
+    if (
+        context.user_data is not None
+        and not context.user_data.get('db_registered')
+        and not _registration_paused()
+    ):
+        try:
+            await run_in_session(get_or_create_user, user.id, user.username, user.first_name)
+            context.user_data['db_registered'] = True
+            _registration_succeeded()
+        except Exception as e:
+            _registration_failed()
+            logger.error(f"Error registering user {user.id}: {e}")
+
+    get_activity_buffer().touch(user.id)
+
+
+def get_activity_handler() -> TypeHandler:
+    """Получить обработчик для регистрации (в группе ACTIVITY_HANDLER_GROUP)"""
+    return TypeHandler(Update, track_activity)
@@ -2,6 +2,7 @@
 Обработчик мини-аудита магазина Ozon
 """
 import logging
+from typing import Optional
 
 from telegram import Update
 from telegram.ext import (
@@ -22,21 +23,68 @@ from app.client_bot.services.ozon_parser import (
     extract_seller_id, parse_ozon_seller,
     format_audit_result, OzonParseError
 )
+from app.database.client_crud import get_audits_today, refund_audit, try_consume_audit
+from app.database.session import run_in_session
 
 logger = logging.getLogger(__name__)
 
 AUDIT_WAITING_LINK = 0
 
+# Откуда взят аудит из лимита: из БД или, если БД недоступна, из user_data
+QUOTA_DB = "db"
+QUOTA_MEMORY = "memory"
+
+
+async def _audits_today(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Аудитов пользователя за сегодня (только чтение)"""
+    try:
+        return await run_in_session(get_audits_today, user_id)
+    except Exception as e:
+        logger.error(f"Error reading audit quota for user {user_id}: {e}")
+        return context.user_data.get("audits_today", 0)
+
+
+async def _consume_audit(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> Optional[str]:
+    """
+    Занять аудит из дневного лимита
+
+    Returns:
+        QUOTA_DB / QUOTA_MEMORY — откуда занят аудит, None — лимит исчерпан
+    """
+    limit = settings.audit_daily_limit
+    try:
+        count = await run_in_session(try_consume_audit, user_id, limit)
+        return QUOTA_DB if count is not None else None
+    except Exception as e:
+        logger.error(f"Error consuming audit quota for user {user_id}: {e}")
+
+    audits_today = context.user_data.get("audits_today", 0)
+    if audits_today >= limit:
+        return None
+    context.user_data["audits_today"] = audits_today + 1
+    return QUOTA_MEMORY
+
+
+async def _refund_audit(user_id: int, context: ContextTypes.DEFAULT_TYPE, quota: str) -> None:
+    """Вернуть аудит в лимит, если он не удался"""
+    if quota == QUOTA_MEMORY:
+        context.user_data["audits_today"] = max(context.user_data.get("audits_today", 1) - 1, 0)
+        return
+
+    try:
+        await run_in_session(refund_audit, user_id)
+    except Exception as e:
+        logger.error(f"Error refunding audit for user {user_id}: {e}")
+
 
 async def audit_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Начало аудита — запрос ссылки"""
     query = update.callback_query
     await query.answer()
 
-    audits_today = context.user_data.get("audits_today", 0)
-    limit = settings.audit_daily_limit
+    audits_today = await _audits_today(update.effective_user.id, context)
 
-    if audits_today >= limit:
+    if audits_today >= settings.audit_daily_limit:
         await query.edit_message_text(
             AUDIT_LIMIT_REACHED,
             reply_markup=get_audit_limit_keyboard()
@@ -64,6 +112,17 @@ async def audit_link_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return AUDIT_WAITING_LINK
 
+    # Лимит занимается до парсинга: параллельные запросы не запустят
+    # лишний скрейпинг
+    user_id = update.effective_user.id
+    quota = await _consume_audit(user_id, context)
+    if quota is None:
+        await update.message.reply_text(
+            AUDIT_LIMIT_REACHED,
+            reply_markup=get_audit_limit_keyboard()
+        )
+        return ConversationHandler.END
+
     await update.message.chat.send_action("typing")
 
     try:
@@ -71,8 +130,6 @@ async def audit_link_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
         result_text = format_audit_result(seller_data)
 
-        context.user_data["audits_today"] = context.user_data.get("audits_today", 0) + 1
-
         if "bot_activity" not in context.user_data:
             context.user_data["bot_activity"] = {}
         context.user_data["bot_activity"]["audit_done"] = True
@@ -86,6 +143,7 @@ async def audit_link_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     except OzonParseError as e:
         logger.error(f"Ozon parse error: {e}")
+        await _refund_audit(user_id, context, quota)
         await update.message.reply_text(
             AUDIT_PARSING_ERROR,
             reply_markup=get_audit_result_keyboard()
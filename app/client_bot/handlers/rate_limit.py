@@ -0,0 +1,57 @@
+"""
+Ограничение частоты сообщений пользователей клиентского бота
+"""
+import logging
+import math
+import time
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes, TypeHandler
+
+from app.client_bot.texts.messages import RATE_LIMIT_EXCEEDED
+from app.utils.rate_limiter import get_user_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Группа раньше всех остальных, включая учёт активности: лишние апдейты
+# отбрасываются до любой работы с БД и LLM
+RATE_LIMIT_HANDLER_GROUP = -2
+
+
+async def rate_limit_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Пропустить апдейт или остановить его обработку
+
+    Сверх messages_per_minute_limit апдейты пользователя не доходят до
+    обработчиков. Предупреждение отправляется один раз на период
+    ограничения, чтобы не отвечать на каждое лишнее сообщение.
+    """
+    user = update.effective_user
+    if user is None:
+        return
+
+    allowed, retry_after = await get_user_rate_limiter().allow(str(user.id))
+    if allowed:
+        return
+
+    seconds = max(math.ceil(retry_after), 1)
+    text = RATE_LIMIT_EXCEEDED.format(seconds=seconds)
+
+    if update.callback_query:
+        # На callback нужно ответить в любом случае, иначе кнопка «зависнет»
+        await update.callback_query.answer(text)
+    else:
+        user_data = context.user_data if context.user_data is not None else {}
+        now = time.monotonic()
+        if user_data.get('rate_limit_notified_until', 0.0) <= now:
+            user_data['rate_limit_notified_until'] = now + retry_after
+            if update.effective_message:
+                await update.effective_message.reply_text(text)
+
+    logger.info(f"Rate limit exceeded by user {user.id}, retry in {retry_after:.1f}s")
+    raise ApplicationHandlerStop
+
+
+def get_rate_limit_handler() -> TypeHandler:
+    """Получить обработчик для регистрации (в группе RATE_LIMIT_HANDLER_GROUP)"""
+    return TypeHandler(Update, rate_limit_handler)
@@ -1,16 +1,20 @@
 """
 AI-ответчик для FAQ (Claude API)
 """
+import asyncio
 import logging
 from typing import Optional
 
 import httpx
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 
 from app.config import settings
+from app.client_bot.services.faq_cache import FAQAnswerCache, knowledge_version
+from app.client_bot.services.intent_router import IntentRouter
 from app.client_bot.texts.messages import (
     FAQ_COST, FAQ_TIMELINE, FAQ_MARKETPLACES,
-    FAQ_TECHNICAL, FAQ_WHAT_CAN, FAQ_OFF_TOPIC
+    FAQ_TECHNICAL, FAQ_WHAT_CAN, FAQ_OFF_TOPIC,
+    FAQ_AI_FALLBACK
 )
 
 logger = logging.getLogger(__name__)
@@ -46,27 +50,106 @@ FAQ_KNOWLEDGE_BASE = f"""
 """
 
 
+# Готовые ответы для тем, которые определяет IntentRouter
+INTENT_ANSWERS = {
+    "cost": FAQ_COST,
+    "timeline": FAQ_TIMELINE,
+    "marketplaces": FAQ_MARKETPLACES,
+    "technical": FAQ_TECHNICAL,
+    "what_can": FAQ_WHAT_CAN,
+}
+
+
 class AIResponder:
     """AI-ответчик на вопросы пользователей"""
 
-    def __init__(self):
-        """Инициализация с proxy для Claude API"""
+    def __init__(
+        self,
+        client: Optional[AsyncAnthropic] = None,
+        cache: Optional[FAQAnswerCache] = None,
+        router: Optional[IntentRouter] = None
+    ):
+        """
+        Инициализация асинхронного клиента Claude API (с proxy)
+
+        Args:
+            client: Готовый клиент (если None, создаётся из настроек)
+            cache: Кэш ответов (если None, дисковый из настроек, если он включён)
+            router: Роутер тем FAQ (если None, из настроек, если он включён)
+        """
+        self.client = client or self._create_client()
+        self.model = settings.claude_model
+        self.timeout = settings.faq_ai_timeout
+        self.cache = cache if cache is not None else self._create_cache()
+        self.router = router if router is not None else self._create_router()
+
+        # Общий на процесс лимит параллельных запросов: наплыв вопросов
+        # не съедает соединения и не растягивает очередь к API
+        self._semaphore = asyncio.Semaphore(settings.faq_ai_max_concurrency)
+
+    def _create_client(self) -> AsyncAnthropic:
+        """Асинхронный клиент с пулом соединений: запрос не блокирует polling"""
+        client_kwargs = {
+            'timeout': settings.faq_ai_timeout,
+            'limits': httpx.Limits(
+                max_connections=settings.faq_ai_max_concurrency,
+                max_keepalive_connections=settings.faq_ai_max_concurrency
+            ),
+        }
         proxy_url = settings.proxy_url
         if proxy_url:
-            http_client = httpx.Client(proxy=proxy_url, timeout=60.0)
+            # httpx 0.28+ использует proxy=, более ранние версии - proxies=
+            try:
+                http_client = httpx.AsyncClient(proxy=proxy_url, **client_kwargs)
+            except TypeError:
+                http_client = httpx.AsyncClient(proxies=proxy_url, **client_kwargs)
         else:
-            http_client = httpx.Client(timeout=60.0)
+            http_client = httpx.AsyncClient(**client_kwargs)
 
-        self.client = Anthropic(
+        return AsyncAnthropic(
             api_key=settings.anthropic_api_key,
             http_client=http_client
         )
-        self.model = settings.claude_model
+
+    def _create_cache(self) -> Optional[FAQAnswerCache]:
+        """Кэш ответов, привязанный к текущей базе знаний и модели"""
+        if not settings.faq_cache_enabled:
+            return None
+
+        cache = FAQAnswerCache(
+            version=knowledge_version(FAQ_KNOWLEDGE_BASE, self.model),
+            threshold=settings.faq_cache_threshold,
+            max_entries=settings.faq_cache_max_entries
+        )
+        cache.load(settings.base_dir / settings.faq_cache_file)
+        return cache
+
+    def _create_router(self) -> Optional[IntentRouter]:
+        """Роутер тем FAQ по ключевым словам из data/faq_intents.yaml"""
+        if not settings.intent_router_enabled:
+            return None
+
+        router = IntentRouter(
+            threshold=settings.intent_router_threshold,
+            margin=settings.intent_router_margin
+        )
+        router.load(settings.base_dir / settings.intent_router_file)
+        return router
+
+    async def close(self):
+        """Закрыть HTTP клиент"""
+        await self.client.close()
 
     async def answer_question(self, question: str) -> str:
         """
         Ответить на вопрос пользователя
 
+        Вопрос, уверенно попавший в тему FAQ, получает готовый раздел,
+        похожий на уже заданный — ответ из кэша; оба без обращения к API.
+        Ответ Claude ограничен faq_ai_timeout секундами вместе с ожиданием
+        свободного слота; по истечении пользователь сразу получает
+        FAQ_AI_FALLBACK.
+
         Args:
             question: Вопрос пользователя
 
@@ -76,8 +159,36 @@ class AIResponder:
         if self._is_off_topic(question):
             return FAQ_OFF_TOPIC
 
+        if self.router is not None:
+            intent = self.router.classify(question)
+            if intent in INTENT_ANSWERS:
+                logger.info(f"FAQ question routed to '{intent}': {question[:50]}...")
+                return INTENT_ANSWERS[intent]
+
+        if self.cache is not None:
+            cached = self.cache.get(question)
+            if cached is not None:
+                return cached
+
         try:
-            response = self.client.messages.create(
+            answer = await asyncio.wait_for(self._ask(question), timeout=self.timeout)
+            logger.info(f"AI answered question: {question[:50]}...")
+
+            await self._remember(question, answer)
+            return answer
+
+        except asyncio.TimeoutError:
+            logger.warning(f"AI answer timed out after {self.timeout}s: {question[:50]}...")
+            return FAQ_AI_FALLBACK
+
+        except Exception as e:
+            logger.error(f"AI error: {e}")
+            return "К сожалению, не смог обработать ваш вопрос. Попробуйте переформулировать или оставьте заявку."
+
+    async def _ask(self, question: str) -> str:
+        """Запрос к Claude под общим семафором"""
+        async with self._semaphore:
+            response = await self.client.messages.create(
                 model=self.model,
                 max_tokens=500,
                 temperature=0.3,
@@ -87,14 +198,26 @@ class AIResponder:
                 ]
             )
 
-            answer = response.content[0].text.strip()
-            logger.info(f"AI answered question: {question[:50]}...")
+        return response.content[0].text.strip()
 
-            return answer
+    async def _remember(self, question: str, answer: str) -> None:
+        """
+        Сохранить ответ в кэш (ошибка записи файла не мешает ответу)
 
-        except Exception as e:
-            logger.error(f"AI error: {e}")
-            return "К сожалению, не смог обработать ваш вопрос. Попробуйте переформулировать или оставьте заявку."
+        Снимок берётся в event loop, JSON пишется в пуле потоков.
+        """
+        if self.cache is None:
+            return
+
+        self.cache.set(question, answer)
+        try:
+            await asyncio.to_thread(
+                FAQAnswerCache.write_file,
+                settings.base_dir / settings.faq_cache_file,
+                self.cache.dump()
+            )
+        except OSError as e:
+            logger.warning(f"Could not save FAQ cache: {e}")
 
     def _is_off_topic(self, question: str) -> bool:
         """Проверка на офф-топик"""
@@ -0,0 +1,245 @@
+"""
+Кэш ответов на свободные вопросы FAQ
+
+Большинство вопросов — перефразировки одних и тех же («сколько стоит»,
+«какие сроки»). Вопрос нормализуется (регистр, стоп-слова, грубый
+стемминг) и сравнивается с сохранёнными по косинусу векторов символьных
+n-грамм; достаточно похожий вопрос получает сохранённый ответ без
+обращения к LLM. Похожесть по n-граммам не видит слов, от которых
+зависит ответ («Ozon» / «WB», «1С» / «МойСклад», «можно» / «нельзя»),
+поэтому такие слова (key_terms) обязаны совпасть точно.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = frozenset("""
+а без бы в вам вас ваш ваша ваше ваши во вот вы да для до же за и из или
+к как какая какие каких какое какой ко ли мне мы на над ну о об от по под пожалуйста подскажите
+при про с скажите со то у уже хочу чтобы что это я
+""".split())
+
+# Окончания по убыванию длины: срезается самое длинное подходящее
+SUFFIXES = sorted("""
+ами ями ого его ому ему ыми ими ешь ете ите ают яют ут ют ат ят ет ит ем им
+ой ей ий ый ая яя ое ее ые ие ую юю ом ам ям ах ях ов ев ию ия ье ья ть ти
+а я о е ы и у ю ь й
+""".split(), key=len, reverse=True)
+
+MIN_STEM_LENGTH = 3
+
+# Отрицания (основы): «можно ли» и «нельзя ли» — разные вопросы
+NEGATIONS = frozenset({'не', 'нет', 'ни', 'нельз'})
+
+# Площадки и учётные системы (основы) → одно имя для всех написаний
+ENTITY_ALIASES = {
+    'ozon': 'ozon', 'озон': 'ozon',
+    'wb': 'wb', 'wildberries': 'wb', 'вб': 'wb', 'вайлдберриз': 'wb', 'валдберриз': 'wb',
+    'yandex': 'yandex', 'яндекс': 'yandex',
+    'мегамаркет': 'megamarket', 'megamarket': 'megamarket',
+    'мойсклад': 'moysklad', 'moysklad': 'moysklad',
+    '1с': '1c', '1c': '1c',
+    'битрикс': 'bitrix', 'bitrix': 'bitrix', 'bitrix24': 'bitrix',
+    'amocrm': 'amocrm', 'амо': 'amocrm', 'амосрм': 'amocrm',
+}
+
+# Версия нормализации: входит в knowledge_version, чтобы записи,
+# сохранённые со старыми правилами, не загружались
+NORMALIZATION_VERSION = "2"
+
+
+def stem(word: str) -> str:
+    """Грубый стемминг: срезать окончание, оставив не меньше MIN_STEM_LENGTH букв"""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+    return word
+
+
+def normalize_question(question: str) -> str:
+    """
+    Нормализованный вопрос: нижний регистр, ё → е, без стоп-слов, основы
+    слов, площадки и системы в одном написании (ENTITY_ALIASES)
+    """
+    words = re.findall(r'\w+', question.lower().replace('ё', 'е'))
+    stems = (stem(word) for word in words if word not in STOPWORDS)
+    return " ".join(ENTITY_ALIASES.get(word, word) for word in stems)
+
+
+def key_terms(key: str) -> FrozenSet[str]:
+    """
+    Слова нормализованного вопроса, которые должны совпасть точно
+
+    Латиница (сюда же приводятся площадки и системы), числа и слова с
+    цифрами, отрицания.
+    """
+    terms = set()
+    for word in key.split():
+        if word in NEGATIONS:
+            terms.add('не')
+        elif word.isascii() or any(ch.isdigit() for ch in word):
+            terms.add(word)
+    return frozenset(terms)
+
+
+def char_ngrams(text: str, n: int = 3) -> Counter:
+    """Частоты символьных n-грамм слов (с границами слов)"""
+    grams: Counter = Counter()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+    return grams
+
+
+def cosine(a: Counter, b: Counter, norm_a: float, norm_b: float) -> float:
+    if not norm_a or not norm_b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(count * b[gram] for gram, count in a.items() if gram in b) / (norm_a * norm_b)
+
+
+def knowledge_version(*parts: str) -> str:
+    """Версия базы знаний: при её изменении сохранённые ответы сбрасываются"""
+    return hashlib.sha256("\n".join((NORMALIZATION_VERSION,) + parts).encode("utf-8")).hexdigest()[:16]
+
+
+class FAQAnswerCache:
+    """
+    LRU-кэш ответов с поиском похожих вопросов
+
+    Ключ — нормализованный вопрос. Поиск — линейный проход по векторам
+    n-грамм записей с теми же key_terms: записей немного (max_entries), поэтому это доли
+    миллисекунды. Кэш можно сохранить в JSON вместе с версией базы
+    знаний; файл другой версии при загрузке игнорируется.
+    """
+
+    def __init__(self, version: str, threshold: float = 0.8, max_entries: int = 500):
+        """
+        Args:
+            version: Версия базы знаний (см. knowledge_version)
+            threshold: Минимальное косинусное сходство для попадания
+            max_entries: Максимум записей, старые вытесняются по LRU
+        """
+        self.version = version
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._vectors: Dict[str, Tuple[Counter, float, FrozenSet[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _vector(key: str) -> Tuple[Counter, float, FrozenSet[str]]:
+        grams = char_ngrams(key)
+        return grams, math.sqrt(sum(count * count for count in grams.values())), key_terms(key)
+
+    def get(self, question: str) -> Optional[str]:
+        """Ответ на самый похожий сохранённый вопрос (не ниже порога) или None"""
+        key = normalize_question(question)
+        if not key:
+            return None
+
+        best_key, best_score = None, 0.0
+        if key in self._entries:
+            best_key, best_score = key, 1.0
+        else:
+            grams, norm, terms = self._vector(key)
+            for other, (other_grams, other_norm, other_terms) in self._vectors.items():
+                if other_terms != terms:
+                    continue
+                score = cosine(grams, other_grams, norm, other_norm)
+                if score > best_score:
+                    best_key, best_score = other, score
+
+        if best_key is None or best_score < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(best_key)
+        logger.debug(f"FAQ cache hit ({best_score:.2f}): {question[:50]}")
+        return self._entries[best_key]
+
+    def set(self, question: str, answer: str) -> None:
+        """Сохранить ответ на вопрос"""
+        key = normalize_question(question)
+        if not key:
+            return
+
+        self._entries[key] = answer
+        self._entries.move_to_end(key)
+        self._vectors[key] = self._vector(key)
+        self._evict()
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            del self._vectors[oldest]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._vectors.clear()
+
+    def dump(self) -> Dict[str, Any]:
+        """Снимок записей для сохранения (порядок — от старых к новым)"""
+        return {'version': self.version, 'entries': list(self._entries.items())}
+
+    @staticmethod
+    def write_file(path: Path, data: Dict[str, Any]) -> None:
+        """
+        Атомарно записать снимок в JSON
+
+        Пишется во временный файл рядом и подменяется os.replace: сбой
+        посреди записи не портит сохранённый кэш. Можно вызывать из
+        потока (asyncio.to_thread), снимок от кэша уже не зависит.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def save(self, path: Path) -> None:
+        """Сохранить записи в JSON"""
+        self.write_file(path, self.dump())
+
+    def load(self, path: Path) -> None:
+        """Загрузить записи из JSON, файл другой версии базы знаний игнорируется"""
+        path = Path(path)
+        if not path.exists():
+            return
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read FAQ cache {path}: {e}")
+            return
+
+        if data.get('version') != self.version:
+            logger.info(f"FAQ knowledge base changed, dropping cached answers from {path}")
+            return
+
+        for key, answer in data.get('entries', []):
+            self._entries[key] = answer
+            self._vectors[key] = self._vector(key)
+        self._evict()
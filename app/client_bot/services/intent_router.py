@@ -0,0 +1,149 @@
+"""
+Локальный роутер вопросов FAQ по темам
+
+Вопросы, которые прямо совпадают с готовыми разделами FAQ («сколько
+стоит», «какие сроки»), не нужно отправлять в Claude. Классификатор —
+взвешенные ключевые слова из data/faq_intents.yaml: вес темы — сумма
+весов найденных в вопросе слов. Те же слова («стоит», «дней», «быстро»)
+встречаются и в вопросах про сами маркетплейсы, поэтому одного слова
+мало: нужен второй признак — ещё одно слово темы, слово про наши услуги
+(anchors: «ваш», «интеграция», «сделаете») или вопрос, целиком
+состоящий из слов темы и служебных слов (filler). Неуверенные вопросы
+(ниже порога или почти поровну между двумя темами) роутер не берёт.
+"""
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+
+WordWeights = Tuple[Dict[str, float], Dict[str, float]]
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова вопроса в нижнем регистре (ё → е)"""
+    return re.findall(r'\w+', text.lower().replace('ё', 'е'))
+
+
+def split_words(weights: Dict[str, float]) -> WordWeights:
+    """Разделить слова на точные и префиксы (слово с * на конце)"""
+    exact, prefixes = {}, {}
+    for word, weight in (weights or {}).items():
+        word = word.lower().replace('ё', 'е')
+        if word.endswith('*'):
+            prefixes[word[:-1]] = float(weight)
+        else:
+            exact[word] = float(weight)
+    return exact, prefixes
+
+
+def word_weight(token: str, words: WordWeights) -> float:
+    """Наибольший вес слова среди точных совпадений и префиксов"""
+    exact, prefixes = words
+    weight = exact.get(token, 0.0)
+    for prefix, prefix_weight in prefixes.items():
+        if token.startswith(prefix):
+            weight = max(weight, prefix_weight)
+    return weight
+
+
+class IntentRouter:
+    """Классификатор вопросов по темам FAQ на взвешенных ключевых словах"""
+
+    # Вес второго признака: слова про услуги или вопроса без посторонних слов
+    ANCHOR_WEIGHT = 2.0
+    COVERAGE_WEIGHT = 2.0
+
+    def __init__(self, threshold: float = 3.0, margin: float = 1.0):
+        """
+        Args:
+            threshold: Минимальный вес лучшей темы (выше веса любого одного слова)
+            margin: Минимальный отрыв лучшей темы от второй
+        """
+        self.threshold = threshold
+        self.margin = margin
+        # {тема: ({слово: вес}, {начало слова: вес})}
+        self._keywords: Dict[str, WordWeights] = {}
+        self._anchors: WordWeights = ({}, {})
+        self._filler: WordWeights = ({}, {})
+
+    @property
+    def intents(self) -> List[str]:
+        return list(self._keywords)
+
+    def set_keywords(
+        self,
+        keywords: Dict[str, Dict[str, float]],
+        anchors: Optional[List[str]] = None,
+        filler: Optional[List[str]] = None
+    ) -> None:
+        """
+        Задать ключевые слова тем
+
+        Args:
+            keywords: {тема: {слово: вес}}, слово с * на конце — префикс
+            anchors: Слова про наши услуги («ваш*», «интеграц*»)
+            filler: Служебные слова, не мешающие признаку «вопрос целиком по теме»
+        """
+        self._keywords = {intent: split_words(weights) for intent, weights in keywords.items()}
+        self._anchors = split_words({word: 1 for word in anchors or []})
+        self._filler = split_words({word: 1 for word in filler or []})
+
+    def load(self, path: Path) -> None:
+        """Загрузить темы из YAML (intents: {тема: {keywords: {слово: вес}}})"""
+        path = Path(path)
+        if not path.exists():
+            logger.warning(f"FAQ intents file {path} not found, intent router disabled")
+            return
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+
+        intents = data.get('intents') or {}
+        self.set_keywords(
+            {intent: spec.get('keywords', {}) for intent, spec in intents.items()},
+            anchors=data.get('anchors'),
+            filler=data.get('filler')
+        )
+        logger.info(f"Intent router loaded {len(self._keywords)} intents from {path}")
+
+    def scores(self, question: str) -> List[Tuple[str, float]]:
+        """Вес вопроса по каждой теме, по убыванию"""
+        tokens = set(tokenize(question))
+        anchored = any(word_weight(token, self._anchors) for token in tokens)
+        # Слова, которые не служебные и не про услуги: их должна объяснить тема
+        content = {
+            token for token in tokens
+            if not word_weight(token, self._filler) and not word_weight(token, self._anchors)
+        }
+
+        scored = []
+        for intent, words in self._keywords.items():
+            # Каждое слово вопроса учитывается один раз, с наибольшим весом
+            weights = {token: word_weight(token, words) for token in tokens}
+            score = sum(weights.values())
+            if score:
+                if anchored:
+                    score += self.ANCHOR_WEIGHT
+                if all(weights[token] for token in content):
+                    score += self.COVERAGE_WEIGHT
+            scored.append((intent, score))
+        return sorted(scored, key=lambda item: item[1], reverse=True)
+
+    def classify(self, question: str) -> Optional[str]:
+        """Тема вопроса или None, если роутер не уверен"""
+        scored = self.scores(question)
+        if not scored:
+            return None
+
+        intent, best = scored[0]
+        second = scored[1][1] if len(scored) > 1 else 0.0
+        if best < self.threshold or best - second < self.margin:
+            return None
+
+        logger.debug(f"Intent '{intent}' ({best:g}, margin {best - second:g}): {question[:50]}")
+        return intent
@@ -39,6 +39,9 @@ AUDIT_LIMIT_REACHED = """Вы использовали 2 бесплатных а
 
 Хотите полный анализ всех SKU с мониторингом конкурентов?"""
 
+RATE_LIMIT_EXCEEDED = """Слишком много сообщений подряд.
+Подождите {seconds} сек. и попробуйте снова."""
+
 # Калькулятор экономии времени
 CALC_HOURS_QUESTION = """⏱ Калькулятор экономии времени
 
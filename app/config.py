@@ -24,6 +24,8 @@ class Settings(BaseSettings):
     claude_model: str = "claude-3-haiku-20240307"
     claude_temperature: float = 0.7
     claude_max_tokens: int = 2000
+    claude_max_connections: int = 10
+    claude_prompt_cache: bool = True  # кэшировать стабильный префикс промпта
 
     # Proxy для обхода гео-блокировок
     proxy_url: str | None = None
@@ -39,9 +41,26 @@ class Settings(BaseSettings):
     # Client Bot
     telegram_client_bot_token: str | None = None
 
+    # AI-ответы на вопросы в FAQ клиентского бота
+    faq_ai_max_concurrency: int = 4  # одновременных запросов к Claude на процесс
+    faq_ai_timeout: float = 15.0  # секунд на ответ, включая ожидание в очереди
+    faq_cache_enabled: bool = True  # отвечать на похожие вопросы из кэша без LLM
+    faq_cache_threshold: float = 0.8  # косинусное сходство символьных n-грамм
+    faq_cache_max_entries: int = 500
+    faq_cache_file: str = "data/faq_answer_cache.json"
+    intent_router_enabled: bool = True  # отвечать на типовые вопросы готовыми разделами FAQ
+    intent_router_file: str = "data/faq_intents.yaml"
+    intent_router_threshold: float = 3.0  # минимальный вес темы (одного слова темы мало)
+    intent_router_margin: float = 1.0  # минимальный отрыв от второй темы
+
     # Rate limits
     audit_daily_limit: int = 2
     messages_per_minute_limit: int = 20
+    rate_limit_redis_url: str | None = None  # общий лимит для нескольких процессов (redis://...)
+
+    # Активность пользователей клиентского бота
+    activity_flush_interval: float = 30.0  # секунд между сбросами last_activity в БД
+    activity_register_backoff: float = 5.0  # пауза регистрации после ошибки БД, удваивается до 5 минут
 
     # Telegram API для парсинга
     telegram_api_id: int | None = None
@@ -49,9 +68,36 @@ class Settings(BaseSettings):
 
     # Database
     database_url: str
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800  # секунд до переоткрытия соединения
+    db_statement_timeout_ms: int = 30000  # 0 — без ограничения (только PostgreSQL)
+    db_connect_timeout: int = 5  # секунд на установку соединения, 0 — по умолчанию драйвера (только PostgreSQL)
 
     # Exa API
     exa_api_key: str | None = None
+    exa_timeout: float = 30.0
+    exa_http2: bool = True
+    exa_max_connections: int = 10
+    exa_max_keepalive_connections: int = 5
+    exa_keepalive_expiry: float = 30.0  # секунд держать idle-соединение
+    exa_rate_limit: float = 5.0  # запросов в секунду
+    exa_rate_burst: int = 5
+    exa_cache_enabled: bool = True
+    exa_cache_path: str = "data/exa_cache.sqlite3"
+    exa_cache_max_entries: int = 2000
+    exa_cache_ttl_news: int = 3 * 3600  # секунды
+    exa_cache_ttl_technical: int = 24 * 3600
+    exa_cache_ttl_api_docs: int = 12 * 3600
+    exa_cache_ttl_company: int = 24 * 3600
+
+    # Habr parser
+    habr_max_concurrency: int = 3  # параллельных запросов к habr.com
+    habr_min_request_interval: float = 0.25  # секунд между стартами запросов
+    habr_html_parser: str = "lxml"  # бэкенд BeautifulSoup: lxml или html.parser
+    habr_incremental: bool = False  # conditional GET + только новые статьи
+    habr_state_file: str = "data/habr_crawl_state.json"
 
     # ZenRows Scraper API
     zenrows_api_key: str | None = None
@@ -65,10 +111,35 @@ class Settings(BaseSettings):
     post_generation_hour: int = 10
     publish_delay_minutes: int = 60
 
+    # Source warehouse: сбор источников по parse_schedule_hours, генерация из БД
+    use_source_warehouse: bool = False
+
     # Content Settings
     min_relevance_score: float = 0.7
+    source_max_age_days: int = 7  # глубина сбора и срок годности источников на складе
+    store_collected_sources: bool = True  # сохранять собранные источники в БД (фоновой задачей)
+    relevance_scoring_enabled: bool = True  # оценивать источники перед генерацией
+    relevance_top_n: int = 8  # сколько лучших источников отдавать в генерацию
+    relevance_batch_size: int = 10  # источников в одном запросе оценки
+    relevance_max_concurrency: int = 3  # параллельных запросов оценки
+    relevance_cache_enabled: bool = True
+    relevance_cache_path: str = "data/relevance_cache.sqlite3"
+    relevance_cache_max_entries: int = 5000
+    relevance_cache_ttl: int = 30 * 24 * 3600  # секунды
     max_post_length: int = 800
     min_post_length: int = 400
+    dedup_enabled: bool = True  # отбрасывать почти-дубликаты источников (MinHash)
+    dedup_threshold: float = 0.8  # порог сходства Жаккара
+    dedup_num_perm: int = 64
+    dedup_bands: int = 16
+    dedup_used_index_enabled: bool = True  # не брать источники, похожие на уже использованные
+    dedup_used_index_file: str = "data/used_sources_index.json"
+    dedup_used_index_max_entries: int = 2000
+    sources_token_budget: int = 3000  # токенов на блок источников в промпте
+    source_snippet_chars: int = 500  # максимум символов контента одного источника
+    generation_candidates: int = 1  # вариантов поста за генерацию (>1 — выбор лучшего)
+    stream_max_length_factor: float = 2.0  # обрыв стрима при длине > max_post_length * factor
+    admin_preview_edit_interval: float = 1.5  # секунд между обновлениями живого превью
 
     # Logging
     log_level: str = "INFO"
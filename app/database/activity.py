@@ -0,0 +1,143 @@
+"""
+Write-behind буфер активности пользователей клиентского бота
+
+last_activity — справочное поле, писать его отдельной транзакцией на
+каждый апдейт Telegram дорого. Касания копятся в памяти (по пользователю
+хранится только последнее) и периодически сбрасываются одним UPDATE.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import BigInteger, DateTime, bindparam, column, or_, update, values
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.client_models import BotUser
+from app.database.session import run_in_session
+
+logger = logging.getLogger(__name__)
+
+bot_users = BotUser.__table__
+
+
+class ActivityBuffer:
+    """Буфер касаний last_activity с периодическим сбросом в БД"""
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        """
+        Args:
+            flush_interval: Период сброса в секундах (если None, из настроек)
+        """
+        self.flush_interval = settings.activity_flush_interval if flush_interval is None else flush_interval
+        self._pending: Dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, telegram_id: int, at: Optional[datetime] = None) -> None:
+        """Отметить активность пользователя (без обращения к БД)"""
+        at = at or datetime.now(timezone.utc)
+        previous = self._pending.get(telegram_id)
+        if previous is None or at > previous:
+            self._pending[telegram_id] = at
+
+    def write(self, db: Session, batch: Dict[int, datetime]) -> int:
+        """
+        Записать пачку касаний одним запросом
+
+        PostgreSQL: UPDATE bot_users ... FROM (VALUES ...). Остальные
+        диалекты: executemany того же UPDATE. Более старое время не
+        перезаписывает более новое.
+
+        Returns:
+            Число обновлённых строк
+        """
+        if not batch:
+            return 0
+
+        if db.get_bind().dialect.name == 'postgresql':
+            touches = values(
+                column('telegram_id', BigInteger),
+                column('last_activity', DateTime(timezone=True)),
+                name='touches'
+            ).data(list(batch.items()))
+            stmt = (
+                update(bot_users)
+                .where(bot_users.c.telegram_id == touches.c.telegram_id)
+                .where(or_(
+                    bot_users.c.last_activity.is_(None),
+                    bot_users.c.last_activity < touches.c.last_activity
+                ))
+                .values(last_activity=touches.c.last_activity)
+            )
+            result = db.execute(stmt)
+        else:
+            stmt = (
+                update(bot_users)
+                .where(bot_users.c.telegram_id == bindparam('b_telegram_id'))
+                .where(or_(
+                    bot_users.c.last_activity.is_(None),
+                    bot_users.c.last_activity < bindparam('b_last_activity')
+                ))
+                .values(last_activity=bindparam('b_last_activity'))
+            )
+            result = db.connection().execute(stmt, [
+                {'b_telegram_id': telegram_id, 'b_last_activity': at}
+                for telegram_id, at in batch.items()
+            ])
+
+        db.commit()
+        return result.rowcount
+
+    async def flush(self) -> int:
+        """Сбросить накопленные касания в БД"""
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, {}
+        try:
+            count = await run_in_session(self.write, batch)
+        except Exception as e:
+            # Возвращаем касания в буфер, более свежие не затираем
+            for telegram_id, at in batch.items():
+                self.touch(telegram_id, at)
+            logger.error(f"Error flushing user activity ({len(batch)} users): {e}")
+            return 0
+
+        logger.debug(f"Flushed activity of {len(batch)} users ({count} rows updated)")
+        return count
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Запустить периодический сброс"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить периодический сброс и сбросить остаток"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+_activity_buffer: Optional[ActivityBuffer] = None
+
+
+def get_activity_buffer() -> ActivityBuffer:
+    """Общий буфер активности процесса"""
+    global _activity_buffer
+    if _activity_buffer is None:
+        _activity_buffer = ActivityBuffer()
+    return _activity_buffer
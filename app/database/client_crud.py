@@ -4,9 +4,17 @@ CRUD операции для клиентского бота
 from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
 
+from sqlalchemy import case, delete, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
-from app.database.client_models import BotUser, Lead, Conversation
+from app.database.client_models import BotUser, Lead, Conversation, ConversationMessage
+
+# Диалекты с INSERT ... ON CONFLICT
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
 
 
 def get_or_create_user(
@@ -18,8 +26,17 @@ def get_or_create_user(
     """
     Получить или создать пользователя.
 
-    Если пользователь существует — обновляет username/first_name и last_activity.
-    Если не существует — создаёт нового.
+    Если пользователь существует — обновляет username/first_name, если они
+    изменились. Если не существует — создаёт нового.
+
+    last_activity здесь не обновляется: касания копит ActivityBuffer
+    (app/database/activity.py) и пишет их пачкой.
+
+    На PostgreSQL и SQLite это один запрос INSERT ... ON CONFLICT
+    (telegram_id) DO UPDATE ... RETURNING: без гонки при одновременных
+    апдейтах от нового пользователя. SET без условия (coalesce не даёт
+    затереть имя пустым), поэтому RETURNING всегда отдаёт строку, даже
+    если данные не изменились.
 
     Args:
         db: Сессия SQLAlchemy
@@ -30,6 +47,10 @@ def get_or_create_user(
     Returns:
         BotUser: Объект пользователя
     """
+    dialect = db.get_bind().dialect.name
+    if dialect in UPSERT_INSERTS:
+        return _upsert_user(db, UPSERT_INSERTS[dialect], telegram_id, username, first_name)
+
     user = db.query(BotUser).filter(BotUser.telegram_id == telegram_id).first()
 
     if user is None:
@@ -47,12 +68,45 @@ def get_or_create_user(
             user.username = username
         if first_name and user.first_name != first_name:
             user.first_name = first_name
-        user.last_activity = datetime.now(timezone.utc)
         db.commit()
 
     return user
 
 
+def _upsert_user(
+    db: Session,
+    insert,
+    telegram_id: int,
+    username: Optional[str],
+    first_name: Optional[str]
+) -> BotUser:
+    """Upsert пользователя одним запросом (PostgreSQL / SQLite)"""
+    now = datetime.now(timezone.utc)
+    stmt = insert(BotUser).values(
+        telegram_id=telegram_id,
+        username=username or None,
+        first_name=first_name or None,
+        audits_today=0,
+        last_activity=now,
+        created_at=now
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BotUser.telegram_id],
+        set_={
+            # Пустые username/first_name не затирают сохранённые. SET без
+            # WHERE, чтобы RETURNING всегда отдавал строку: upsert делается
+            # раз на пользователя за процесс, холостая запись дешевле
+            # второго запроса
+            'username': func.coalesce(stmt.excluded.username, BotUser.username),
+            'first_name': func.coalesce(stmt.excluded.first_name, BotUser.first_name),
+        }
+    ).returning(BotUser)
+
+    user = db.scalars(stmt, execution_options={'populate_existing': True}).one()
+    db.commit()
+    return user
+
+
 def can_do_audit(user: BotUser, limit: int = 2) -> bool:
     """
     Проверить, может ли пользователь сделать аудит.
@@ -90,6 +144,90 @@ def increment_audit_count(db: Session, user: BotUser) -> None:
     db.commit()
 
 
+def _is_new_audit_day(now: datetime):
+    """Условие SQL: последний аудит был до начала текущих суток (UTC)"""
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return or_(BotUser.audits_reset_date.is_(None), BotUser.audits_reset_date < day_start)
+
+
+def get_audits_today(db: Session, telegram_id: int) -> int:
+    """
+    Получить число аудитов пользователя за текущие сутки.
+
+    Только чтение — для раннего отказа в интерфейсе. Лимит
+    гарантирует try_consume_audit.
+
+    Args:
+        db: Сессия SQLAlchemy
+        telegram_id: Telegram ID пользователя
+
+    Returns:
+        int: Аудитов сегодня (0, если пользователя нет или наступил новый день)
+    """
+    now = datetime.now(timezone.utc)
+    count = db.scalar(
+        select(case((_is_new_audit_day(now), 0), else_=BotUser.audits_today))
+        .where(BotUser.telegram_id == telegram_id)
+    )
+    return count or 0
+
+
+def try_consume_audit(db: Session, telegram_id: int, limit: int = 2) -> Optional[int]:
+    """
+    Атомарно занять один аудит из дневного лимита.
+
+    Один запрос UPDATE ... WHERE ... RETURNING: на новые сутки счётчик
+    сбрасывается в 1, иначе увеличивается, но только пока он меньше
+    лимита. Параллельные запросы одного пользователя не могут оба пройти
+    проверку. Если пользователя ещё нет в БД, он создаётся.
+
+    Args:
+        db: Сессия SQLAlchemy
+        telegram_id: Telegram ID пользователя
+        limit: Максимум аудитов в день
+
+    Returns:
+        Optional[int]: Номер аудита за сутки или None, если лимит исчерпан
+    """
+    now = datetime.now(timezone.utc)
+    is_new_day = _is_new_audit_day(now)
+    stmt = (
+        update(BotUser)
+        .where(BotUser.telegram_id == telegram_id)
+        .where(or_(is_new_day, BotUser.audits_today < limit))
+        .values(
+            audits_today=case((is_new_day, 1), else_=BotUser.audits_today + 1),
+            audits_reset_date=now
+        )
+        .returning(BotUser.audits_today)
+    )
+
+    count = db.scalar(stmt)
+    if count is None and db.scalar(select(BotUser.id).where(BotUser.telegram_id == telegram_id)) is None:
+        get_or_create_user(db, telegram_id)
+        count = db.scalar(stmt)
+
+    db.commit()
+    return count
+
+
+def refund_audit(db: Session, telegram_id: int) -> None:
+    """
+    Вернуть аудит в дневной лимит (аудит не удался).
+
+    Args:
+        db: Сессия SQLAlchemy
+        telegram_id: Telegram ID пользователя
+    """
+    db.execute(
+        update(BotUser)
+        .where(BotUser.telegram_id == telegram_id)
+        .where(BotUser.audits_today > 0)
+        .values(audits_today=BotUser.audits_today - 1)
+    )
+    db.commit()
+
+
 def create_lead(
     db: Session,
     user_id: int,
@@ -214,6 +352,10 @@ def update_conversation_messages(
     """
     Обновить сообщения диалога.
 
+    Перезаписывает всю историю целиком в conversation_messages (столбец
+    conversations.messages устарел и не заполняется) — для новых реплик
+    используйте append_conversation_message.
+
     Args:
         db: Сессия SQLAlchemy
         conversation_id: ID диалога
@@ -223,22 +365,91 @@ def update_conversation_messages(
     Returns:
         Optional[Conversation]: Обновлённый диалог или None если не найден
     """
-    conversation = (
-        db.query(Conversation)
-        .filter(Conversation.id == conversation_id)
-        .first()
-    )
+    conversation = db.get(Conversation, conversation_id)
+    if conversation is None:
+        return None
 
-    if conversation:
-        conversation.messages = messages
-        if context is not None:
-            conversation.context = context
-        db.commit()
-        db.refresh(conversation)
+    db.execute(delete(ConversationMessage).where(ConversationMessage.conversation_id == conversation_id))
+    db.add_all(
+        ConversationMessage(conversation_id=conversation_id, role=message['role'], content=message['content'])
+        for message in messages
+    )
 
+    conversation.updated_at = datetime.now(timezone.utc)
+    if context is not None:
+        conversation.context = context
+    db.commit()
     return conversation
 
 
+def append_conversation_message(
+    db: Session,
+    conversation_id: int,
+    role: str,
+    content: str,
+    context: Optional[str] = None
+) -> ConversationMessage:
+    """
+    Добавить сообщение в диалог.
+
+    Пишется одна новая строка в conversation_messages, история не
+    перечитывается и не перезаписывается.
+
+    Args:
+        db: Сессия SQLAlchemy
+        conversation_id: ID диалога
+        role: Роль автора ("user" / "assistant")
+        content: Текст сообщения
+        context: Контекст диалога (опционально)
+
+    Returns:
+        ConversationMessage: Добавленное сообщение
+    """
+    message = ConversationMessage(
+        conversation_id=conversation_id,
+        role=role,
+        content=content
+    )
+    db.add(message)
+
+    values = {'updated_at': datetime.now(timezone.utc)}
+    if context is not None:
+        values['context'] = context
+    db.execute(update(Conversation).where(Conversation.id == conversation_id).values(**values))
+
+    db.commit()
+    return message
+
+
+def get_recent_messages(
+    db: Session,
+    conversation_id: int,
+    limit: int = 20
+) -> List[Dict[str, str]]:
+    """
+    Получить последние сообщения диалога для промпта.
+
+    Читается только окно из `limit` последних строк (по индексу
+    conversation_id, id), а не вся история.
+
+    Args:
+        db: Сессия SQLAlchemy
+        conversation_id: ID диалога
+        limit: Сколько последних сообщений вернуть
+
+    Returns:
+        List[Dict]: Сообщения [{"role": ..., "content": ...}] от старых к новым
+    """
+    rows = db.execute(
+        select(ConversationMessage.role, ConversationMessage.content)
+        .where(ConversationMessage.conversation_id == conversation_id)
+        .order_by(ConversationMessage.id.desc())
+        .limit(limit)
+    ).all()
+
+    return [{'role': role, 'content': content} for role, content in reversed(rows)]
+
+
 def get_lead_by_id(db: Session, lead_id: int) -> Optional[Lead]:
     """
     Получить заявку по ID.
@@ -6,7 +6,7 @@ from typing import List, Optional
 
 from sqlalchemy import (
     BigInteger, Column, DateTime, ForeignKey,
-    Integer, String, Text, JSON
+    Index, Integer, String, Text, JSON
 )
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship, Mapped, mapped_column, DeclarativeBase
@@ -83,6 +83,7 @@ class Conversation(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("bot_users.id"), nullable=False)
 
+    # Устаревшее поле: сообщения хранятся построчно в conversation_messages
     messages: Mapped[Optional[dict]] = mapped_column(JSON, default=list)
     context: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
@@ -98,3 +99,27 @@ class Conversation(Base):
 
     # Relationships
     user: Mapped["BotUser"] = relationship("BotUser", back_populates="conversations")
+
+
+class ConversationMessage(Base):
+    """Сообщение диалога (одна строка на реплику, только добавление)"""
+    __tablename__ = "conversation_messages"
+    __table_args__ = (
+        # Окно последних сообщений диалога читается по этому индексу
+        Index("ix_conversation_messages_conversation_id_id", "conversation_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    conversation_id: Mapped[int] = mapped_column(Integer, ForeignKey("conversations.id"), nullable=False)
+
+    role: Mapped[str] = mapped_column(String(20), nullable=False)  # user, assistant
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc)
+    )
+
+    # Relationships (обратной связи у Conversation нет: историю читают окном
+    # через get_recent_messages, а не загрузкой целиком)
+    conversation: Mapped["Conversation"] = relationship("Conversation")
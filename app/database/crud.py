@@ -1,14 +1,24 @@
 """
 CRUD операции для работы с базой данных
 """
-from datetime import datetime, timedelta
+import logging
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional, Dict, Any
 
-from sqlalchemy import and_, desc
+from sqlalchemy import and_, desc, func
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from .models import Source, Post, Schedule, PostStats
 
+logger = logging.getLogger(__name__)
+
+# Строк в одном INSERT при массовой загрузке источников
+SOURCES_UPSERT_CHUNK = 500
+
+# Релевантность неоценённого источника (как default столбца)
+DEFAULT_RELEVANCE = 0.5
+
 
 # === Source CRUD ===
 
@@ -34,7 +44,7 @@ def store_source(
         content=content,
         url=url,
         published_at=published_at,
-        metadata=metadata or {},
+        extra_data=metadata or {},
         relevance_score=relevance_score,
     )
     db.add(source)
@@ -43,11 +53,138 @@ def store_source(
     return source
 
 
-def get_unused_sources(db: Session, limit: int = 10, min_relevance: float = 0.7) -> List[Source]:
-    """Получить неиспользованные источники"""
-    return db.query(Source).filter(
-        and_(Source.used == False, Source.relevance_score >= min_relevance)
-    ).order_by(desc(Source.published_at)).limit(limit).all()
+def store_sources_bulk(db: Session, sources: List[Dict[str, Any]]) -> List[int]:
+    """
+    Сохранить пачку источников одним upsert
+
+    На PostgreSQL и SQLite это INSERT ... ON CONFLICT (url) DO UPDATE
+    ... RETURNING id — один запрос вместо SELECT + INSERT на каждый
+    источник. Уже сохранённые источники обновляются (флаг used не
+    трогается, оценка релевантности не затирается пустой). Источники
+    без URL пропускаются: по ним нельзя определить дубликат.
+
+    Args:
+        db: Сессия БД
+        sources: Источники в формате парсеров (title, content, url,
+            published_at, source_type, relevance_score, metadata)
+
+    Returns:
+        id сохранённых источников
+    """
+    rows = {}
+    for source in sources:
+        url = source.get('url')
+        if not url or url in rows:
+            continue
+        rows[url] = {
+            'source_type': source.get('source_type', 'web'),
+            'title': (source.get('title') or 'Без заголовка')[:500],
+            'content': source.get('content', ''),
+            'url': url,
+            'published_at': _coerce_datetime(source.get('published_at')),
+            'relevance_score': source.get('relevance_score'),
+            'extra_data': source.get('metadata') or {},
+        }
+
+    if not rows:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        insert = postgresql.insert
+    elif dialect == 'sqlite':
+        insert = sqlite.insert
+    else:
+        # Диалект без ON CONFLICT — построчно
+        return [
+            store_source(db, metadata=row.pop('extra_data'), **row).id
+            for row in rows.values()
+        ]
+
+    values = list(rows.values())
+    ids = []
+    for i in range(0, len(values), SOURCES_UPSERT_CHUNK):
+        stmt = insert(Source).values(values[i:i + SOURCES_UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Source.url],
+            set_={
+                'source_type': stmt.excluded.source_type,
+                'title': stmt.excluded.title,
+                'content': stmt.excluded.content,
+                'published_at': func.coalesce(stmt.excluded.published_at, Source.published_at),
+                'relevance_score': func.coalesce(stmt.excluded.relevance_score, Source.relevance_score),
+                'extra_data': stmt.excluded.extra_data,
+            }
+        ).returning(Source.id)
+        ids.extend(db.execute(stmt).scalars().all())
+
+    db.commit()
+    logger.info(f"Stored {len(ids)} sources in {(len(values) - 1) // SOURCES_UPSERT_CHUNK + 1} upsert(s)")
+    return ids
+
+
+def _coerce_datetime(value: Any) -> Optional[datetime]:
+    """Дата публикации из datetime или ISO-строки в naive UTC"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def get_unused_sources(
+    db: Session,
+    limit: int = 10,
+    min_relevance: float = 0.7,
+    max_age_days: Optional[int] = None
+) -> List[Source]:
+    """
+    Получить неиспользованные источники (самые релевантные, затем самые свежие)
+
+    Неоценённые источники (relevance_score NULL: оценка не удалась или
+    выключена) считаются с релевантностью DEFAULT_RELEVANCE. max_age_days
+    отсекает устаревшие по дате публикации (без неё — по дате сбора),
+    иначе старый релевантный источник обходил бы свежие новости.
+    """
+    relevance = func.coalesce(Source.relevance_score, DEFAULT_RELEVANCE)
+    conditions = [Source.used == False, relevance >= min_relevance]
+    if max_age_days is not None:
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=max_age_days)
+        conditions.append(func.coalesce(Source.published_at, Source.collected_at) >= cutoff)
+
+    return db.query(Source).filter(and_(*conditions)).order_by(
+        desc(relevance), desc(Source.published_at)
+    ).limit(limit).all()
+
+
+def mark_sources_used(db: Session, urls: List[str]) -> int:
+    """Отметить источники использованными одним UPDATE, вернуть число строк"""
+    if not urls:
+        return 0
+    count = db.query(Source).filter(Source.url.in_(urls)).update(
+        {Source.used: True}, synchronize_session=False
+    )
+    db.commit()
+    return count
+
+
+def source_to_dict(source: Source) -> Dict[str, Any]:
+    """Источник из БД в формате парсеров"""
+    return {
+        'id': source.id,
+        'title': source.title,
+        'content': source.content or '',
+        'url': source.url,
+        'published_at': source.published_at,
+        'source_type': source.source_type,
+        'relevance_score': source.relevance_score,
+        'metadata': source.extra_data or {},
+    }
 
 
 # === Post CRUD ===
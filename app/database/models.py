@@ -24,7 +24,7 @@ class Source(Base):
     collected_at = Column(DateTime, default=datetime.utcnow)
     used = Column(Boolean, default=False)
     relevance_score = Column(Float, default=0.5)
-    extra_data = Column(JSONB, default={})
+    extra_data = Column(JSON().with_variant(JSONB, "postgresql"), default={})
 
 
 class Post(Base):
@@ -0,0 +1,178 @@
+"""
+Подключение к базе данных
+
+Один пул соединений на процесс для синхронного кода (crud, alembic-скрипты)
+и асинхронный engine (asyncpg / aiosqlite). Сейчас боты и пайплайн ходят
+в БД через run_in_session (синхронный CRUD в пуле потоков);
+get_async_db подготовлен для перевода CRUD на async, но пока не
+используется. Процессы (клиентский бот, пайплайн, планировщик) при
+остановке вызывают dispose_engines.
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, TypeVar
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+
+T = TypeVar("T")
+
+SessionLocal = sessionmaker(autoflush=False, expire_on_commit=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+# run_in_session зовёт get_engine из потоков пула: без блокировки два
+# первых одновременных вызова создали бы два пула
+_engine_lock = threading.Lock()
+
+# Асинхронные драйверы для синхронных URL
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def to_async_url(url: str) -> str:
+    """URL базы с асинхронным драйвером (postgresql → asyncpg, sqlite → aiosqlite)"""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if parsed.get_driver_name() in ('asyncpg', 'aiosqlite') or backend not in ASYNC_DRIVERS:
+        return url
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def engine_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Параметры create_engine из настроек
+
+    Для PostgreSQL — размер пула, overflow, pre-ping, recycle, таймаут
+    подключения и statement_timeout на уровне соединения. SQLite в памяти использует
+    одно общее соединение, иначе каждый поток видел бы свою пустую базу.
+    """
+    parsed = make_url(url)
+
+    if parsed.get_backend_name() == 'sqlite':
+        options: Dict[str, Any] = {'connect_args': {'check_same_thread': False}}
+        if parsed.database in (None, '', ':memory:'):
+            options['poolclass'] = StaticPool
+        return options
+
+    options = {
+        'pool_size': settings.db_pool_size,
+        'max_overflow': settings.db_max_overflow,
+        'pool_pre_ping': settings.db_pool_pre_ping,
+        'pool_recycle': settings.db_pool_recycle,
+    }
+
+    if parsed.get_backend_name() != 'postgresql':
+        return options
+
+    connect_args: Dict[str, Any] = {}
+    if settings.db_connect_timeout:
+        # Недоступный сервер не должен держать запрос до таймаута ОС
+        connect_args['timeout' if is_async else 'connect_timeout'] = settings.db_connect_timeout
+    if settings.db_statement_timeout_ms:
+        timeout = str(settings.db_statement_timeout_ms)
+        if is_async:
+            connect_args['server_settings'] = {'statement_timeout': timeout}
+        else:
+            connect_args['options'] = f'-c statement_timeout={timeout}'
+    if connect_args:
+        options['connect_args'] = connect_args
+
+    return options
+
+
+def get_engine() -> Engine:
+    """Общий engine процесса (создаётся при первом обращении)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(settings.database_url, **engine_options(settings.database_url))
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+
+def get_async_engine() -> AsyncEngine:
+    """Общий асинхронный engine процесса"""
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                url = to_async_url(settings.database_url)
+                engine = create_async_engine(url, **engine_options(url, is_async=True))
+                AsyncSessionLocal.configure(bind=engine)
+                _async_engine = engine
+    return _async_engine
+
+
+@contextmanager
+def get_db() -> Iterator[Session]:
+    """
+    Сессия БД на время блока with
+
+    Коммит вызывающий код делает сам, при исключении транзакция
+    откатывается.
+    """
+    get_engine()
+    db = SessionLocal()
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Асинхронная сессия БД на время блока async with (как get_db)"""
+    get_async_engine()
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
+async def run_in_session(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Выполнить синхронную CRUD-функцию в пуле потоков
+
+    fn вызывается как fn(db, *args, **kwargs) в собственной сессии,
+    event loop при этом не блокируется. Так существующие функции из
+    crud.py и client_crud.py можно звать из хендлеров и пайплайна.
+    """
+    def call() -> T:
+        with get_db() as db:
+            return fn(db, *args, **kwargs)
+
+    return await asyncio.to_thread(call)
+
+
+async def dispose_engines() -> None:
+    """Закрыть пулы соединений (при остановке процесса и в тестах)"""
+    global _engine, _async_engine
+    with _engine_lock:
+        engine, _engine = _engine, None
+        async_engine, _async_engine = _async_engine, None
+    if engine is not None:
+        engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
@@ -3,7 +3,7 @@
 """
 import asyncio
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Awaitable, Callable, Set
 
 from app.config import settings
 from app.parsers.exa_searcher import ExaSearcher
@@ -12,6 +12,9 @@ from app.agents.content_generator import ContentGenerator
 from app.telegram.publisher import TelegramPublisher
 from app.utils.post_types import get_next_post_type, get_post_type_from_plan, mark_post_published, get_rotation_status, can_publish
 from app.utils.content_plan import get_content_plan, get_todays_post, PlannedPost
+from app.database.crud import get_unused_sources, mark_sources_used, source_to_dict, store_sources_bulk
+from app.database.session import dispose_engines, run_in_session
+from app.utils.dedup import filter_near_duplicates, get_used_sources_index, remember_used_sources
 
 # Настройка логирования
 logging.basicConfig(
@@ -26,21 +29,52 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def on_post_published(sources: List[Dict[str, Any]]) -> None:
+    """
+    Запомнить источники опубликованного поста, чтобы не повторять темы
+
+    Вызывается при любой публикации: из пайплайна и при одобрении
+    превью в админ-боте.
+    """
+    if settings.dedup_enabled:
+        try:
+            remember_used_sources(sources)
+        except Exception as e:
+            logger.warning(f"Could not remember used sources: {e}")
+
+    # Отмечаем источники в БД, чтобы склад не отдал их повторно
+    if settings.store_collected_sources or settings.use_source_warehouse:
+        urls = [source['url'] for source in sources if source.get('url')]
+        try:
+            await run_in_session(mark_sources_used, urls)
+        except Exception as e:
+            logger.warning(f"Could not mark sources as used: {e}")
+
+
 class ContentPipeline:
     """Основной пайплайн для сбора, генерации и публикации контента"""
 
-    def __init__(self):
+    def __init__(self, habr_incremental: Optional[bool] = None):
+        """
+        Args:
+            habr_incremental: Инкрементальный краулинг Habr (если None, из настроек).
+                Фоновый сборщик источников включает его, чтобы брать только новые статьи.
+        """
         self.exa_searcher = ExaSearcher()
-        self.habr_parser = HabrParser()
+        self.habr_parser = HabrParser(incremental=habr_incremental)
         self.content_generator = ContentGenerator()
         self.telegram_publisher = TelegramPublisher()
+        # Фоновые сохранения собранных источников (см. collect_sources)
+        self._store_tasks: Set[asyncio.Task] = set()
 
         logger.info("ContentPipeline initialized")
 
     async def collect_sources(
         self,
         keywords: List[str] = None,
-        topic: str = None
+        topic: str = None,
+        store: Optional[bool] = None,
+        wait_for_store: bool = False
     ) -> List[Dict[str, Any]]:
         """
         Сбор источников информации
@@ -48,6 +82,9 @@ class ContentPipeline:
         Args:
             keywords: Ключевые слова из контент-плана (опционально)
             topic: Тема поста из контент-плана (опционально)
+            store: Сохранить собранное в БД (если None, из настроек)
+            wait_for_store: Дождаться сохранения. По умолчанию оно идёт
+                фоновой задачей и генерация (/preview) его не ждёт
 
         Returns:
             Список собранных источников
@@ -110,12 +147,18 @@ class ContentPipeline:
         else:
             logger.info("Skipping API docs collection - using content plan keywords")
 
+        if self.exa_searcher.cache is not None:
+            # stats() считает размер запросом к SQLite — не в event loop
+            stats = await asyncio.to_thread(self.exa_searcher.cache.stats)
+            logger.info(f"Exa cache stats: {stats}")
+
         # Сбор из Habr
         try:
             habr_sources = await self.habr_parser.parse_articles_by_tags(
                 tags=habr_tags,
                 max_articles_per_tag=3,
-                days_back=7
+                days_back=settings.source_max_age_days,
+                save_state=False
             )
             all_sources.extend(habr_sources)
             logger.info(f"Collected {len(habr_sources)} sources from Habr")
@@ -123,13 +166,60 @@ class ContentPipeline:
             logger.error(f"Error collecting from Habr: {e}")
 
         logger.info(f"Total sources collected: {len(all_sources)}")
-        return all_sources
+
+        # Почти-дубликаты (перепечатки, уже использованные в прошлых постах)
+        if settings.dedup_enabled and all_sources:
+            try:
+                all_sources = filter_near_duplicates(all_sources, used_index=get_used_sources_index())
+            except Exception as e:
+                logger.error(f"Error filtering near-duplicates: {e}")
+
+        # Оценка релевантности и отбор лучших источников для генерации
+        selected_sources = all_sources
+        if settings.relevance_scoring_enabled and all_sources:
+            try:
+                selected_sources = await self.content_generator.select_sources(all_sources)
+            except Exception as e:
+                logger.error(f"Error scoring sources: {e}")
+
+        # Сохраняем всю собранную пачку (с оценками) одним upsert
+        store = settings.store_collected_sources if store is None else store
+        if store and all_sources:
+            if wait_for_store:
+                await self._store_sources(list(all_sources))
+            else:
+                task = asyncio.create_task(self._store_sources(list(all_sources)))
+                self._store_tasks.add(task)
+                task.add_done_callback(self._store_tasks.discard)
+        elif self.habr_parser.incremental:
+            self.habr_parser.save_crawl_state()
+
+        return selected_sources
+
+    async def _store_sources(self, sources: List[Dict[str, Any]]) -> bool:
+        """Сохранить источники в БД, после успеха — состояние краулинга Habr"""
+        try:
+            await run_in_session(store_sources_bulk, sources)
+            stored = True
+        except Exception as e:
+            logger.error(f"Error storing sources: {e}")
+            stored = False
+
+        # Водяной знак и ETag Habr фиксируем только после сохранения: иначе
+        # следующий проход получит 304 и потерянные статьи уже не вернутся
+        if self.habr_parser.incremental:
+            if stored:
+                self.habr_parser.save_crawl_state()
+            else:
+                self.habr_parser.discard_crawl_state()
+        return stored
 
     async def generate_and_publish_post(
         self,
         sources: List[Dict[str, Any]],
         publish: bool = True,
-        planned_post: PlannedPost = None
+        planned_post: PlannedPost = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
         """
         Генерация и публикация поста
@@ -138,6 +228,7 @@ class ContentPipeline:
             sources: Список источников
             publish: Публиковать ли сразу (False - только сгенерировать)
             planned_post: Пост из контент-плана (опционально)
+            on_delta: Колбэк потоковой генерации для живого превью (опционально)
 
         Returns:
             Информация о созданном посте
@@ -193,14 +284,22 @@ class ContentPipeline:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 """
 
-            post_data = await self.content_generator.generate_post(
-                sources,
+            generation_kwargs = dict(
                 post_type_key=post_type_key,
                 topic_instruction=topic_instruction,
                 add_cta=post_type_config.get('add_cta', False),
                 cta_text=post_type_config.get('cta', ''),
-                add_personal_experience=post_type_config.get('add_personal_experience', False)
+                add_personal_experience=post_type_config.get('add_personal_experience', False),
+                on_delta=on_delta
             )
+            if settings.generation_candidates > 1:
+                # Несколько вариантов параллельно, лучший — основной,
+                # остальные доступны админу без повторной генерации
+                candidates = await self.content_generator.generate_candidates(sources, **generation_kwargs)
+                post_data = candidates[0]
+                post_data['alternatives'] = [candidate['content'] for candidate in candidates[1:]]
+            else:
+                post_data = await self.content_generator.generate_post(sources, **generation_kwargs)
             logger.info("Post generated successfully")
 
             # Notify admins about new post (if not auto-publishing)
@@ -227,6 +326,7 @@ class ContentPipeline:
                     if result['success']:
                         logger.info(f"Post with poll published. Post ID: {result['post_message_id']}, Poll ID: {result['poll_message_id']}")
                         mark_post_published(post_type_key)
+                        await on_post_published(sources)
 
                         # Notify admins about published post
                         try:
@@ -265,6 +365,7 @@ class ContentPipeline:
                         logger.info(f"Post published. Message ID: {result['message_id']}")
                         # Отмечаем тип поста как опубликованный для ротации
                         mark_post_published(post_type_key)
+                        await on_post_published(sources)
 
                         # Notify admins about published post
                         try:
@@ -303,6 +404,43 @@ class ContentPipeline:
             logger.error(f"Error in post generation/publication: {e}")
             return {'success': False, 'error': str(e)}
 
+    async def load_warehouse_sources(self) -> List[Dict[str, Any]]:
+        """
+        Источники со склада: неиспользованные, не старше source_max_age_days,
+        по убыванию релевантности
+
+        Returns:
+            До relevance_top_n источников (пустой список при ошибке БД)
+        """
+        def load(db) -> List[Dict[str, Any]]:
+            rows = get_unused_sources(
+                db,
+                limit=settings.relevance_top_n,
+                min_relevance=settings.min_relevance_score,
+                max_age_days=settings.source_max_age_days
+            )
+            return [source_to_dict(row) for row in rows]
+
+        try:
+            sources = await run_in_session(load)
+            logger.info(f"Loaded {len(sources)} sources from warehouse")
+            return sources
+        except Exception as e:
+            logger.error(f"Error loading sources from warehouse: {e}")
+            return []
+
+    async def refresh_warehouse(self) -> int:
+        """
+        Фоновый сбор источников на склад (по parse_schedule_hours)
+
+        Returns:
+            Количество отобранных источников
+        """
+        logger.info("=== Refreshing source warehouse ===")
+        # Склад наполняется независимо от store_collected_sources
+        sources = await self.collect_sources(store=True, wait_for_store=True)
+        return len(sources)
+
     async def run_once(self, publish: bool = True, force: bool = False):
         """
         Однократный запуск пайплайна
@@ -328,11 +466,20 @@ class ContentPipeline:
             print(f"\n📅 Пост из контент-плана: {planned_post.topic}")
             print(f"   Тип: {planned_post.type}")
 
+        # Источники со склада (заранее собраны по расписанию). Посту из
+        # контент-плана нужны источники по его ключевым словам — их собираем вживую
+        sources = []
+        if settings.use_source_warehouse and not planned_post:
+            sources = await self.load_warehouse_sources()
+            if not sources:
+                logger.warning("Source warehouse is empty, falling back to live collection")
+
         # Сбор источников (с учётом keywords из плана)
-        sources = await self.collect_sources(
-            keywords=planned_post.keywords if planned_post else None,
-            topic=planned_post.topic if planned_post else None
-        )
+        if not sources:
+            sources = await self.collect_sources(
+                keywords=planned_post.keywords if planned_post else None,
+                topic=planned_post.topic if planned_post else None
+            )
 
         if not sources and not planned_post:
             logger.warning("No sources collected, aborting")
@@ -363,8 +510,12 @@ class ContentPipeline:
         await self.habr_parser.close()
 
     async def close(self):
-        """Закрытие ресурсов"""
+        """Закрытие ресурсов (дожидается фоновых сохранений источников)"""
+        if self._store_tasks:
+            await asyncio.gather(*self._store_tasks)
+        await self.exa_searcher.close()
         await self.habr_parser.close()
+        await self.content_generator.close()
 
 
 async def main():
@@ -376,6 +527,7 @@ async def main():
         await pipeline.run_once(publish=True)
     finally:
         await pipeline.close()
+        await dispose_engines()
 
 
 if __name__ == "__main__":
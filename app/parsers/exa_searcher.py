@@ -10,21 +10,56 @@ import logging
 import httpx
 
 from app.config import settings
+from app.utils.cache import SQLiteCache
+from app.utils.rate_limiter import TokenBucket, get_exa_rate_limiter
 
 logger = logging.getLogger(__name__)
 
+_exa_cache: Optional[SQLiteCache] = None
+
+
+def get_exa_cache() -> Optional[SQLiteCache]:
+    """Общий дисковый кэш ответов Exa (None, если кэш выключен)"""
+    global _exa_cache
+    if not settings.exa_cache_enabled:
+        return None
+    if _exa_cache is None:
+        _exa_cache = SQLiteCache(
+            path=settings.base_dir / settings.exa_cache_path,
+            namespace="exa_search",
+            max_entries=settings.exa_cache_max_entries
+        )
+    return _exa_cache
+
 
 class ExaSearcher:
     """Класс для поиска информации через Exa API"""
 
     BASE_URL = "https://api.exa.ai"
 
-    def __init__(self, api_key: Optional[str] = None):
+    # TTL кэша по типу поиска (секунды)
+    CACHE_TTLS = {
+        "news": settings.exa_cache_ttl_news,
+        "technical": settings.exa_cache_ttl_technical,
+        "api_docs": settings.exa_cache_ttl_api_docs,
+        "company": settings.exa_cache_ttl_company,
+    }
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        cache: Optional[SQLiteCache] = None
+    ):
         """
         Инициализация Exa Searcher
 
         Args:
             api_key: API ключ Exa (если None, берётся из настроек)
+            client: Готовый HTTP клиент (если None, создаётся общий пул соединений)
+            rate_limiter: Лимитер запросов (если None, общий для процесса)
+            cache: Кэш ответов (если None, общий дисковый кэш из настроек)
         """
         self.api_key = api_key or settings.exa_api_key
         if not self.api_key:
@@ -33,6 +68,100 @@ class ExaSearcher:
             "Content-Type": "application/json",
             "x-api-key": self.api_key or ""
         }
+        self.client = client or self._create_client()
+        self.rate_limiter = rate_limiter or get_exa_rate_limiter()
+        self.cache = cache if cache is not None else get_exa_cache()
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """
+        Создать долгоживущий HTTP клиент для Exa API
+
+        Один клиент на весь ExaSearcher: соединения переиспользуются через
+        keep-alive, поэтому TCP+TLS handshake происходит один раз, а не на
+        каждый запрос. При наличии пакета h2 используется HTTP/2.
+        """
+        http2 = settings.exa_http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("Package 'h2' not installed, Exa client falls back to HTTP/1.1")
+                http2 = False
+
+        return httpx.AsyncClient(
+            base_url=self.BASE_URL,
+            headers=self.headers,
+            timeout=settings.exa_timeout,
+            limits=httpx.Limits(
+                max_connections=settings.exa_max_connections,
+                max_keepalive_connections=settings.exa_max_keepalive_connections,
+                keepalive_expiry=settings.exa_keepalive_expiry,
+            ),
+            http2=http2,
+        )
+
+    async def close(self):
+        """Закрыть HTTP клиент"""
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "ExaSearcher":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    def _cache_key(self, endpoint: str, search_type: str, payload: Dict[str, Any]) -> str:
+        """
+        Ключ кэша: (endpoint, тип поиска, запрос, numResults, ...)
+
+        startPublishedDate округляется до дня — иначе ключ менялся бы
+        каждую секунду. Текущая дата в ключ не входит: свежесть
+        определяет TTL по типу поиска, а не смена суток.
+        """
+        cache_payload = dict(payload)
+        if "startPublishedDate" in cache_payload:
+            cache_payload["startPublishedDate"] = cache_payload["startPublishedDate"][:10]
+        return SQLiteCache.make_key(endpoint, search_type, cache_payload)
+
+    async def _search(
+        self,
+        payload: Dict[str, Any],
+        search_type: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Выполнить запрос к /search через общий клиент
+
+        Сначала проверяется дисковый кэш. При промахе запрос ждёт токен
+        общего лимитера, поэтому методы можно вызывать конкурентно без
+        ручных задержек. Успешный ответ кладётся в кэш с TTL по типу поиска.
+
+        Args:
+            payload: Тело запроса к Exa API
+            search_type: Тип поиска (news, technical, api_docs, company)
+
+        Returns:
+            JSON ответа или None при ошибке API
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._cache_key("/search", search_type, payload)
+            # Обращения к SQLite — в пуле потоков, event loop не ждёт диска
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                logger.info(f"Exa: cache hit for '{payload.get('query')}'")
+                return cached
+
+        await self.rate_limiter.acquire()
+        response = await self.client.post("/search", json=payload)
+
+        if response.status_code != 200:
+            logger.error(f"Exa API error: {response.status_code} - {response.text[:200]}")
+            return None
+
+        data = response.json()
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.set, cache_key, data, self.CACHE_TTLS.get(search_type))
+        return data
 
     async def search_latest_news(
         self,
@@ -61,46 +190,39 @@ class ExaSearcher:
         start_date = (datetime.utcnow() - timedelta(days=days_back)).strftime("%Y-%m-%dT%H:%M:%SZ")
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.BASE_URL}/search",
-                    headers=self.headers,
-                    json={
-                        "query": query,
-                        "numResults": num_results,
-                        "startPublishedDate": start_date,
-                        "useAutoprompt": True,
-                        "type": "auto",
-                        "contents": {
-                            "text": {"maxCharacters": 1500}
-                        }
+            data = await self._search({
+                "query": query,
+                "numResults": num_results,
+                "startPublishedDate": start_date,
+                "useAutoprompt": True,
+                "type": "auto",
+                "contents": {
+                    "text": {"maxCharacters": 1500}
+                }
+            }, search_type="news")
+
+            if data is None:
+                return []
+
+            results = []
+
+            for item in data.get("results", []):
+                results.append({
+                    'title': item.get('title', 'Без заголовка'),
+                    'url': item.get('url', ''),
+                    'content': item.get('text', '')[:1000],
+                    'published_at': item.get('publishedDate'),
+                    'source_type': 'exa_news',
+                    'relevance_score': item.get('score', 0.5),
+                    'metadata': {
+                        'search_query': query,
+                        'search_type': 'news',
+                        'author': item.get('author', '')
                     }
-                )
-
-                if response.status_code != 200:
-                    logger.error(f"Exa API error: {response.status_code} - {response.text}")
-                    return []
+                })
 
-                data = response.json()
-                results = []
-
-                for item in data.get("results", []):
-                    results.append({
-                        'title': item.get('title', 'Без заголовка'),
-                        'url': item.get('url', ''),
-                        'content': item.get('text', '')[:1000],
-                        'published_at': item.get('publishedDate'),
-                        'source_type': 'exa_news',
-                        'relevance_score': item.get('score', 0.5),
-                        'metadata': {
-                            'search_query': query,
-                            'search_type': 'news',
-                            'author': item.get('author', '')
-                        }
-                    })
-
-                logger.info(f"Exa: Found {len(results)} news items for '{query}'")
-                return results
+            logger.info(f"Exa: Found {len(results)} news items for '{query}'")
+            return results
 
         except Exception as e:
             logger.error(f"Exa search error: {e}")
@@ -127,44 +249,37 @@ class ExaSearcher:
         logger.info(f"Exa: Searching technical content for '{query}'")
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.BASE_URL}/search",
-                    headers=self.headers,
-                    json={
-                        "query": query,
-                        "numResults": num_results,
-                        "useAutoprompt": True,
-                        "type": "auto",
-                        "contents": {
-                            "text": {"maxCharacters": 2000}
-                        }
+            data = await self._search({
+                "query": query,
+                "numResults": num_results,
+                "useAutoprompt": True,
+                "type": "auto",
+                "contents": {
+                    "text": {"maxCharacters": 2000}
+                }
+            }, search_type="technical")
+
+            if data is None:
+                return []
+
+            results = []
+
+            for item in data.get("results", []):
+                results.append({
+                    'title': item.get('title', 'Без заголовка'),
+                    'url': item.get('url', ''),
+                    'content': item.get('text', '')[:1500],
+                    'published_at': item.get('publishedDate'),
+                    'source_type': 'exa_tech',
+                    'relevance_score': item.get('score', 0.5),
+                    'metadata': {
+                        'search_query': query,
+                        'search_type': 'technical'
                     }
-                )
+                })
 
-                if response.status_code != 200:
-                    logger.error(f"Exa API error: {response.status_code}")
-                    return []
-
-                data = response.json()
-                results = []
-
-                for item in data.get("results", []):
-                    results.append({
-                        'title': item.get('title', 'Без заголовка'),
-                        'url': item.get('url', ''),
-                        'content': item.get('text', '')[:1500],
-                        'published_at': item.get('publishedDate'),
-                        'source_type': 'exa_tech',
-                        'relevance_score': item.get('score', 0.5),
-                        'metadata': {
-                            'search_query': query,
-                            'search_type': 'technical'
-                        }
-                    })
-
-                logger.info(f"Exa: Found {len(results)} technical articles")
-                return results
+            logger.info(f"Exa: Found {len(results)} technical articles")
+            return results
 
         except Exception as e:
             logger.error(f"Exa technical search error: {e}")
@@ -194,45 +309,44 @@ class ExaSearcher:
             "Wildberries API статистика реклама новое",
         ]
 
-        all_results = []
-
-        for query in api_queries:
+        async def search_docs(query: str) -> List[Dict[str, Any]]:
             try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        f"{self.BASE_URL}/search",
-                        headers=self.headers,
-                        json={
-                            "query": query,
-                            "numResults": num_results,
-                            "useAutoprompt": True,
-                            "type": "auto",
-                            "contents": {
-                                "text": {"maxCharacters": 2000}
-                            }
+                data = await self._search({
+                    "query": query,
+                    "numResults": num_results,
+                    "useAutoprompt": True,
+                    "type": "auto",
+                    "contents": {
+                        "text": {"maxCharacters": 2000}
+                    }
+                }, search_type="api_docs")
+
+                if data is None:
+                    return []
+
+                return [
+                    {
+                        'title': item.get('title', ''),
+                        'url': item.get('url', ''),
+                        'content': item.get('text', '')[:1500],
+                        'published_at': item.get('publishedDate'),
+                        'source_type': 'api_docs',
+                        'relevance_score': item.get('score', 0.8),
+                        'metadata': {
+                            'search_query': query,
+                            'search_type': 'api_documentation'
                         }
-                    )
-
-                    if response.status_code == 200:
-                        data = response.json()
-                        for item in data.get("results", []):
-                            all_results.append({
-                                'title': item.get('title', ''),
-                                'url': item.get('url', ''),
-                                'content': item.get('text', '')[:1500],
-                                'published_at': item.get('publishedDate'),
-                                'source_type': 'api_docs',
-                                'relevance_score': item.get('score', 0.8),
-                                'metadata': {
-                                    'search_query': query,
-                                    'search_type': 'api_documentation'
-                                }
-                            })
+                    }
+                    for item in data.get("results", [])
+                ]
 
             except Exception as e:
                 logger.error(f"Exa API docs search error for '{query}': {e}")
+                return []
 
-            await asyncio.sleep(0.3)  # Rate limit protection
+        # Параллельные запросы, частоту ограничивает self.rate_limiter
+        results_lists = await asyncio.gather(*(search_docs(query) for query in api_queries))
+        all_results = [result for results in results_lists for result in results]
 
         # Дедупликация
         seen_urls = set()
@@ -267,44 +381,37 @@ class ExaSearcher:
         logger.info(f"Exa: Researching company '{company_name}'")
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.BASE_URL}/search",
-                    headers=self.headers,
-                    json={
-                        "query": f"{company_name} новости аналитика обновления",
-                        "numResults": num_results,
-                        "useAutoprompt": True,
-                        "type": "auto",
-                        "contents": {
-                            "text": {"maxCharacters": 1500}
-                        }
+            data = await self._search({
+                "query": f"{company_name} новости аналитика обновления",
+                "numResults": num_results,
+                "useAutoprompt": True,
+                "type": "auto",
+                "contents": {
+                    "text": {"maxCharacters": 1500}
+                }
+            }, search_type="company")
+
+            if data is None:
+                return []
+
+            results = []
+
+            for item in data.get("results", []):
+                results.append({
+                    'title': item.get('title', ''),
+                    'url': item.get('url', ''),
+                    'content': item.get('text', '')[:1000],
+                    'published_at': item.get('publishedDate'),
+                    'source_type': 'exa_company',
+                    'relevance_score': item.get('score', 0.5),
+                    'metadata': {
+                        'company_name': company_name,
+                        'search_type': 'company_research'
                     }
-                )
-
-                if response.status_code != 200:
-                    logger.error(f"Exa API error: {response.status_code}")
-                    return []
-
-                data = response.json()
-                results = []
-
-                for item in data.get("results", []):
-                    results.append({
-                        'title': item.get('title', ''),
-                        'url': item.get('url', ''),
-                        'content': item.get('text', '')[:1000],
-                        'published_at': item.get('publishedDate'),
-                        'source_type': 'exa_company',
-                        'relevance_score': item.get('score', 0.5),
-                        'metadata': {
-                            'company_name': company_name,
-                            'search_type': 'company_research'
-                        }
-                    })
+                })
 
-                logger.info(f"Exa: Found {len(results)} company insights")
-                return results
+            logger.info(f"Exa: Found {len(results)} company insights")
+            return results
 
         except Exception as e:
             logger.error(f"Exa company research error: {e}")
@@ -331,12 +438,11 @@ class ExaSearcher:
 
         all_results = []
 
-        # Последовательный поиск с задержкой (rate limit: 5 req/sec)
-        results_lists = []
-        for query in queries:
-            result = await self.search_latest_news(query, num_results_per_query)
-            results_lists.append(result)
-            await asyncio.sleep(0.3)  # 300ms между запросами
+        # Параллельный поиск, частоту ограничивает self.rate_limiter
+        results_lists = await asyncio.gather(*(
+            self.search_latest_news(query, num_results_per_query)
+            for query in queries
+        ))
 
         for results in results_lists:
             if results:
@@ -372,23 +478,22 @@ async def fetch_exa_sources(
     Returns:
         Список найденных источников
     """
-    searcher = ExaSearcher(api_key=api_key)
-    return await searcher.search_all_sources(queries)
+    async with ExaSearcher(api_key=api_key) as searcher:
+        return await searcher.search_all_sources(queries)
 
 
 if __name__ == "__main__":
     async def main():
-        searcher = ExaSearcher()
-
-        # Тест поиска новостей
-        news = await searcher.search_latest_news("Ozon API маркетплейс", num_results=3)
-        print(f"\nНайдено новостей: {len(news)}")
-        for item in news:
-            print(f"  - {item['title'][:60]}...")
-            print(f"    URL: {item['url']}")
-
-        # Тест исследования компании
-        company = await searcher.search_company_info("Wildberries")
-        print(f"\nИнформация о компании: {len(company)} результатов")
+        async with ExaSearcher() as searcher:
+            # Тест поиска новостей
+            news = await searcher.search_latest_news("Ozon API маркетплейс", num_results=3)
+            print(f"\nНайдено новостей: {len(news)}")
+            for item in news:
+                print(f"  - {item['title'][:60]}...")
+                print(f"    URL: {item['url']}")
+
+            # Тест исследования компании
+            company = await searcher.search_company_info("Wildberries")
+            print(f"\nИнформация о компании: {len(company)} результатов")
 
     asyncio.run(main())
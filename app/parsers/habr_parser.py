@@ -2,15 +2,35 @@
 Habr парсер для получения технических статей
 """
 import asyncio
+import json
+from concurrent.futures import Executor
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any
+from pathlib import Path
+from typing import List, Dict, Any, Optional
 import logging
 
 import httpx
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+
+from app.config import settings
+from app.utils.rate_limiter import HostThrottle
 
 logger = logging.getLogger(__name__)
 
+# Из страницы поиска строится дерево только для карточек статей —
+# навигация, скрипты и футер пропускаются ещё на этапе парсинга
+ARTICLE_STRAINER = SoupStrainer('article', class_='tm-articles-list__item')
+
+
+def get_html_parser_backend() -> str:
+    """Бэкенд BeautifulSoup из настроек (html.parser, если lxml не установлен)"""
+    backend = settings.habr_html_parser
+    if builder_registry.lookup(backend) is None:
+        logger.warning(f"HTML parser '{backend}' is not available, falling back to html.parser")
+        return 'html.parser'
+    return backend
+
 
 class HabrParser:
     """Парсер статей с Habr.com"""
@@ -20,8 +40,62 @@ class HabrParser:
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
     }
 
-    def __init__(self):
-        self.client = httpx.AsyncClient(headers=self.HEADERS, timeout=30.0)
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        throttle: Optional[HostThrottle] = None,
+        executor: Optional[Executor] = None,
+        incremental: Optional[bool] = None,
+        state_file: Optional[Path] = None
+    ):
+        """
+        Args:
+            client: Готовый HTTP клиент (если None, создаётся новый)
+            throttle: Ограничитель запросов к хосту (если None, из настроек)
+            executor: Пул для парсинга HTML (если None, пул потоков event loop).
+                Можно передать ProcessPoolExecutor — parse_search_page сериализуема.
+            incremental: Инкрементальный режим — conditional GET и возврат
+                только статей новее уже виденных (если None, из настроек)
+            state_file: Файл состояния краулинга (если None, из настроек)
+        """
+        self.client = client or httpx.AsyncClient(headers=self.HEADERS, timeout=30.0)
+        self.throttle = throttle or HostThrottle(
+            max_concurrency=settings.habr_max_concurrency,
+            min_interval=settings.habr_min_request_interval
+        )
+        self.executor = executor
+        self.html_parser = get_html_parser_backend()
+
+        self.incremental = settings.habr_incremental if incremental is None else incremental
+        self.state_file = state_file or settings.base_dir / settings.habr_state_file
+        self.crawl_state = self._load_crawl_state() if self.incremental else {}
+
+    def _load_crawl_state(self) -> Dict[str, Dict[str, str]]:
+        """
+        Загрузить состояние краулинга
+
+        Формат: {url страницы тега: {"etag", "last_modified", "watermark"}},
+        где watermark — дата самой свежей уже виденной статьи (ISO).
+        """
+        if not self.state_file.exists():
+            return {}
+
+        try:
+            with open(self.state_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read Habr crawl state, starting from scratch: {e}")
+            return {}
+
+    def save_crawl_state(self) -> None:
+        """Сохранить состояние краулинга"""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.state_file, "w") as f:
+            json.dump(self.crawl_state, f, ensure_ascii=False, indent=2)
+
+    def discard_crawl_state(self) -> None:
+        """Отбросить несохранённое состояние (статьи этого прохода не удалось сохранить)"""
+        self.crawl_state = self._load_crawl_state() if self.incremental else {}
 
     async def close(self):
         """Закрыть HTTP клиент"""
@@ -31,7 +105,8 @@ class HabrParser:
         self,
         tags: List[str],
         max_articles_per_tag: int = 10,
-        days_back: int = 7
+        days_back: int = 7,
+        save_state: bool = True
     ) -> List[Dict[str, Any]]:
         """
         Парсинг статей по тегам
@@ -40,14 +115,15 @@ class HabrParser:
             tags: Список тегов для поиска
             max_articles_per_tag: Максимальное количество статей на тег
             days_back: Сколько дней назад искать статьи
+            save_state: Сразу сохранить состояние краулинга. False — вызывающий
+                сохранит его сам (save_crawl_state), когда статьи будут сохранены
 
         Returns:
             Список найденных статей
         """
-        all_articles = []
         cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_back)
 
-        for tag in tags:
+        async def parse_tag(tag: str) -> List[Dict[str, Any]]:
             logger.info(f"Parsing Habr tag: {tag}")
 
             try:
@@ -60,13 +136,18 @@ class HabrParser:
                 ]
 
                 logger.info(f"Found {len(recent_articles)} recent articles for tag '{tag}'")
-                all_articles.extend(recent_articles)
+                return recent_articles
 
             except Exception as e:
                 logger.error(f"Error parsing tag '{tag}': {e}")
+                return []
 
-            # Небольшая задержка между запросами
-            await asyncio.sleep(1)
+        # Теги парсятся параллельно, вежливость к habr.com обеспечивает self.throttle
+        articles_lists = await asyncio.gather(*(parse_tag(tag) for tag in tags))
+        all_articles = [article for articles in articles_lists for article in articles]
+
+        if self.incremental and save_state:
+            self.save_crawl_state()
 
         # Дедупликация по URL
         seen_urls = set()
@@ -98,33 +179,52 @@ class HabrParser:
         """
         url = f"{self.BASE_URL}/ru/search/?q={tag}&target_type=posts&order=date"
 
+        state = self.crawl_state.get(url, {})
+        headers = {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+
         try:
-            response = await self.client.get(url)
+            async with self.throttle.slot(httpx.URL(url).host):
+                response = await self.client.get(url, headers=headers)
+
+            if response.status_code == 304:
+                logger.info(f"Habr tag '{tag}' not modified since last crawl")
+                return []
+
             response.raise_for_status()
         except httpx.HTTPError as e:
             logger.error(f"HTTP error fetching {url}: {e}")
             return []
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        articles = []
-
-        # NOTE: Здесь упрощённый парсинг, реальная структура Habr может отличаться
-        # В production версии нужно будет обновить селекторы
-
-        article_blocks = soup.select('article.tm-articles-list__item')[:max_articles]
+        watermark = datetime.fromisoformat(state['watermark']) if state.get('watermark') else None
+
+        # Парсинг HTML — CPU-работа, выносим её из event loop в пул
+        loop = asyncio.get_running_loop()
+        articles = await loop.run_in_executor(
+            self.executor,
+            parse_search_page,
+            response.text,
+            tag,
+            max_articles,
+            self.html_parser,
+            watermark
+        )
 
-        for block in article_blocks:
-            try:
-                article = self._parse_article_block(block, tag)
-                if article:
-                    articles.append(article)
-            except Exception as e:
-                logger.warning(f"Error parsing article block: {e}")
+        if self.incremental:
+            newest = max((a['published_at'] for a in articles), default=watermark)
+            self.crawl_state[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'watermark': newest.isoformat() if newest else None,
+            }
 
         return articles
 
+    @staticmethod
     def _parse_article_block(
-        self,
         block: BeautifulSoup,
         tag: str
     ) -> Dict[str, Any]:
@@ -145,7 +245,7 @@ class HabrParser:
 
         title = title_elem.get_text(strip=True)
         relative_url = title_elem.get('href', '')
-        url = f"{self.BASE_URL}{relative_url}" if relative_url.startswith('/') else relative_url
+        url = f"{HabrParser.BASE_URL}{relative_url}" if relative_url.startswith('/') else relative_url
 
         # Краткое описание
         description_elem = block.select_one('.tm-article-snippet__lead')
@@ -180,6 +280,51 @@ class HabrParser:
         return article
 
 
+def parse_search_page(
+    html: str,
+    tag: str,
+    max_articles: int = 10,
+    features: str = 'lxml',
+    stop_at: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    Разбор HTML страницы поиска Habr
+
+    Чистая функция без доступа к event loop: вызывается в пуле потоков
+    или процессов.
+
+    Args:
+        html: HTML страницы поиска
+        tag: Тег, по которому искали
+        max_articles: Максимальное количество статей
+        features: Бэкенд BeautifulSoup ('lxml' или 'html.parser')
+        stop_at: Остановиться на первой статье не новее этой даты
+            (выдача отсортирована по дате, дальше только уже виденные)
+
+    Returns:
+        Список статей
+    """
+    soup = BeautifulSoup(html, features, parse_only=ARTICLE_STRAINER)
+    articles = []
+
+    # NOTE: Здесь упрощённый парсинг, реальная структура Habr может отличаться
+    # В production версии нужно будет обновить селекторы
+
+    article_blocks = soup.select('article.tm-articles-list__item')[:max_articles]
+
+    for block in article_blocks:
+        try:
+            article = HabrParser._parse_article_block(block, tag)
+            if article:
+                if stop_at and article['published_at'] <= stop_at:
+                    break
+                articles.append(article)
+        except Exception as e:
+            logger.warning(f"Error parsing article block: {e}")
+
+    return articles
+
+
 # Вспомогательные функции
 
 async def fetch_habr_articles(
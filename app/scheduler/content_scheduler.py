@@ -12,6 +12,7 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
 from app.config import settings
+from app.database.session import dispose_engines
 from app.utils.post_types import get_random_publish_time, get_rotation_status
 
 logger = logging.getLogger(__name__)
@@ -35,6 +36,15 @@ class ContentScheduler:
             name='Check and schedule next post'
         )
 
+        # Фоновый сбор источников на склад (parse_schedule_hours)
+        if settings.use_source_warehouse:
+            self.scheduler.add_job(
+                self._collect_sources,
+                CronTrigger(hour=','.join(str(h) for h in settings.parse_hours), minute=0),
+                id='collect_sources',
+                name='Collect sources to warehouse'
+            )
+
         logger.info("Scheduler jobs configured")
 
     async def _schedule_next_post(self):
@@ -81,6 +91,21 @@ class ContentScheduler:
 
         logger.info(f"📅 Post scheduled for {run_time.strftime('%Y-%m-%d %H:%M')}")
 
+    async def _collect_sources(self):
+        """Сбор источников на склад вне критического пути публикации"""
+        from app.main import ContentPipeline
+
+        logger.info("=== Running scheduled source collection ===")
+
+        pipeline = ContentPipeline(habr_incremental=True)
+        try:
+            count = await pipeline.refresh_warehouse()
+            logger.info(f"Source warehouse refreshed: {count} top sources")
+        except Exception as e:
+            logger.error(f"Scheduled source collection failed: {e}")
+        finally:
+            await pipeline.close()
+
     async def _run_pipeline(self):
         """Запуск пайплайна публикации"""
         from app.main import ContentPipeline
@@ -170,6 +195,9 @@ async def run_scheduler():
             await asyncio.sleep(3600)  # Проверка каждый час
     except KeyboardInterrupt:
         scheduler.stop()
+    finally:
+        # Закрываем пул соединений с БД (склад источников)
+        await dispose_engines()
 
 
 if __name__ == "__main__":
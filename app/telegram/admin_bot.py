@@ -10,6 +10,7 @@ Commands:
 - /stats - Show posting statistics
 """
 import logging
+import time
 from typing import Optional
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -65,6 +66,31 @@ def admin_required(func):
     return wrapper
 
 
+class LivePreview:
+    """Live preview of a streaming post: edits a message as text arrives."""
+
+    def __init__(self, message, header: str, interval: Optional[float] = None):
+        self.message = message
+        self.header = header
+        self.interval = settings.admin_preview_edit_interval if interval is None else interval
+        self.text = ""
+        self._last_edit = 0.0
+
+    async def on_delta(self, chunk: str) -> None:
+        """Append a chunk and edit the message at most once per interval."""
+        self.text += chunk
+        now = time.monotonic()
+        if now - self._last_edit < self.interval:
+            return
+        self._last_edit = now
+
+        try:
+            await self.message.edit_text(f"{self.header}\n\n{self.text}")
+        except Exception as e:
+            # Telegram rejects unchanged text and throttles frequent edits
+            logger.debug(f"Live preview edit skipped: {e}")
+
+
 # === Command Handlers ===
 
 @admin_required
@@ -90,49 +116,51 @@ async def help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 @admin_required
 async def preview_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /preview command - generate and show next post for approval."""
-    await update.message.reply_text("Generating preview...")
+    status_message = await update.message.reply_text("Generating preview...")
 
     try:
         from app.main import ContentPipeline
 
         pipeline = ContentPipeline()
-
-        # Collect sources and generate post without publishing
-        sources = await pipeline.collect_sources()
-        result = await pipeline.generate_and_publish_post(sources, publish=False)
-
-        await pipeline.close()
-
-        if result['success']:
-            post_content = result['post']['content']
-            post_type = result.get('post_type', 'unknown')
-
-            # Store in context for approval
-            context.user_data['pending_post'] = {
-                'content': post_content,
-                'post_type': post_type,
-                'sources': result['post'].get('sources', [])
-            }
-
-            # Send preview with approval buttons
-            keyboard = InlineKeyboardMarkup([
-                [
-                    InlineKeyboardButton("Approve & Publish", callback_data="approve_preview"),
-                    InlineKeyboardButton("Reject", callback_data="reject_preview"),
-                ],
-                [
-                    InlineKeyboardButton("Regenerate", callback_data="regenerate_preview"),
-                ]
-            ])
-
-            await update.message.reply_text(
-                f"POST PREVIEW\n"
-                f"Type: {post_type}\n\n"
-                f"{post_content}",
-                reply_markup=keyboard
+        try:
+            # Collect sources and generate post without publishing,
+            # streaming the draft into the status message
+            sources = await pipeline.collect_sources()
+            live_preview = LivePreview(status_message, header="Generating preview...")
+            result = await pipeline.generate_and_publish_post(
+                sources,
+                publish=False,
+                on_delta=live_preview.on_delta
             )
-        else:
-            await update.message.reply_text(f"Failed to generate: {result.get('error')}")
+
+            if result['success']:
+                post_content = result['post']['content']
+                post_type = result.get('post_type', 'unknown')
+
+                # Store in context for approval
+                context.user_data['pending_post'] = {
+                    'content': post_content,
+                    'post_type': post_type,
+                    'sources': result['post'].get('sources', []),
+                    # All sources the post was generated from, for dedup and
+                    # the warehouse "used" mark once the post is approved
+                    'source_refs': [
+                        {'title': s.get('title', ''), 'content': s.get('content', ''), 'url': s.get('url', '')}
+                        for s in sources
+                    ],
+                    'alternatives': result['post'].get('alternatives', [])
+                }
+
+                # Send preview with approval buttons
+                await status_message.edit_text(
+                    format_preview(context.user_data['pending_post']),
+                    reply_markup=create_preview_keyboard()
+                )
+            else:
+                await update.message.reply_text(f"Failed to generate: {result.get('error')}")
+        finally:
+            # Waits for the background source store, after the preview is shown
+            await pipeline.close()
 
     except Exception as e:
         logger.error(f"Preview error: {e}")
@@ -189,6 +217,10 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Mark in rotation system
             mark_post_published(pending.get('post_type', 'useful'))
 
+            # Same bookkeeping as the pipeline's own publish path
+            from app.main import on_post_published
+            await on_post_published(pending.get('source_refs', []))
+
             await query.edit_message_text(
                 f"Published!\n"
                 f"Message ID: {result['message_id']}\n\n"
@@ -203,6 +235,16 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("Post rejected. Use /preview to generate a new one.")
 
     elif action == "regenerate_preview":
+        pending = context.user_data.get('pending_post')
+        if pending and pending.get('alternatives'):
+            # Show the next pre-generated candidate instantly
+            pending['content'] = pending['alternatives'].pop(0)
+            await query.edit_message_text(
+                format_preview(pending),
+                reply_markup=create_preview_keyboard()
+            )
+            return
+
         await query.edit_message_text("Regenerating... Use /preview again.")
         context.user_data.pop('pending_post', None)
 
@@ -215,6 +257,31 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text(f"Post {post_id} rejected.")
 
 
+def format_preview(pending: dict) -> str:
+    """Format pending post preview text."""
+    alternatives = len(pending.get('alternatives', []))
+    footer = f"\n\n({alternatives} more variant(s) available via Regenerate)" if alternatives else ""
+    return (
+        f"POST PREVIEW\n"
+        f"Type: {pending['post_type']}\n\n"
+        f"{pending['content']}"
+        f"{footer}"
+    )
+
+
+def create_preview_keyboard() -> InlineKeyboardMarkup:
+    """Create inline keyboard for pending preview approval."""
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("Approve & Publish", callback_data="approve_preview"),
+            InlineKeyboardButton("Reject", callback_data="reject_preview"),
+        ],
+        [
+            InlineKeyboardButton("Regenerate", callback_data="regenerate_preview"),
+        ]
+    ])
+
+
 def create_approval_keyboard(post_id: int) -> InlineKeyboardMarkup:
     """Create inline keyboard for post approval."""
     keyboard = [
@@ -0,0 +1,259 @@
+"""
+Персистентный кэш на SQLite
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCache:
+    """
+    Key-value кэш в файле SQLite с TTL и LRU-вытеснением
+
+    Значения хранятся как JSON. Записи разных потребителей разделены
+    пространствами имён (namespace), поэтому один файл можно делить
+    между несколькими кэшами.
+
+    Чтение не пишет в БД: время доступа для LRU копится в памяти и
+    записывается пачкой (при set, при накоплении TOUCH_BATCH отметок и
+    при close). LRU-вытеснение выполняется не на каждый set, а раз в
+    ~5% от max_entries записей, так что namespace может ненадолго
+    превысить лимит.
+
+    Методы защищены блокировкой, поэтому их можно звать из пула потоков
+    (asyncio.to_thread), не блокируя event loop.
+    """
+
+    # Сколько отметок доступа копить до записи в БД
+    TOUCH_BATCH = 64
+    # Ключей в одном SELECT ... IN (лимит параметров SQLite — 999)
+    MANY_CHUNK = 500
+
+    def __init__(
+        self,
+        path: Path,
+        namespace: str,
+        max_entries: int = 1000
+    ):
+        """
+        Args:
+            path: Путь к файлу БД (директория создаётся при необходимости)
+            namespace: Пространство имён записей
+            max_entries: Максимум записей в namespace, лишние вытесняются по LRU
+        """
+        self.path = Path(path)
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.RLock()
+        self._touched: Dict[str, float] = {}
+        self._evict_every = max(1, max_entries // 20)
+        self._sets_since_evict = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # В WAL режим NORMAL не делает fsync на каждый коммит; при сбое
+        # питания теряются лишь последние записи кэша
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed "
+            "ON cache_entries (namespace, accessed_at)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Content-addressed ключ: SHA-256 от JSON-представления частей"""
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Получить значение из кэша
+
+        Returns:
+            Значение или None, если записи нет или она устарела
+        """
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+
+        if row is None or (row[1] is not None and row[1] <= now):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._touch(key, now)
+        return json.loads(row[0])
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Получить несколько значений одним запросом
+
+        Returns:
+            {ключ: значение} только для найденных и не устаревших записей
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Any] = {}
+        with self._lock:
+            now = time.time()
+            for i in range(0, len(keys), self.MANY_CHUNK):
+                chunk = keys[i:i + self.MANY_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT key, value, expires_at FROM cache_entries WHERE namespace = ? "
+                    f"AND key IN ({', '.join('?' * len(chunk))})",
+                    (self.namespace, *chunk)
+                ).fetchall()
+                for key, value, expires_at in rows:
+                    if expires_at is None or expires_at > now:
+                        found[key] = json.loads(value)
+                        self._touch(key, now)
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _touch(self, key: str, now: float) -> None:
+        """Отметить доступ к записи (в БД попадёт пачкой)"""
+        self._touched[key] = now
+        if len(self._touched) >= self.TOUCH_BATCH:
+            self._flush_touches()
+            self._conn.commit()
+
+    def _flush_touches(self) -> None:
+        """Записать накопленные отметки доступа (без коммита)"""
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+            [(at, self.namespace, key) for key, at in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Сохранить значение
+
+        Args:
+            key: Ключ
+            value: JSON-сериализуемое значение
+            ttl: Время жизни в секундах (None — бессрочно)
+        """
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache_entries "
+            "(namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value, ensure_ascii=False, default=str), expires_at, now)
+        )
+        self._touched.pop(key, None)
+        self._maybe_evict(now)
+        self._conn.commit()
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """Сохранить несколько значений в одной транзакции"""
+        if not items:
+            return
+
+        with self._lock:
+            now = time.time()
+            expires_at = now + ttl if ttl is not None else None
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries "
+                "(namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self.namespace, key, json.dumps(value, ensure_ascii=False, default=str), expires_at, now)
+                    for key, value in items.items()
+                ]
+            )
+            for key in items:
+                self._touched.pop(key, None)
+            self._sets_since_evict += len(items) - 1
+            self._maybe_evict(now)
+            self._conn.commit()
+
+    def _maybe_evict(self, now: float) -> None:
+        """Вытеснение раз в _evict_every записей, а не на каждый set"""
+        self._sets_since_evict += 1
+        if self._sets_since_evict >= self._evict_every:
+            self._sets_since_evict = 0
+            self._flush_touches()
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Удалить устаревшие записи и лишние по LRU"""
+        self._conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, now)
+        )
+        self._conn.execute(
+            """
+            DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                SELECT key FROM cache_entries WHERE namespace = ?
+                ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.namespace, self.namespace, self.max_entries)
+        )
+
+    def clear(self) -> None:
+        """Очистить namespace"""
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий/промахов и размер (размер — запрос к БД)"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self),
+        }
+
+    def close(self) -> None:
+        """Записать отметки доступа и закрыть соединение с БД"""
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,282 @@
+"""
+Поиск почти-дубликатов источников (MinHash + LSH)
+
+Одна и та же новость часто приходит с разных сайтов (перепечатки,
+агрегаторы), и дедупликация по URL её не ловит. Здесь тексты сравниваются
+по MinHash-сигнатурам шинглов из слов, а кандидаты ищутся через LSH по
+полосам сигнатуры — без попарного сравнения всех источников.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Простое число Мерсенна 2^61 - 1 для универсального хеширования
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 64) - 1
+
+Signature = Tuple[int, ...]
+
+
+def source_text(source: Dict[str, Any]) -> str:
+    """Текст источника для сравнения: заголовок + контент"""
+    return f"{source.get('title', '')} {source.get('content', '')}"
+
+
+class MinHasher:
+    """
+    MinHash-сигнатуры текстов
+
+    Шинглы — последовательности из `shingle_size` слов. Хеш шингла
+    стабилен между запусками (blake2b), поэтому сигнатуры можно хранить
+    на диске.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        """
+        Args:
+            num_perm: Длина сигнатуры (число хеш-функций)
+            shingle_size: Слов в одном шингле
+            seed: Зерно генерации хеш-функций (должно совпадать у сохранённых сигнатур)
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+        rng = random.Random(seed)
+        self._params = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def shingles(self, text: str) -> Set[str]:
+        words = re.findall(r'\w+', text.lower())
+        size = self.shingle_size
+        return {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+    def signature(self, text: str) -> Signature:
+        """MinHash-сигнатура текста"""
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+            for shingle in self.shingles(text)
+        ]
+        if not hashes:
+            return tuple([_MAX_HASH] * self.num_perm)
+
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+            for a, b in self._params
+        )
+
+    @staticmethod
+    def similarity(a: Signature, b: Signature) -> float:
+        """Оценка сходства Жаккара по доле совпавших позиций сигнатуры"""
+        return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class LSHIndex:
+    """
+    LSH-индекс MinHash-сигнатур
+
+    Сигнатура режется на `bands` полос; тексты, совпавшие хотя бы в одной
+    полосе, становятся кандидатами и проверяются по оценке сходства.
+    Индекс можно сохранить на диск (save/load) — тогда в нём хранятся
+    источники прошлых постов, не старше `max_entries` последних.
+    """
+
+    def __init__(
+        self,
+        hasher: Optional[MinHasher] = None,
+        bands: int = 16,
+        threshold: float = 0.8,
+        max_entries: Optional[int] = None
+    ):
+        """
+        Args:
+            hasher: MinHasher (если None, с параметрами по умолчанию)
+            bands: Число полос (num_perm должно на него делиться)
+            threshold: Порог сходства для почти-дубликата
+            max_entries: Максимум записей, старые вытесняются (None — без ограничения)
+        """
+        self.hasher = hasher or MinHasher()
+        if self.hasher.num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.bands = bands
+        self.rows = self.hasher.num_perm // bands
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        self._signatures: "OrderedDict[str, Signature]" = OrderedDict()
+        self._buckets: List[Dict[Signature, Set[str]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._signatures
+
+    def _band_keys(self, signature: Signature) -> List[Signature]:
+        return [signature[i * self.rows:(i + 1) * self.rows] for i in range(self.bands)]
+
+    def add(self, key: str, signature: Signature) -> None:
+        """Добавить сигнатуру в индекс"""
+        if key in self._signatures:
+            self.remove(key)
+
+        self._signatures[key] = signature
+        for band, band_key in zip(self._buckets, self._band_keys(signature)):
+            band.setdefault(band_key, set()).add(key)
+
+        if self.max_entries is not None:
+            while len(self._signatures) > self.max_entries:
+                self.remove(next(iter(self._signatures)))
+
+    def remove(self, key: str) -> None:
+        signature = self._signatures.pop(key)
+        for band, band_key in zip(self._buckets, self._band_keys(signature)):
+            keys = band.get(band_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del band[band_key]
+
+    def query(self, signature: Signature) -> List[Tuple[str, float]]:
+        """Почти-дубликаты сигнатуры: [(ключ, сходство)] не ниже порога"""
+        candidates = set()
+        for band, band_key in zip(self._buckets, self._band_keys(signature)):
+            candidates |= band.get(band_key, set())
+
+        matches = []
+        for key in candidates:
+            similarity = self.hasher.similarity(signature, self._signatures[key])
+            if similarity >= self.threshold:
+                matches.append((key, similarity))
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def save(self, path: Path) -> None:
+        """Сохранить сигнатуры в JSON (порядок — от старых к новым)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(
+                {'num_perm': self.hasher.num_perm, 'signatures': list(self._signatures.items())},
+                f
+            )
+
+    def load(self, path: Path) -> None:
+        """Загрузить сигнатуры из JSON, несовместимый файл игнорируется"""
+        path = Path(path)
+        if not path.exists():
+            return
+
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read dedup index {path}: {e}")
+            return
+
+        if data.get('num_perm') != self.hasher.num_perm:
+            logger.warning(f"Dedup index {path} was built with other parameters, ignoring it")
+            return
+
+        for key, signature in data.get('signatures', []):
+            self.add(key, tuple(signature))
+
+
+def create_index(max_entries: Optional[int] = None) -> LSHIndex:
+    """LSH-индекс с параметрами из настроек"""
+    return LSHIndex(
+        hasher=MinHasher(num_perm=settings.dedup_num_perm),
+        bands=settings.dedup_bands,
+        threshold=settings.dedup_threshold,
+        max_entries=max_entries
+    )
+
+
+_used_sources_index: Optional[LSHIndex] = None
+
+
+def get_used_sources_index() -> Optional[LSHIndex]:
+    """Персистентный индекс источников прошлых постов (None, если выключен)"""
+    global _used_sources_index
+    if not settings.dedup_used_index_enabled:
+        return None
+    if _used_sources_index is None:
+        _used_sources_index = create_index(max_entries=settings.dedup_used_index_max_entries)
+        _used_sources_index.load(settings.base_dir / settings.dedup_used_index_file)
+    return _used_sources_index
+
+
+def filter_near_duplicates(
+    sources: Sequence[Dict[str, Any]],
+    used_index: Optional[LSHIndex] = None
+) -> List[Dict[str, Any]]:
+    """
+    Убрать почти-дубликаты из списка источников
+
+    Из группы похожих остаётся первый источник (порядок задаёт приоритет).
+    Источники, похожие на уже использованные в прошлых постах, тоже
+    отбрасываются.
+
+    Args:
+        sources: Источники в порядке приоритета
+        used_index: Индекс источников прошлых постов (опционально)
+
+    Returns:
+        Источники без почти-дубликатов
+    """
+    batch_index = create_index()
+    unique = []
+    dropped_batch = dropped_used = 0
+
+    for i, source in enumerate(sources):
+        signature = batch_index.hasher.signature(source_text(source))
+
+        if batch_index.query(signature):
+            dropped_batch += 1
+            continue
+        if used_index is not None and used_index.query(signature):
+            dropped_used += 1
+            continue
+
+        batch_index.add(str(i), signature)
+        unique.append(source)
+
+    logger.info(
+        f"Near-duplicate filter: kept {len(unique)}/{len(sources)} sources "
+        f"({dropped_batch} duplicates in batch, {dropped_used} used in past posts)"
+    )
+    return unique
+
+
+def remember_used_sources(
+    sources: Sequence[Dict[str, Any]],
+    used_index: Optional[LSHIndex] = None,
+    path: Optional[Path] = None
+) -> None:
+    """
+    Добавить источники опубликованного поста в персистентный индекс
+
+    Args:
+        sources: Источники поста
+        used_index: Индекс (если None, общий из настроек)
+        path: Файл индекса (если None, из настроек)
+    """
+    index = used_index if used_index is not None else get_used_sources_index()
+    if index is None:
+        return
+
+    for source in sources:
+        key = source.get('url') or source.get('title', '')
+        index.add(key, index.hasher.signature(source_text(source)))
+
+    index.save(path or settings.base_dir / settings.dedup_used_index_file)
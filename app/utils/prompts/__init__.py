@@ -18,21 +18,28 @@ from .examples import EXAMPLE_POSTS
 
 from .post_types import POST_TYPE_PROMPTS
 
-# Основной промпт генерации (собирается динамически в content_generator.py)
-CONTENT_GENERATION_PROMPT = """
+# Промпт генерации собирается в content_generator.py из двух частей:
+# - CONTENT_GENERATION_SYSTEM_PROMPT — стабильный префикс (правила, гайды,
+#   промпт типа поста с эталонным примером). Уходит в system и кэшируется
+#   Anthropic (prompt caching), поэтому не должен зависеть от источников/темы.
+# - CONTENT_GENERATION_PROMPT — небольшой переменный хвост (источники,
+#   тема из контент-плана, CTA) в сообщении пользователя.
+CONTENT_GENERATION_SYSTEM_PROMPT = """
 {system_prompt}
 
 {realistic_numbers_guide}
 
 {author_experience_examples}
 
+{post_type_prompt}
+"""
+
+CONTENT_GENERATION_PROMPT = """
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 ИСТОЧНИКИ (используй как основу для фактов):
 {sources}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-{post_type_prompt}
-
 {topic_instruction}
 
 {cta_instruction}
@@ -65,6 +72,21 @@ RELEVANCE_EVALUATION_PROMPT = """Оцени релевантность этог
 {{"relevance_score": 0.0-1.0, "reason": "объяснение", "is_relevant": true/false}}
 """
 
+# Пакетная оценка релевантности: несколько источников за один запрос
+RELEVANCE_BATCH_EVALUATION_PROMPT = """Оцени релевантность каждого источника для аудитории специалистов по автоматизации и селлеров маркетплейсов.
+
+ИСТОЧНИКИ:
+{sources}
+
+КРИТЕРИИ:
+1. Актуальность для e-commerce (0-1)
+2. Техническая ценность (0-1)
+3. Практическая применимость (0-1)
+
+ОТВЕТ — ТОЛЬКО JSON-массив, по одному объекту на каждый источник, id как в списке:
+[{{"id": 1, "relevance_score": 0.0-1.0, "reason": "кратко"}}]
+"""
+
 __all__ = [
     # Системные промпты
     "SYSTEM_PROMPT",
@@ -76,6 +98,8 @@ __all__ = [
     # Промпты по типам
     "POST_TYPE_PROMPTS",
     # Основные промпты
+    "CONTENT_GENERATION_SYSTEM_PROMPT",
     "CONTENT_GENERATION_PROMPT",
     "RELEVANCE_EVALUATION_PROMPT",
+    "RELEVANCE_BATCH_EVALUATION_PROMPT",
 ]
@@ -0,0 +1,255 @@
+"""
+Асинхронные ограничители частоты запросов
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Union
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket для asyncio
+
+    Ведро ёмкостью `burst` пополняется со скоростью `rate` токенов в секунду.
+    Каждый acquire() резервирует токен сразу (баланс может уйти в минус)
+    и спит ровно столько, сколько нужно до его появления. Резервирование
+    происходит без await, поэтому в однопоточном event loop не нужен Lock,
+    а порядок обслуживания — FIFO.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: Скорость пополнения (токенов в секунду)
+            burst: Ёмкость ведра (сколько запросов можно выполнить сразу)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Дождаться и забрать токен(ы)"""
+        self._refill()
+        self._tokens -= tokens
+
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+
+class HostThrottle:
+    """
+    Вежливый доступ к хостам при параллельном краулинге
+
+    На каждый хост — не больше `max_concurrency` одновременных запросов
+    и не чаще одного старта запроса в `min_interval` секунд. Слоты по
+    времени резервируются без await, как и в TokenBucket.
+    """
+
+    def __init__(self, max_concurrency: int = 2, min_interval: float = 0.5):
+        """
+        Args:
+            max_concurrency: Максимум параллельных запросов к одному хосту
+            min_interval: Минимальный интервал между стартами запросов (секунды)
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_slot: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, host: str) -> AsyncIterator[None]:
+        """Занять слот для запроса к хосту на время блока async with"""
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.max_concurrency))
+
+        async with semaphore:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = start + self.min_interval
+
+            if start > now:
+                await asyncio.sleep(start - now)
+
+            yield
+
+
+class GCRALimiter:
+    """
+    Ограничитель частоты по ключу (GCRA, generic cell rate algorithm)
+
+    На ключ хранится одно число — теоретическое время прибытия (TAT)
+    следующего запроса, поэтому проверка O(1) по времени и памяти.
+    Допускается не больше `limit` запросов за `period` секунд, из них
+    до `burst` подряд. В отличие от TokenBucket запрос не ждёт, а сразу
+    получает отказ и время, через которое можно повторить.
+    """
+
+    # Сколько ключей держать до очистки устаревших
+    SWEEP_THRESHOLD = 10000
+
+    def __init__(self, limit: int, period: float = 60.0, burst: Optional[int] = None):
+        """
+        Args:
+            limit: Максимум запросов за период
+            period: Период в секундах
+            burst: Сколько запросов можно сделать подряд (если None, равно limit)
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+
+        self.interval = period / limit
+        self.tolerance = self.interval * (burst or limit)
+        self._tat: Dict[str, float] = {}
+
+    def check(self, key: str, now: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        Учесть запрос по ключу
+
+        Returns:
+            (разрешён ли запрос, через сколько секунд можно повторить)
+        """
+        now = time.monotonic() if now is None else now
+        new_tat = max(self._tat.get(key, now), now) + self.interval
+
+        if new_tat - now > self.tolerance:
+            return False, new_tat - now - self.tolerance
+
+        self._tat[key] = new_tat
+        if len(self._tat) > self.SWEEP_THRESHOLD:
+            self._sweep(now)
+        return True, 0.0
+
+    async def allow(self, key: str) -> Tuple[bool, float]:
+        """То же, что check() — общий интерфейс с RedisGCRALimiter"""
+        return self.check(key)
+
+    def _sweep(self, now: float) -> None:
+        # Ключ с TAT в прошлом ничем не отличается от отсутствующего
+        self._tat = {key: tat for key, tat in self._tat.items() if tat > now}
+
+
+class RedisGCRALimiter:
+    """
+    GCRA с состоянием в Redis (общий лимит для нескольких процессов бота)
+
+    Проверка и запись TAT — один Lua-скрипт, то есть атомарно и за один
+    round-trip. Время берётся с сервера Redis, чтобы часы процессов не
+    влияли на лимит. При недоступности Redis запрос пропускается.
+    """
+
+    SCRIPT = """
+        local t = redis.call('TIME')
+        local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+        local interval = tonumber(ARGV[1])
+        local tolerance = tonumber(ARGV[2])
+
+        local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+        local new_tat = math.max(tat, now) + interval
+
+        if new_tat - now > tolerance then
+            return {0, tostring(new_tat - now - tolerance)}
+        end
+
+        redis.call('SET', KEYS[1], tostring(new_tat), 'EX', math.ceil(new_tat - now))
+        return {1, '0'}
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        limit: int,
+        period: float = 60.0,
+        burst: Optional[int] = None,
+        prefix: str = "rate_limit:"
+    ):
+        """
+        Args:
+            client: Асинхронный клиент Redis (redis.asyncio.Redis или совместимый)
+            limit: Максимум запросов за период
+            period: Период в секундах
+            burst: Сколько запросов можно сделать подряд (если None, равно limit)
+            prefix: Префикс ключей в Redis
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+
+        self.interval = period / limit
+        self.tolerance = self.interval * (burst or limit)
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+
+    async def allow(self, key: str) -> Tuple[bool, float]:
+        """Учесть запрос по ключу: (разрешён ли, через сколько секунд повторить)"""
+        try:
+            allowed, retry_after = await self._script(
+                keys=[self.prefix + key],
+                args=[self.interval, self.tolerance]
+            )
+        except Exception as e:
+            logger.warning(f"Redis rate limiter unavailable, letting request through: {e}")
+            return True, 0.0
+
+        return bool(int(allowed)), float(retry_after)
+
+
+UserRateLimiter = Union[GCRALimiter, RedisGCRALimiter]
+
+_user_rate_limiter: Optional[UserRateLimiter] = None
+
+
+def get_user_rate_limiter() -> UserRateLimiter:
+    """
+    Общий лимитер сообщений пользователей клиентского бота
+
+    messages_per_minute_limit запросов в минуту на telegram_id. При
+    заданном rate_limit_redis_url состояние хранится в Redis, иначе в
+    памяти процесса.
+    """
+    global _user_rate_limiter
+    if _user_rate_limiter is None:
+        limit = settings.messages_per_minute_limit
+        if settings.rate_limit_redis_url:
+            try:
+                from redis.asyncio import Redis
+            except ImportError:
+                logger.warning("Package 'redis' not installed, rate limiter falls back to memory")
+            else:
+                client = Redis.from_url(settings.rate_limit_redis_url)
+                _user_rate_limiter = RedisGCRALimiter(client, limit=limit, period=60.0)
+
+        if _user_rate_limiter is None:
+            _user_rate_limiter = GCRALimiter(limit=limit, period=60.0)
+    return _user_rate_limiter
+
+
+_exa_rate_limiter: Optional[TokenBucket] = None
+
+
+def get_exa_rate_limiter() -> TokenBucket:
+    """Общий лимитер для всех клиентов Exa API в процессе"""
+    global _exa_rate_limiter
+    if _exa_rate_limiter is None:
+        _exa_rate_limiter = TokenBucket(
+            rate=settings.exa_rate_limit,
+            burst=settings.exa_rate_burst
+        )
+    return _exa_rate_limiter
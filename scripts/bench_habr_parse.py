@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк парсинга страницы поиска Habr
+
+Сравнивает прежний способ (html.parser, дерево всей страницы) с текущим
+parse_search_page (lxml + SoupStrainer только по карточкам статей).
+
+Запуск:
+    python scripts/bench_habr_parse.py [--articles 20] [--repeat 30]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from app.parsers.habr_parser import HabrParser, parse_search_page
+
+
+def build_page(articles: int) -> str:
+    """Синтетическая страница, близкая по объёму к реальной выдаче Habr (~300 КБ)"""
+    now = datetime.now(timezone.utc)
+    noise = "".join(
+        f'<li class="tm-nav__item"><a href="/ru/hub/{i}/">Хаб {i}</a><span>{"x" * 40}</span></li>'
+        for i in range(1500)
+    )
+    scripts = "".join(f"<script>window.__state_{i} = {{'a': {i}, 'b': '{'y' * 200}'}};</script>" for i in range(150))
+    blocks = "".join(
+        f"""
+        <article class="tm-articles-list__item">
+          <div class="tm-article-snippet">
+            <div class="tm-article-snippet__meta"><a class="tm-user-info__username">author{i}</a>
+              <time datetime="{(now - timedelta(hours=i)).strftime('%Y-%m-%dT%H:%M:%S.000Z')}">сегодня</time></div>
+            <h2 class="tm-title"><a href="/ru/articles/{700000 + i}/">ETL для маркетплейсов, часть {i}</a></h2>
+            <div class="tm-article-snippet__lead"><p>{'Описание статьи про API Ozon и Wildberries. ' * 8}</p></div>
+            <div class="tm-article-snippet__hubs">{''.join(f'<a class="tm-hub">hub{j}</a>' for j in range(5))}</div>
+          </div>
+        </article>"""
+        for i in range(articles)
+    )
+    return (
+        f"<html><head>{scripts}</head><body><nav><ul>{noise}</ul></nav>"
+        f"<div class='tm-articles-list'>{blocks}</div><footer>{noise}</footer></body></html>"
+    )
+
+
+def parse_before(html: str, tag: str, max_articles: int):
+    """Прежняя реализация: html.parser и дерево всей страницы"""
+    soup = BeautifulSoup(html, 'html.parser')
+    blocks = soup.select('article.tm-articles-list__item')[:max_articles]
+    return [HabrParser._parse_article_block(block, tag) for block in blocks]
+
+
+def measure(fn, html: str, repeat: int) -> float:
+    """Медианное время одного вызова, мс"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(html)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    html = build_page(args.articles)
+    max_articles = args.articles
+
+    before = parse_before(html, "etl", max_articles)
+    after = parse_search_page(html, "etl", max_articles, features='lxml')
+    assert [a['url'] for a in before] == [a['url'] for a in after], "results differ"
+
+    variants = {
+        "html.parser, full tree (before)": lambda h: parse_before(h, "etl", max_articles),
+        "html.parser + SoupStrainer": lambda h: parse_search_page(h, "etl", max_articles, features='html.parser'),
+        "lxml + SoupStrainer (after)": lambda h: parse_search_page(h, "etl", max_articles, features='lxml'),
+    }
+
+    print(f"Page size: {len(html) / 1024:.0f} KB, articles: {args.articles}, repeat: {args.repeat}")
+    baseline = None
+    for name, fn in variants.items():
+        ms = measure(fn, html, args.repeat)
+        baseline = baseline or ms
+        print(f"  {name:<34} {ms:8.2f} ms/page  (x{baseline / ms:.1f})")
+
+
+if __name__ == "__main__":
+    main()
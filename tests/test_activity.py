@@ -0,0 +1,171 @@
+"""
+Тесты write-behind буфера активности пользователей
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.client_bot.handlers import activity as activity_handler
+from app.config import settings
+from app.database.activity import ActivityBuffer
+from app.database.client_models import BotUser
+from app.database.session import dispose_engines, get_db, get_engine
+
+T0 = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+async def sqlite_db(tmp_path, monkeypatch):
+    """Файловая SQLite с таблицей bot_users вместо DATABASE_URL"""
+    await dispose_engines()
+    monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path / 'test.db'}")
+    BotUser.__table__.create(get_engine())
+    yield
+    await dispose_engines()
+
+
+def add_users(*users):
+    with get_db() as db:
+        for telegram_id, last_activity in users:
+            db.add(BotUser(telegram_id=telegram_id, last_activity=last_activity))
+        db.commit()
+
+
+def last_activity(telegram_id):
+    with get_db() as db:
+        value = db.scalar(select(BotUser.last_activity).where(BotUser.telegram_id == telegram_id))
+    # SQLite не хранит часовой пояс
+    return value.replace(tzinfo=timezone.utc) if value else value
+
+
+class TestActivityBuffer:
+    """Тесты буфера last_activity"""
+
+    def test_touch_keeps_latest(self):
+        """По пользователю хранится только самое позднее касание"""
+        buffer = ActivityBuffer(flush_interval=60)
+
+        buffer.touch(1, T0 + timedelta(minutes=5))
+        buffer.touch(1, T0)
+        buffer.touch(2, T0)
+
+        assert len(buffer) == 2
+        assert buffer._pending[1] == T0 + timedelta(minutes=5)
+
+    @pytest.mark.asyncio
+    async def test_flush_updates_in_one_batch(self, sqlite_db):
+        """Накопленные касания пишутся одним сбросом, буфер очищается"""
+        add_users((1, None), (2, T0))
+        buffer = ActivityBuffer(flush_interval=60)
+        buffer.touch(1, T0 + timedelta(hours=1))
+        buffer.touch(2, T0 + timedelta(hours=2))
+
+        updated = await buffer.flush()
+
+        assert updated == 2
+        assert len(buffer) == 0
+        assert last_activity(1) == T0 + timedelta(hours=1)
+        assert last_activity(2) == T0 + timedelta(hours=2)
+
+    @pytest.mark.asyncio
+    async def test_flush_does_not_move_activity_back(self, sqlite_db):
+        """Старое касание не затирает более свежее значение в БД"""
+        add_users((1, T0 + timedelta(hours=1)))
+        buffer = ActivityBuffer(flush_interval=60)
+        buffer.touch(1, T0)
+
+        assert await buffer.flush() == 0
+        assert last_activity(1) == T0 + timedelta(hours=1)
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_touches(self, monkeypatch):
+        """При ошибке БД касания возвращаются в буфер"""
+        async def broken(*args, **kwargs):
+            raise RuntimeError("db is down")
+
+        monkeypatch.setattr("app.database.activity.run_in_session", broken)
+        buffer = ActivityBuffer(flush_interval=60)
+        buffer.touch(1, T0)
+
+        assert await buffer.flush() == 0
+        assert buffer._pending == {1: T0}
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_rest(self, sqlite_db):
+        """stop() останавливает периодический сброс и пишет остаток"""
+        add_users((1, None))
+        buffer = ActivityBuffer(flush_interval=3600)
+        buffer.start()
+        buffer.touch(1, T0)
+
+        await buffer.stop()
+
+        assert buffer._task is None
+        assert last_activity(1) == T0
+
+    def test_postgres_uses_update_from_values(self):
+        """На PostgreSQL пачка пишется одним UPDATE ... FROM (VALUES ...)"""
+        db = MagicMock()
+        db.get_bind.return_value.dialect.name = 'postgresql'
+        buffer = ActivityBuffer(flush_interval=60)
+
+        buffer.write(db, {1: T0, 2: T0})
+
+        stmt = db.execute.call_args.args[0]
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert sql.startswith("UPDATE bot_users SET last_activity=touches.last_activity FROM (VALUES")
+        assert db.execute.call_count == 1
+        db.commit.assert_called_once()
+
+
+class TestTrackActivity:
+    """Тесты регистрации пользователя в track_activity"""
+
+    @pytest.fixture(autouse=True)
+    def reset_backoff(self, monkeypatch):
+        monkeypatch.setattr(activity_handler, "_register_failures", 0)
+        monkeypatch.setattr(activity_handler, "_register_retry_at", 0.0)
+        monkeypatch.setattr(settings, "activity_register_backoff", 60.0)
+
+    @staticmethod
+    def make_update(telegram_id):
+        update = MagicMock()
+        update.effective_user.id = telegram_id
+        update.effective_user.username = None
+        update.effective_user.first_name = None
+        return update
+
+    @pytest.mark.asyncio
+    async def test_db_error_pauses_registration(self):
+        """После ошибки БД следующие апдейты не ждут базу, касания копятся"""
+        register = AsyncMock(side_effect=ConnectionError("db down"))
+        buffer = ActivityBuffer(flush_interval=60)
+
+        with patch.object(activity_handler, "run_in_session", register), \
+                patch.object(activity_handler, "get_activity_buffer", return_value=buffer):
+            for telegram_id in (1, 2, 3):
+                context = MagicMock(user_data={})
+                await activity_handler.track_activity(self.make_update(telegram_id), context)
+
+        assert register.await_count == 1
+        assert 'db_registered' not in context.user_data
+        assert len(buffer) == 3
+
+    @pytest.mark.asyncio
+    async def test_retries_after_pause(self, monkeypatch):
+        """После паузы регистрация повторяется, успех сбрасывает backoff"""
+        register = AsyncMock(side_effect=[ConnectionError("db down"), None])
+        context = MagicMock(user_data={})
+
+        with patch.object(activity_handler, "run_in_session", register), \
+                patch.object(activity_handler, "get_activity_buffer", return_value=ActivityBuffer(flush_interval=60)):
+            await activity_handler.track_activity(self.make_update(1), context)
+            monkeypatch.setattr(activity_handler, "_register_retry_at", 0.0)
+            await activity_handler.track_activity(self.make_update(1), context)
+
+        assert register.await_count == 2
+        assert context.user_data['db_registered'] is True
+        assert activity_handler._register_failures == 0
@@ -22,3 +22,110 @@ class TestAdminAuthorization:
         from app.telegram.admin_bot import is_admin
 
         assert is_admin(789) is False
+
+
+class TestLivePreview:
+    @pytest.mark.asyncio
+    async def test_edits_are_throttled(self):
+        """Test live preview edits the message at most once per interval"""
+        from app.telegram.admin_bot import LivePreview
+
+        message = MagicMock()
+        message.edit_text = AsyncMock()
+        preview = LivePreview(message, header="Generating...", interval=60)
+
+        for chunk in ["first", " second", " third"]:
+            await preview.on_delta(chunk)
+
+        message.edit_text.assert_awaited_once_with("Generating...\n\nfirst")
+        assert preview.text == "first second third"
+
+    @pytest.mark.asyncio
+    async def test_edit_errors_are_ignored(self):
+        """Test failed edits do not interrupt generation"""
+        from app.telegram.admin_bot import LivePreview
+
+        message = MagicMock()
+        message.edit_text = AsyncMock(side_effect=Exception("Message is not modified"))
+        preview = LivePreview(message, header="Generating...", interval=0)
+
+        await preview.on_delta("text")
+
+        assert preview.text == "text"
+
+
+class TestRegeneratePreview:
+    @pytest.mark.asyncio
+    @patch('app.telegram.admin_bot.settings')
+    async def test_shows_next_alternative_instantly(self, mock_settings):
+        """Test Regenerate swaps in the next pre-generated candidate"""
+        mock_settings.admin_user_ids = [123]
+        from app.telegram.admin_bot import button_callback
+
+        query = MagicMock()
+        query.answer = AsyncMock()
+        query.edit_message_text = AsyncMock()
+        query.from_user.id = 123
+        query.data = "regenerate_preview"
+        update = MagicMock(callback_query=query)
+        context = MagicMock()
+        context.user_data = {'pending_post': {
+            'content': 'first', 'post_type': 'useful', 'sources': [], 'alternatives': ['second']
+        }}
+
+        await button_callback(update, context)
+
+        assert context.user_data['pending_post']['content'] == 'second'
+        assert context.user_data['pending_post']['alternatives'] == []
+        assert 'second' in query.edit_message_text.await_args.args[0]
+
+    @pytest.mark.asyncio
+    @patch('app.telegram.admin_bot.settings')
+    async def test_without_alternatives_asks_for_new_preview(self, mock_settings):
+        """Test Regenerate without alternatives clears the pending post"""
+        mock_settings.admin_user_ids = [123]
+        from app.telegram.admin_bot import button_callback
+
+        query = MagicMock()
+        query.answer = AsyncMock()
+        query.edit_message_text = AsyncMock()
+        query.from_user.id = 123
+        query.data = "regenerate_preview"
+        update = MagicMock(callback_query=query)
+        context = MagicMock()
+        context.user_data = {'pending_post': {'content': 'first', 'post_type': 'useful', 'alternatives': []}}
+
+        await button_callback(update, context)
+
+        assert 'pending_post' not in context.user_data
+        query.edit_message_text.assert_awaited_once_with("Regenerating... Use /preview again.")
+
+
+class TestApprovePreview:
+    @pytest.mark.asyncio
+    @patch('app.utils.post_types.mark_post_published')
+    @patch('app.telegram.publisher.TelegramPublisher')
+    @patch('app.telegram.admin_bot.settings')
+    async def test_approve_records_post_sources(self, mock_settings, mock_publisher, mock_mark):
+        """Test approving a preview runs the same published-post hook as the pipeline"""
+        mock_settings.admin_user_ids = [123]
+        mock_publisher.return_value.publish_post = AsyncMock(return_value={'success': True, 'message_id': 1})
+        from app.telegram.admin_bot import button_callback
+
+        query = MagicMock()
+        query.answer = AsyncMock()
+        query.edit_message_text = AsyncMock()
+        query.from_user.id = 123
+        query.data = "approve_preview"
+        update = MagicMock(callback_query=query)
+        context = MagicMock()
+        source_refs = [{'title': 'Статья', 'content': 'Текст', 'url': 'https://example.com/1'}]
+        context.user_data = {'pending_post': {
+            'content': 'post', 'post_type': 'useful', 'sources': [], 'source_refs': source_refs, 'alternatives': []
+        }}
+
+        with patch('app.main.on_post_published', new=AsyncMock()) as hook:
+            await button_callback(update, context)
+
+        hook.assert_awaited_once_with(source_refs)
+        assert 'pending_post' not in context.user_data
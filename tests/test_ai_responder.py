@@ -0,0 +1,153 @@
+"""
+Тесты AI-ответчика клиентского бота
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.config import settings
+from app.client_bot.services.ai_responder import AIResponder
+from app.client_bot.services.faq_cache import FAQAnswerCache
+from app.client_bot.services.intent_router import IntentRouter
+from app.client_bot.texts.messages import FAQ_AI_FALLBACK, FAQ_COST, FAQ_OFF_TOPIC
+
+
+@pytest.fixture(autouse=True)
+def no_disk_cache(tmp_path, monkeypatch):
+    """Кэш ответов не читает и не пишет data/ проекта, роутер тем выключен"""
+    monkeypatch.setattr(settings, "faq_cache_enabled", False)
+    monkeypatch.setattr(settings, "intent_router_enabled", False)
+    monkeypatch.setattr(settings, "faq_cache_file", str(tmp_path / "faq_answer_cache.json"))
+
+
+def make_response(text):
+    return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+
+def make_responder(create, cache=None, router=None):
+    client = MagicMock()
+    client.messages.create = create
+    return AIResponder(client=client, cache=cache, router=router)
+
+
+class TestAIResponder:
+    """Тесты ответов на вопросы FAQ"""
+
+    @pytest.mark.asyncio
+    async def test_answers_question(self):
+        """Ответ Claude возвращается без лишних пробелов"""
+        create = AsyncMock(return_value=make_response("  Да, работаем с Ozon.  "))
+        responder = make_responder(create)
+
+        answer = await responder.answer_question("Работаете с Ozon?")
+
+        assert answer == "Да, работаем с Ozon."
+        assert create.await_args.kwargs["messages"] == [{"role": "user", "content": "Работаете с Ozon?"}]
+
+    @pytest.mark.asyncio
+    async def test_off_topic_skips_api(self):
+        """Офф-топик отсекается без запроса к API"""
+        create = AsyncMock()
+        responder = make_responder(create)
+
+        assert await responder.answer_question("Какая завтра погода?") == FAQ_OFF_TOPIC
+        create.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_timeout_returns_fallback(self, monkeypatch):
+        """По истечении faq_ai_timeout пользователь сразу получает запасной ответ"""
+        monkeypatch.setattr(settings, "faq_ai_timeout", 0.05)
+
+        async def slow(**kwargs):
+            await asyncio.sleep(10)
+
+        responder = make_responder(slow)
+
+        started = asyncio.get_running_loop().time()
+        answer = await responder.answer_question("Сколько стоит интеграция?")
+
+        assert answer == FAQ_AI_FALLBACK
+        assert asyncio.get_running_loop().time() - started < 1
+
+    @pytest.mark.asyncio
+    async def test_limits_concurrency(self, monkeypatch):
+        """Одновременно к API уходит не больше faq_ai_max_concurrency запросов"""
+        monkeypatch.setattr(settings, "faq_ai_max_concurrency", 2)
+        in_flight = peak = 0
+
+        async def create(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return make_response("ok")
+
+        responder = make_responder(create)
+
+        answers = await asyncio.gather(*(responder.answer_question(f"Вопрос {i}") for i in range(6)))
+
+        assert answers == ["ok"] * 6
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_api_error_returns_apology(self):
+        """Ошибка API не пробрасывается в обработчик"""
+        responder = make_responder(AsyncMock(side_effect=RuntimeError("overloaded")))
+
+        answer = await responder.answer_question("Сколько стоит интеграция?")
+
+        assert "не смог обработать" in answer
+
+    @pytest.mark.asyncio
+    async def test_paraphrase_answered_from_cache(self):
+        """Похожий вопрос получает ответ из кэша без запроса к API"""
+        create = AsyncMock(return_value=make_response("От 30 000 ₽"))
+        responder = make_responder(create, cache=FAQAnswerCache(version="v1"))
+
+        first = await responder.answer_question("Сколько стоит интеграция с Ozon?")
+        second = await responder.answer_question("сколько будет стоить интеграция ozon")
+
+        assert first == second == "От 30 000 ₽"
+        create.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_fallback_is_not_cached(self, monkeypatch):
+        """Запасной ответ по таймауту в кэш не попадает"""
+        monkeypatch.setattr(settings, "faq_ai_timeout", 0.01)
+
+        async def slow(**kwargs):
+            await asyncio.sleep(10)
+
+        cache = FAQAnswerCache(version="v1")
+        responder = make_responder(slow, cache=cache)
+
+        await responder.answer_question("Сколько стоит интеграция?")
+
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_known_topic_answered_locally(self):
+        """Уверенно определённая тема получает готовый раздел FAQ без API"""
+        router = IntentRouter(threshold=2, margin=1)
+        router.set_keywords({"cost": {"стоит": 2}, "timeline": {"срок*": 2}})
+        create = AsyncMock()
+        responder = make_responder(create, router=router)
+
+        assert await responder.answer_question("Сколько стоит?") == FAQ_COST
+        create.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_ambiguous_topic_goes_to_api(self):
+        """Вопрос сразу про две темы отправляется в Claude"""
+        router = IntentRouter(threshold=2, margin=1)
+        router.set_keywords({"cost": {"стоит": 2}, "timeline": {"срок*": 2}})
+        create = AsyncMock(return_value=make_response("Зависит от задачи"))
+        responder = make_responder(create, router=router)
+
+        answer = await responder.answer_question("Сколько стоит и какие сроки?")
+
+        assert answer == "Зависит от задачи"
+        create.assert_awaited_once()
@@ -0,0 +1,115 @@
+"""
+Тесты персистентного кэша
+"""
+import time
+
+from app.utils.cache import SQLiteCache
+
+
+class TestSQLiteCache:
+    """Тесты SQLiteCache"""
+
+    def test_get_returns_stored_value(self, tmp_path):
+        """Сохранённое значение читается обратно"""
+        cache = SQLiteCache(tmp_path / "cache.sqlite3", namespace="test")
+
+        cache.set("key", {"results": [1, 2, 3]})
+
+        assert cache.get("key") == {"results": [1, 2, 3]}
+        assert cache.get("missing") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_expired_entry_is_miss(self, tmp_path):
+        """Запись с истёкшим TTL не возвращается"""
+        cache = SQLiteCache(tmp_path / "cache.sqlite3", namespace="test")
+
+        cache.set("key", "value", ttl=0.01)
+        time.sleep(0.02)
+
+        assert cache.get("key") is None
+
+    def test_lru_eviction(self, tmp_path):
+        """При переполнении вытесняется давно не использованная запись"""
+        cache = SQLiteCache(tmp_path / "cache.sqlite3", namespace="test", max_entries=2)
+
+        cache.set("a", 1)
+        time.sleep(0.01)
+        cache.set("b", 2)
+        time.sleep(0.01)
+        cache.get("a")  # "a" теперь свежее "b"
+        time.sleep(0.01)
+        cache.set("c", 3)
+
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_namespaces_are_isolated(self, tmp_path):
+        """Разные namespace не видят записи друг друга"""
+        path = tmp_path / "cache.sqlite3"
+        first = SQLiteCache(path, namespace="first")
+        second = SQLiteCache(path, namespace="second")
+
+        first.set("key", "value")
+
+        assert second.get("key") is None
+        second.clear()
+        assert first.get("key") == "value"
+
+    def test_make_key_is_stable(self):
+        """Ключ зависит только от содержимого"""
+        assert SQLiteCache.make_key("a", {"x": 1, "y": 2}) == SQLiteCache.make_key("a", {"y": 2, "x": 1})
+        assert SQLiteCache.make_key("a", 1) != SQLiteCache.make_key("a", 2)
+
+    def test_get_does_not_write(self, tmp_path):
+        """Попадание не пишет в БД: время доступа копится в памяти"""
+        cache = SQLiteCache(tmp_path / "cache.sqlite3", namespace="test")
+        cache.set("key", "value")
+        changes = cache._conn.total_changes
+
+        for _ in range(10):
+            cache.get("key")
+
+        assert cache._conn.total_changes == changes
+
+    def test_touches_flushed_on_close(self, tmp_path):
+        """Отметки доступа сохраняются при закрытии и влияют на LRU после перезапуска"""
+        path = tmp_path / "cache.sqlite3"
+        cache = SQLiteCache(path, namespace="test", max_entries=2)
+        cache.set("a", 1)
+        time.sleep(0.01)
+        cache.set("b", 2)
+        time.sleep(0.01)
+        cache.get("a")
+        cache.close()
+
+        reopened = SQLiteCache(path, namespace="test", max_entries=2)
+        reopened.set("c", 3)
+
+        assert reopened.get("b") is None
+        assert reopened.get("a") == 1
+
+    def test_eviction_is_batched(self, tmp_path):
+        """LRU-вытеснение идёт раз в несколько записей, а не на каждый set"""
+        cache = SQLiteCache(tmp_path / "cache.sqlite3", namespace="test", max_entries=100)
+
+        for i in range(104):
+            cache.set(str(i), i)
+
+        assert len(cache) == 104
+        cache.set("last", 0)
+        assert len(cache) == 100
+
+    def test_get_many_and_set_many(self, tmp_path):
+        """Пакетные чтение и запись: одна транзакция, только найденные ключи"""
+        cache = SQLiteCache(tmp_path / "cache.sqlite3", namespace="test")
+
+        cache.set_many({"a": 1, "b": {"x": 2}})
+        cache.set_many({"old": 0}, ttl=0.01)
+        time.sleep(0.02)
+
+        assert cache.get_many(["a", "b", "old", "missing"]) == {"a": 1, "b": {"x": 2}}
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 2
@@ -68,3 +68,60 @@ class TestOzonParser:
         seller_id = extract_seller_id(url)
 
         assert seller_id is None
+
+
+class TestAuditQuota:
+    """Тесты дневного лимита в обработчике аудита"""
+
+    def make_update(self):
+        mock_update = MagicMock()
+        mock_update.effective_user.id = 123
+        mock_update.message.text = "https://www.ozon.ru/seller/test-shop-123456/"
+        mock_update.message.reply_text = AsyncMock()
+        mock_update.message.chat.send_action = AsyncMock()
+        return mock_update
+
+    @pytest.mark.asyncio
+    async def test_limit_reached_skips_parsing(self, monkeypatch):
+        """При исчерпанном лимите парсинг не запускается"""
+        from app.client_bot.handlers import audit
+        from app.client_bot.texts.messages import AUDIT_LIMIT_REACHED
+
+        monkeypatch.setattr(audit, "run_in_session", AsyncMock(return_value=None))
+        parse = AsyncMock()
+        monkeypatch.setattr(audit, "parse_ozon_seller", parse)
+        mock_update = self.make_update()
+
+        await audit.audit_link_handler(mock_update, MagicMock(user_data={}))
+
+        parse.assert_not_called()
+        assert mock_update.message.reply_text.call_args[0][0] == AUDIT_LIMIT_REACHED
+
+    @pytest.mark.asyncio
+    async def test_parse_error_refunds_audit(self, monkeypatch):
+        """Неудавшийся аудит возвращается в лимит"""
+        from app.client_bot.handlers import audit
+        from app.client_bot.services.ozon_parser import OzonParseError
+        from app.database.client_crud import refund_audit
+
+        run_in_session = AsyncMock(return_value=1)
+        monkeypatch.setattr(audit, "run_in_session", run_in_session)
+        monkeypatch.setattr(audit, "parse_ozon_seller", AsyncMock(side_effect=OzonParseError("blocked")))
+
+        await audit.audit_link_handler(self.make_update(), MagicMock(user_data={}))
+
+        assert run_in_session.call_args_list[-1].args == (refund_audit, 123)
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_user_data_without_db(self, monkeypatch):
+        """Без БД лимит считается в user_data"""
+        from app.client_bot.handlers import audit
+
+        monkeypatch.setattr(audit, "run_in_session", AsyncMock(side_effect=RuntimeError("db is down")))
+        monkeypatch.setattr(audit, "parse_ozon_seller", AsyncMock(return_value={}))
+        monkeypatch.setattr(audit, "format_audit_result", lambda data: "result")
+        context = MagicMock(user_data={})
+
+        await audit.audit_link_handler(self.make_update(), context)
+
+        assert context.user_data["audits_today"] == 1
@@ -5,6 +5,9 @@ import pytest
 from datetime import datetime, timezone, timedelta
 from unittest.mock import MagicMock, patch
 
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
 from app.database.client_crud import (
     get_or_create_user,
     create_lead,
@@ -14,7 +17,22 @@ from app.database.client_crud import (
     update_lead_status,
     get_or_create_conversation,
     update_conversation_messages,
+    append_conversation_message,
+    get_recent_messages,
+    get_audits_today,
+    try_consume_audit,
+    refund_audit,
 )
+from app.database.client_models import BotUser, Conversation, ConversationMessage
+
+
+@pytest.fixture
+def sqlite_db():
+    """SQLite с таблицей bot_users (leads не создаётся — ARRAY только в PostgreSQL)"""
+    engine = create_engine("sqlite://")
+    BotUser.__table__.create(engine)
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
 
 
 class TestGetOrCreateUser:
@@ -74,6 +92,111 @@ class TestGetOrCreateUser:
         mock_db.commit.assert_called_once()
 
 
+class TestUpsertUser:
+    """Тесты upsert пользователя на реальной БД"""
+
+    def test_creates_user_with_single_statement(self, sqlite_db):
+        """Новый пользователь создаётся одним INSERT ... RETURNING"""
+        statements = []
+        event.listen(sqlite_db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        user = get_or_create_user(sqlite_db, telegram_id=123, username="test_user", first_name="Test")
+
+        assert user.id is not None
+        assert user.username == "test_user"
+        assert user.audits_today == 0
+        assert len(statements) == 1
+        assert "ON CONFLICT" in statements[0]
+
+    def test_updates_existing_user(self, sqlite_db):
+        """Повторный вызов обновляет данные и возвращает ту же запись"""
+        first = get_or_create_user(sqlite_db, telegram_id=123, username="old", first_name="Test")
+
+        second = get_or_create_user(sqlite_db, telegram_id=123, username="new", first_name=None)
+
+        assert second.id == first.id
+        assert second.username == "new"
+        assert second.first_name == "Test"
+        assert sqlite_db.query(BotUser).count() == 1
+
+    def test_existing_user_in_one_statement(self, sqlite_db):
+        """Повторный upsert — один запрос, last_activity не трогается"""
+        user = get_or_create_user(sqlite_db, telegram_id=123, username="test_user")
+        sqlite_db.query(BotUser).update({BotUser.last_activity: None})
+        sqlite_db.commit()
+        statements = []
+        event.listen(sqlite_db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        user = get_or_create_user(sqlite_db, telegram_id=123, username="test_user")
+
+        assert user.username == "test_user"
+        assert user.last_activity is None
+        assert len(statements) == 1
+        assert statements[0].startswith("INSERT")
+
+    def test_keeps_audit_counters(self, sqlite_db):
+        """Upsert не сбрасывает счётчик аудитов"""
+        user = get_or_create_user(sqlite_db, telegram_id=123)
+        increment_audit_count(sqlite_db, user)
+
+        user = get_or_create_user(sqlite_db, telegram_id=123)
+
+        assert user.audits_today == 1
+
+
+class TestAuditQuota:
+    """Тесты атомарного дневного лимита аудитов"""
+
+    def test_consumes_until_limit(self, sqlite_db):
+        """Аудиты занимаются до лимита, дальше — отказ"""
+        get_or_create_user(sqlite_db, telegram_id=123)
+
+        results = [try_consume_audit(sqlite_db, 123, limit=2) for _ in range(3)]
+
+        assert results == [1, 2, None]
+        assert get_audits_today(sqlite_db, 123) == 2
+
+    def test_single_update_statement(self, sqlite_db):
+        """Проверка и увеличение — один UPDATE ... RETURNING"""
+        get_or_create_user(sqlite_db, telegram_id=123)
+        statements = []
+        event.listen(sqlite_db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        try_consume_audit(sqlite_db, 123, limit=2)
+
+        assert len(statements) == 1
+        assert statements[0].startswith("UPDATE bot_users")
+        assert "RETURNING" in statements[0]
+
+    def test_resets_on_new_day(self, sqlite_db):
+        """Вчерашние аудиты не учитываются, счётчик начинается с 1"""
+        get_or_create_user(sqlite_db, telegram_id=123)
+        sqlite_db.query(BotUser).update({
+            BotUser.audits_today: 2,
+            BotUser.audits_reset_date: datetime.now(timezone.utc) - timedelta(days=1),
+        })
+        sqlite_db.commit()
+
+        assert get_audits_today(sqlite_db, 123) == 0
+        assert try_consume_audit(sqlite_db, 123, limit=2) == 1
+
+    def test_creates_missing_user(self, sqlite_db):
+        """Пользователь без записи в БД создаётся и получает аудит"""
+        assert try_consume_audit(sqlite_db, 123, limit=2) == 1
+        assert sqlite_db.query(BotUser).count() == 1
+
+    def test_refund_returns_audit(self, sqlite_db):
+        """Неудавшийся аудит возвращается в лимит, ниже нуля счётчик не уходит"""
+        get_or_create_user(sqlite_db, telegram_id=123)
+        try_consume_audit(sqlite_db, 123, limit=1)
+
+        refund_audit(sqlite_db, 123)
+        refund_audit(sqlite_db, 123)
+
+        assert get_audits_today(sqlite_db, 123) == 0
+        assert try_consume_audit(sqlite_db, 123, limit=1) == 1
+
+
 class TestCanDoAudit:
     """Тесты проверки лимита аудитов"""
 
@@ -258,40 +381,98 @@ class TestGetOrCreateConversation:
         mock_db.add.assert_not_called()
 
 
-class TestUpdateConversationMessages:
-    """Тесты обновления сообщений диалога"""
+@pytest.fixture
+def conversation_db():
+    """SQLite с таблицами диалогов"""
+    engine = create_engine("sqlite://")
+    for model in (BotUser, Conversation, ConversationMessage):
+        model.__table__.create(engine)
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
 
-    def test_updates_messages(self):
-        """Обновляет сообщения в диалоге"""
-        mock_db = MagicMock()
-        mock_conv = MagicMock()
-        mock_db.query.return_value.filter.return_value.first.return_value = mock_conv
 
+class TestUpdateConversationMessages:
+    """Тесты перезаписи истории диалога"""
+
+    def test_replaces_history_rows(self, conversation_db):
+        """История перезаписывается в conversation_messages, устаревший столбец не трогается"""
+        conversation = get_or_create_conversation(conversation_db, user_id=1)
+        append_conversation_message(conversation_db, conversation.id, "user", "старое")
         new_messages = [
             {"role": "user", "content": "Привет"},
             {"role": "assistant", "content": "Здравствуйте!"}
         ]
 
-        conversation = update_conversation_messages(
-            mock_db,
-            conversation_id=1,
-            messages=new_messages
-        )
+        conversation = update_conversation_messages(conversation_db, conversation.id, messages=new_messages)
 
-        assert conversation.messages == new_messages
-        mock_db.commit.assert_called_once()
+        assert get_recent_messages(conversation_db, conversation.id) == new_messages
+        conversation_db.refresh(conversation)
+        assert conversation.messages == []
 
-    def test_updates_context(self):
+    def test_updates_context(self, conversation_db):
         """Обновляет контекст диалога"""
-        mock_db = MagicMock()
-        mock_conv = MagicMock()
-        mock_db.query.return_value.filter.return_value.first.return_value = mock_conv
+        conversation = get_or_create_conversation(conversation_db, user_id=1)
 
         conversation = update_conversation_messages(
-            mock_db,
-            conversation_id=1,
+            conversation_db,
+            conversation.id,
             messages=[],
             context="Пользователь интересуется аналитикой"
         )
 
+        conversation_db.refresh(conversation)
+        assert conversation.context == "Пользователь интересуется аналитикой"
+
+    def test_missing_conversation(self, conversation_db):
+        """Несуществующий диалог — None"""
+        assert update_conversation_messages(conversation_db, 999, messages=[]) is None
+
+
+class TestConversationMessages:
+    """Тесты построчного хранения сообщений диалога"""
+
+    def test_append_writes_single_row(self, conversation_db):
+        """Новая реплика — один INSERT, история не перезаписывается"""
+        conversation = get_or_create_conversation(conversation_db, user_id=1)
+        append_conversation_message(conversation_db, conversation.id, "user", "Привет")
+        statements = []
+        event.listen(conversation_db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        append_conversation_message(conversation_db, conversation.id, "assistant", "Здравствуйте!")
+
+        inserts = [s for s in statements if s.startswith("INSERT")]
+        assert len(inserts) == 1
+        assert "conversation_messages" in inserts[0]
+        assert not any("messages=" in s for s in statements if s.startswith("UPDATE"))
+
+    def test_append_updates_context(self, conversation_db):
+        """Контекст диалога обновляется вместе с репликой"""
+        conversation = get_or_create_conversation(conversation_db, user_id=1)
+
+        append_conversation_message(
+            conversation_db, conversation.id, "user", "Нужна аналитика",
+            context="Пользователь интересуется аналитикой"
+        )
+
+        conversation_db.refresh(conversation)
         assert conversation.context == "Пользователь интересуется аналитикой"
+
+    def test_recent_messages_window(self, conversation_db):
+        """Возвращается только окно последних сообщений в хронологическом порядке"""
+        conversation = get_or_create_conversation(conversation_db, user_id=1)
+        other = get_or_create_conversation(conversation_db, user_id=2)
+        for i in range(5):
+            append_conversation_message(conversation_db, conversation.id, "user", f"msg {i}")
+        append_conversation_message(conversation_db, other.id, "user", "чужое")
+
+        messages = get_recent_messages(conversation_db, conversation.id, limit=3)
+
+        assert messages == [
+            {"role": "user", "content": "msg 2"},
+            {"role": "user", "content": "msg 3"},
+            {"role": "user", "content": "msg 4"},
+        ]
+
+    def test_recent_messages_empty(self, conversation_db):
+        """Пустой диалог — пустой список"""
+        assert get_recent_messages(conversation_db, conversation_id=42) == []
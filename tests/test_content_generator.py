@@ -0,0 +1,615 @@
+"""
+Тесты генератора контента
+"""
+import asyncio
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.agents.content_generator import (
+    ContentGenerator,
+    GenerationAborted,
+    _IncrementalCleaner,
+    estimate_tokens,
+    rank_source,
+    score_post_quality,
+)
+from app.config import settings
+from app.utils.cache import SQLiteCache
+
+
+SOURCES = [
+    {
+        'title': 'Ozon обновил API',
+        'content': 'Новая версия Seller API',
+        'url': 'https://docs.ozon.ru/api',
+        'source_type': 'api_docs',
+    }
+]
+
+POST_TEXT = "📊 Заголовок\n\nТекст поста с 35% и 3 часа.\n\n━━━━━━━━━━\nА у вас как? 👇\n\n#ozon #api"
+
+
+def make_response(text: str, **usage) -> MagicMock:
+    """Ответ Claude API с одним текстовым блоком"""
+    response = MagicMock()
+    response.content = [MagicMock(text=text)]
+    response.usage = SimpleNamespace(input_tokens=100, output_tokens=50, **usage)
+    return response
+
+
+@pytest.fixture(autouse=True)
+def no_shared_cache(monkeypatch):
+    """Тесты не пишут в общий дисковый кэш оценок"""
+    monkeypatch.setattr("app.agents.content_generator.get_relevance_cache", lambda: None)
+
+
+@pytest.fixture
+async def generator():
+    generator = ContentGenerator(api_key="test-key", model="test-model")
+    yield generator
+    await generator.close()
+
+
+class TestAsyncGeneration:
+    """Тесты асинхронной генерации"""
+
+    @pytest.mark.asyncio
+    async def test_generation_does_not_block_event_loop(self, generator):
+        """Во время генерации другие корутины продолжают выполняться"""
+        async def slow_create(**kwargs):
+            await asyncio.sleep(0.2)
+            return make_response(POST_TEXT)
+
+        generator.client.messages.create = slow_create
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        post = await generator.generate_post(SOURCES)
+        ticker_task.cancel()
+
+        assert post['content'].startswith("📊 Заголовок")
+        assert ticks >= 10
+
+    @pytest.mark.asyncio
+    async def test_evaluate_relevance_awaits_async_client(self, generator):
+        """Оценка релевантности использует асинхронный клиент"""
+        generator.client.messages.create = AsyncMock(
+            return_value=make_response('{"relevance_score": 0.9, "reason": "ok", "is_relevant": true}')
+        )
+
+        result = await generator.evaluate_relevance("Ozon API", "Новая версия")
+
+        assert result['relevance_score'] == 0.9
+        generator.client.messages.create.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_extracts_hashtags(self, generator):
+        """Хештеги извлекаются из текста поста"""
+        generator.client.messages.create = AsyncMock(return_value=make_response(POST_TEXT))
+
+        post = await generator.generate_post(SOURCES)
+
+        assert post['tags'] == ['ozon', 'api']
+
+
+class TestPromptCaching:
+    """Тесты кэширования префикса промпта"""
+
+    @pytest.mark.asyncio
+    async def test_stable_prefix_goes_to_cached_system_block(self, generator, monkeypatch):
+        """Правила и промпт типа поста уходят в system с cache_control"""
+        monkeypatch.setattr(settings, "claude_prompt_cache", True)
+        generator.client.messages.create = AsyncMock(return_value=make_response(POST_TEXT))
+
+        await generator.generate_post(SOURCES, post_type_key="useful", topic_instruction="ТЕМА: API")
+
+        kwargs = generator.client.messages.create.await_args.kwargs
+        [system_block] = kwargs['system']
+        assert system_block['cache_control'] == {"type": "ephemeral"}
+        assert "Ozon обновил API" not in system_block['text']
+
+        user_prompt = kwargs['messages'][0]['content']
+        assert "Ozon обновил API" in user_prompt
+        assert "ТЕМА: API" in user_prompt
+
+    @pytest.mark.asyncio
+    async def test_system_prefix_is_identical_across_requests(self, generator):
+        """Префикс не зависит от источников и темы — иначе кэш не попадёт"""
+        other_sources = [dict(SOURCES[0], title="Wildberries запустил новый API")]
+
+        first = generator._build_request(SOURCES, topic_instruction="ТЕМА: Ozon")
+        second = generator._build_request(other_sources, topic_instruction="ТЕМА: WB")
+
+        assert first['system'] == second['system']
+        assert first['messages'] != second['messages']
+
+    @pytest.mark.asyncio
+    async def test_plain_system_prompt_when_cache_disabled(self, generator, monkeypatch):
+        """При выключенном кэше system передаётся строкой"""
+        monkeypatch.setattr(settings, "claude_prompt_cache", False)
+
+        request = generator._build_request(SOURCES)
+
+        assert isinstance(request['system'], str)
+
+    @pytest.mark.asyncio
+    async def test_cache_usage_is_reported(self, generator):
+        """Токены чтения/записи кэша попадают в метаданные поста"""
+        generator.client.messages.create = AsyncMock(
+            return_value=make_response(POST_TEXT, cache_read_input_tokens=4000)
+        )
+
+        post = await generator.generate_post(SOURCES)
+
+        usage = post['metadata']['usage']
+        assert usage['cache_read_input_tokens'] == 4000
+        assert usage['cache_creation_input_tokens'] == 0
+
+
+def make_sources(count: int) -> list:
+    return [
+        {'title': f'Источник {i}', 'content': f'Контент {i}', 'url': f'https://example.com/{i}', 'metadata': {}}
+        for i in range(count)
+    ]
+
+
+def batch_scorer(score_for_title):
+    """Фейковый messages.create, оценивающий пакет по заголовкам из промпта"""
+    async def create(**kwargs):
+        prompt = kwargs['messages'][0]['content']
+        titles = re.findall(r'^(\d+)\. (.+)$', prompt, re.MULTILINE)
+        items = [
+            {"id": int(i), "relevance_score": score_for_title(title), "reason": "ok"}
+            for i, title in titles
+        ]
+        return make_response(json.dumps(items, ensure_ascii=False))
+    return create
+
+
+class TestBatchRelevanceScoring:
+    """Тесты пакетной оценки релевантности"""
+
+    @pytest.mark.asyncio
+    async def test_one_request_per_batch(self, generator):
+        """Источники оцениваются пакетами, а не по одному"""
+        create = AsyncMock(side_effect=batch_scorer(lambda title: 0.8))
+        generator.client.messages.create = create
+        sources = make_sources(25)
+
+        await generator.score_sources(sources, batch_size=10)
+
+        assert create.await_count == 3
+        assert all(s['relevance_score'] == 0.8 for s in sources)
+        assert sources[0]['metadata']['relevance_reason'] == "ok"
+
+    @pytest.mark.asyncio
+    async def test_batches_respect_concurrency_limit(self, generator):
+        """Одновременно выполняется не больше max_concurrency запросов"""
+        in_flight = 0
+        max_in_flight = 0
+        score = batch_scorer(lambda title: 0.5)
+
+        async def create(**kwargs):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.02)
+            in_flight -= 1
+            return await score(**kwargs)
+
+        generator.client.messages.create = create
+
+        await generator.score_sources(make_sources(10), batch_size=2, max_concurrency=2)
+
+        assert max_in_flight == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_keeps_previous_scores(self, generator):
+        """Неудачный пакет не ломает остальные и не затирает оценки"""
+        calls = 0
+        score = batch_scorer(lambda title: 0.9)
+
+        async def create(**kwargs):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise RuntimeError("API error")
+            return await score(**kwargs)
+
+        generator.client.messages.create = create
+        sources = make_sources(4)
+        for source in sources:
+            source['relevance_score'] = 0.4
+
+        await generator.score_sources(sources, batch_size=2, max_concurrency=1)
+
+        assert [s['relevance_score'] for s in sources] == [0.4, 0.4, 0.9, 0.9]
+
+    @pytest.mark.asyncio
+    async def test_select_sources_returns_top_n_above_threshold(self, generator):
+        """В генерацию уходят лучшие источники выше порога"""
+        scores = {f'Источник {i}': i / 10 for i in range(10)}
+        generator.client.messages.create = batch_scorer(scores.get)
+
+        selected = await generator.select_sources(make_sources(10), top_n=3, min_score=0.5)
+
+        assert [s['title'] for s in selected] == ['Источник 9', 'Источник 8', 'Источник 7']
+
+    @pytest.mark.asyncio
+    async def test_select_sources_falls_back_when_nothing_relevant(self, generator):
+        """Если порог не прошёл никто, берутся просто лучшие"""
+        scores = {'Источник 0': 0.1, 'Источник 1': 0.3, 'Источник 2': 0.2}
+        generator.client.messages.create = batch_scorer(scores.get)
+
+        selected = await generator.select_sources(make_sources(3), top_n=2, min_score=0.7)
+
+        assert [s['title'] for s in selected] == ['Источник 1', 'Источник 2']
+
+
+class TestRelevanceCache:
+    """Тесты кэша оценок релевантности"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = SQLiteCache(tmp_path / "cache.sqlite3", namespace="relevance")
+        yield cache
+        cache.close()
+
+    @pytest.mark.asyncio
+    async def test_repeat_run_scores_only_new_sources(self, cache):
+        """Повторный запуск отправляет в LLM только новые источники"""
+        create = AsyncMock(side_effect=batch_scorer(lambda title: 0.8))
+        generator = ContentGenerator(api_key="test-key", model="test-model", relevance_cache=cache)
+        generator.client.messages.create = create
+
+        await generator.score_sources(make_sources(3))
+        sources = make_sources(4)
+        await generator.score_sources(sources)
+
+        assert create.await_count == 2
+        second_prompt = create.await_args.kwargs['messages'][0]['content']
+        assert "Источник 3" in second_prompt
+        assert "Источник 0" not in second_prompt
+        assert all(s['relevance_score'] == 0.8 for s in sources)
+        await generator.close()
+
+    @pytest.mark.asyncio
+    async def test_prompt_change_invalidates_scores(self, cache, monkeypatch):
+        """После изменения промпта оценки пересчитываются"""
+        create = AsyncMock(side_effect=batch_scorer(lambda title: 0.8))
+        generator = ContentGenerator(api_key="test-key", model="test-model", relevance_cache=cache)
+        generator.client.messages.create = create
+
+        await generator.score_sources(make_sources(2))
+        monkeypatch.setattr("app.agents.content_generator.RELEVANCE_PROMPT_VERSION", "changed")
+        await generator.score_sources(make_sources(2))
+
+        assert create.await_count == 2
+        await generator.close()
+
+    @pytest.mark.asyncio
+    async def test_single_evaluation_shares_cache(self, cache):
+        """evaluate_relevance использует оценки пакетного скорера"""
+        create = AsyncMock(side_effect=batch_scorer(lambda title: 0.9))
+        generator = ContentGenerator(api_key="test-key", model="test-model", relevance_cache=cache)
+        generator.client.messages.create = create
+
+        [source] = await generator.score_sources(make_sources(1))
+        result = await generator.evaluate_relevance(source['title'], source['content'])
+
+        assert result == {'relevance_score': 0.9, 'reason': 'ok', 'is_relevant': True}
+        assert create.await_count == 1
+        await generator.close()
+
+
+class FakeStream:
+    """Замена messages.stream: отдаёт текст заданными дельтами"""
+
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.consumed = 0
+        self.closed = False
+
+    def __call__(self, **kwargs):
+        self.kwargs = kwargs
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+    @property
+    async def text_stream(self):
+        for delta in self.deltas:
+            self.consumed += 1
+            yield delta
+
+    async def get_final_message(self):
+        return SimpleNamespace(usage=SimpleNamespace(input_tokens=100, output_tokens=50))
+
+
+def split_deltas(text: str, size: int = 7) -> list:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestIncrementalCleaner:
+    """Тесты построчной очистки потока"""
+
+    def clean(self, text: str, **kwargs) -> str:
+        cleaner = _IncrementalCleaner(max_length=10_000, **kwargs)
+        chunks = [chunk for delta in split_deltas(text, 3) for chunk in cleaner.feed(delta)]
+        return "".join(chunks + cleaner.finish())
+
+    @pytest.mark.parametrize("raw", [
+        POST_TEXT,
+        "Вот пост для канала:\n\n" + POST_TEXT,
+        "ПОСТ: " + POST_TEXT,
+        "---\n" + POST_TEXT + "\n---",
+        POST_TEXT.replace("\n\n", "\n\n\n\n"),
+    ])
+    def test_matches_batch_cleaning(self, raw, generator):
+        """Потоковая очистка даёт тот же текст, что и _clean_post"""
+        assert self.clean(raw) == generator._clean_post(raw)
+
+    def test_aborts_on_preamble_when_requested(self):
+        """При abort_on_preamble вступление прерывает генерацию"""
+        with pytest.raises(GenerationAborted):
+            self.clean("Конечно! Вот пост:\n" + POST_TEXT, abort_on_preamble=True)
+
+    def test_aborts_on_runaway_length(self):
+        """Превышение длины прерывает генерацию"""
+        cleaner = _IncrementalCleaner(max_length=50)
+
+        with pytest.raises(GenerationAborted):
+            for _ in range(10):
+                cleaner.feed("Очень длинная строка поста без конца\n")
+
+
+class TestStreamingGeneration:
+    """Тесты потоковой генерации"""
+
+    @pytest.mark.asyncio
+    async def test_stream_post_yields_cleaned_text(self, generator):
+        """stream_post отдаёт очищенный текст по кускам"""
+        generator.client.messages.stream = FakeStream(split_deltas("Вот пост:\n" + POST_TEXT))
+
+        chunks = [chunk async for chunk in generator.stream_post(SOURCES)]
+
+        assert len(chunks) > 1
+        assert "".join(chunks) == POST_TEXT
+
+    @pytest.mark.asyncio
+    async def test_stream_is_closed_on_abort(self, generator, monkeypatch):
+        """При обрыве по длине стрим закрывается, не дочитывая ответ"""
+        monkeypatch.setattr(settings, "max_post_length", 40)
+        monkeypatch.setattr(settings, "stream_max_length_factor", 1.0)
+        stream = FakeStream(["Строка поста номер N\n"] * 100)
+        generator.client.messages.stream = stream
+
+        with pytest.raises(GenerationAborted):
+            async for _ in generator.stream_post(SOURCES):
+                pass
+
+        assert stream.closed
+        assert stream.consumed < 100
+
+    @pytest.mark.asyncio
+    async def test_generate_post_with_on_delta(self, generator):
+        """generate_post с on_delta стримит и возвращает обычный результат"""
+        generator.client.messages.stream = FakeStream(split_deltas(POST_TEXT))
+        received = []
+
+        async def on_delta(chunk):
+            received.append(chunk)
+
+        post = await generator.generate_post(SOURCES, on_delta=on_delta)
+
+        assert "".join(received) == POST_TEXT
+        assert post['content'] == POST_TEXT
+        assert post['tags'] == ['ozon', 'api']
+        assert post['metadata']['usage']['output_tokens'] == 50
+
+
+GOOD_POST = (
+    "📊 Как мы сократили время отчётов\n\n"
+    + "Раньше отчёт по Ozon собирался вручную. " * 10
+    + "\nЭкономия — 35% времени и 12 000 ₽ в месяц, отчёт за 3 часа.\n\n"
+    "━━━━━━━━━━\n"
+    "Что сделать:\n• Подключить API\n• Настроить выгрузку\n\n"
+    "А вы как собираете отчёты? 👇\n\n"
+    "#ozon #аналитика #автоматизация"
+)
+BAD_POST = "Пост без цифр и структуры."
+
+
+class TestPostQuality:
+    """Тесты локальной оценки поста"""
+
+    def test_good_post_passes_all_checks(self):
+        """Пост по всем требованиям получает максимальную оценку"""
+        quality = score_post_quality(GOOD_POST)
+
+        assert quality['checks'] == {
+            'length': 1.0, 'numbers': 1.0, 'divider': 1.0, 'question': 1.0, 'hashtags': 1.0
+        }
+        assert quality['score'] == pytest.approx(1.0)
+
+    def test_bad_post_scores_lower(self):
+        """Пост без цифр, разделителя и хештегов оценивается ниже"""
+        assert score_post_quality(BAD_POST)['score'] < score_post_quality(GOOD_POST)['score']
+
+    def test_question_before_cta_is_found(self):
+        """Вопрос перед хештегами засчитывается и при CTA-блоке в конце"""
+        with_cta = GOOD_POST + "\n\n━━━━━━━━━━\nНужна автоматизация? Пишите в бот."
+
+        assert score_post_quality(with_cta)['checks']['question'] == 1.0
+
+
+class TestCandidates:
+    """Тесты генерации нескольких вариантов"""
+
+    @pytest.fixture
+    def no_prompt_cache(self, monkeypatch):
+        monkeypatch.setattr(settings, "claude_prompt_cache", False)
+
+    @pytest.mark.asyncio
+    async def test_candidates_are_generated_concurrently_and_ranked(self, generator, no_prompt_cache):
+        """K вариантов генерируются параллельно и сортируются по оценке"""
+        texts = [BAD_POST, GOOD_POST, POST_TEXT]
+        in_flight = 0
+        max_in_flight = 0
+
+        async def create(**kwargs):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.02)
+            in_flight -= 1
+            return make_response(texts.pop(0))
+
+        generator.client.messages.create = create
+
+        candidates = await generator.generate_candidates(SOURCES, k=3)
+
+        assert max_in_flight == 3
+        assert candidates[0]['content'] == GOOD_POST
+        assert candidates[-1]['content'] == BAD_POST
+        scores = [c['metadata']['quality']['score'] for c in candidates]
+        assert scores == sorted(scores, reverse=True)
+
+    @pytest.mark.asyncio
+    async def test_failed_candidates_are_skipped(self, generator, no_prompt_cache):
+        """Ошибка одного варианта не ломает остальные"""
+        generator.client.messages.create = AsyncMock(
+            side_effect=[RuntimeError("API error"), make_response(POST_TEXT)]
+        )
+
+        candidates = await generator.generate_candidates(SOURCES, k=2)
+
+        assert [c['content'] for c in candidates] == [POST_TEXT]
+
+    @pytest.mark.asyncio
+    async def test_all_failed_raises(self, generator, no_prompt_cache):
+        """Если не удался ни один вариант — исключение"""
+        generator.client.messages.create = AsyncMock(side_effect=RuntimeError("API error"))
+
+        with pytest.raises(RuntimeError):
+            await generator.generate_candidates(SOURCES, k=2)
+
+    @pytest.mark.asyncio
+    async def test_first_candidate_streams_preview(self, generator):
+        """С on_delta первый вариант стримится, остальные — обычные запросы"""
+        generator.client.messages.stream = FakeStream(split_deltas(POST_TEXT))
+        generator.client.messages.create = AsyncMock(return_value=make_response(GOOD_POST))
+        received = []
+
+        async def on_delta(chunk):
+            received.append(chunk)
+
+        candidates = await generator.generate_candidates(SOURCES, k=3, on_delta=on_delta)
+
+        assert "".join(received) == POST_TEXT
+        assert generator.client.messages.create.await_count == 2
+        assert len(candidates) == 3
+
+    @pytest.mark.asyncio
+    async def test_rest_start_after_first_output_with_prompt_cache(self, generator, monkeypatch):
+        """С кэшем промпта остальные варианты стартуют после первой дельты первого"""
+        monkeypatch.setattr(settings, "claude_prompt_cache", True)
+        stream = FakeStream(split_deltas(POST_TEXT))
+        generator.client.messages.stream = stream
+        consumed_at_create = []
+
+        async def create(**kwargs):
+            consumed_at_create.append(stream.consumed)
+            return make_response(GOOD_POST)
+
+        generator.client.messages.create = create
+
+        candidates = await generator.generate_candidates(SOURCES, k=3)
+
+        assert len(consumed_at_create) == 2
+        assert all(consumed >= 1 for consumed in consumed_at_create)
+        assert len(candidates) == 3
+
+    @pytest.mark.asyncio
+    async def test_failed_first_candidate_does_not_block_rest(self, generator, monkeypatch):
+        """Ошибка первого (стримящегося) варианта не блокирует остальные"""
+        monkeypatch.setattr(settings, "claude_prompt_cache", True)
+
+        def failing_stream(**kwargs):
+            raise RuntimeError("API error")
+
+        generator.client.messages.stream = failing_stream
+        generator.client.messages.create = AsyncMock(return_value=make_response(GOOD_POST))
+
+        candidates = await generator.generate_candidates(SOURCES, k=3)
+
+        assert [c['content'] for c in candidates] == [GOOD_POST, GOOD_POST]
+
+
+def make_packing_source(i: int, **overrides) -> dict:
+    source = {
+        'title': f'Статья {i}',
+        'content': f'Уникальный текст номер {i} ' + ' '.join(f'слово{i}_{j}' for j in range(80)),
+        'url': f'https://example.com/{i}',
+        'source_type': 'exa_news',
+        'relevance_score': 0.5,
+        'published_at': datetime.now(timezone.utc) - timedelta(days=1),
+    }
+    source.update(overrides)
+    return source
+
+
+class TestSourcePacking:
+    """Тесты упаковки источников в бюджет токенов"""
+
+    def test_respects_token_budget(self, generator, monkeypatch):
+        """Блок источников не превышает бюджет, сколько бы их ни было"""
+        monkeypatch.setattr(settings, "sources_token_budget", 600)
+        sources = [make_packing_source(i) for i in range(30)]
+
+        text = generator._prepare_sources_text(sources)
+
+        assert estimate_tokens(text) <= 600
+        assert 0 < text.count("URL:") < 30
+
+    def test_best_sources_go_first(self, generator):
+        """Релевантные свежие источники идут раньше старых и слабых"""
+        sources = [
+            make_packing_source(0, relevance_score=0.2, published_at="2020-01-01T00:00:00.000Z"),
+            make_packing_source(1, relevance_score=0.9, source_type='api_docs'),
+            make_packing_source(2, relevance_score=0.6, published_at=None),
+        ]
+
+        text = generator._prepare_sources_text(sources)
+
+        assert text.index("Статья 1") < text.index("Статья 2") < text.index("Статья 0")
+        assert text.startswith("1. [api_docs] Статья 1")
+
+    def test_near_duplicates_are_dropped(self, generator):
+        """Почти одинаковые сниппеты попадают в промпт один раз"""
+        original = make_packing_source(0, relevance_score=0.9)
+        duplicate = dict(original, url='https://mirror.example.com/0', relevance_score=0.8)
+
+        text = generator._prepare_sources_text([original, duplicate, make_packing_source(1)])
+
+        assert "mirror.example.com" not in text
+        assert text.count("URL:") == 2
+
+    def test_rank_source_handles_missing_fields(self):
+        """Источник без оценки, даты и типа получает средний ранг"""
+        assert rank_source({}) == pytest.approx(0.5)
@@ -0,0 +1,108 @@
+"""
+Тесты поиска почти-дубликатов
+"""
+import pytest
+
+from app.utils.dedup import LSHIndex, MinHasher, filter_near_duplicates, remember_used_sources
+
+
+NEWS = (
+    "Ozon с 1 апреля меняет комиссии для продавцов в категориях электроника и одежда. "
+    "Новые тарифы будут действовать для схем FBO и FBS, продавцам рекомендуют "
+    "пересчитать юнит-экономику и обновить цены до вступления изменений в силу."
+)
+REPRINT = NEWS.replace("Ozon с 1 апреля", "Маркетплейс Ozon с 1 апреля") + " Источник: пресс-служба."
+OTHER = (
+    "Wildberries запустил новый API статистики: методы отчётов о продажах теперь "
+    "возвращают данные по складам и поддерживают пагинацию по дате изменения."
+)
+
+
+def make_source(content: str, url: str, title: str = "Новость") -> dict:
+    return {'title': title, 'content': content, 'url': url}
+
+
+class TestMinHash:
+    """Тесты MinHash-сигнатур"""
+
+    def test_similar_texts_have_close_signatures(self):
+        """Перепечатка близка к оригиналу, другая новость — нет"""
+        hasher = MinHasher(num_perm=128)
+
+        original = hasher.signature(NEWS)
+
+        assert hasher.similarity(original, hasher.signature(REPRINT)) > 0.7
+        assert hasher.similarity(original, hasher.signature(OTHER)) < 0.2
+
+    def test_signature_is_stable_across_instances(self):
+        """Сигнатуры воспроизводимы — их можно хранить на диске"""
+        assert MinHasher().signature(NEWS) == MinHasher().signature(NEWS)
+
+
+class TestLSHIndex:
+    """Тесты LSH-индекса"""
+
+    def test_finds_near_duplicate(self):
+        """Запрос находит похожий текст и не находит другой"""
+        index = LSHIndex(threshold=0.6)
+        index.add("news", index.hasher.signature(NEWS))
+
+        assert [key for key, _ in index.query(index.hasher.signature(REPRINT))] == ["news"]
+        assert index.query(index.hasher.signature(OTHER)) == []
+
+    def test_evicts_oldest_entries(self):
+        """Сверх max_entries вытесняются самые старые записи"""
+        index = LSHIndex(max_entries=2)
+        for key in ["a", "b", "c"]:
+            index.add(key, index.hasher.signature(f"{key} {NEWS}"))
+
+        assert len(index) == 2
+        assert "a" not in index
+
+    def test_save_and_load(self, tmp_path):
+        """Индекс переживает перезапуск"""
+        path = tmp_path / "index.json"
+        index = LSHIndex(threshold=0.6)
+        index.add("news", index.hasher.signature(NEWS))
+        index.save(path)
+
+        restored = LSHIndex(threshold=0.6)
+        restored.load(path)
+
+        assert restored.query(restored.hasher.signature(REPRINT))
+
+    def test_rejects_incompatible_bands(self):
+        """num_perm должно делиться на число полос"""
+        with pytest.raises(ValueError):
+            LSHIndex(hasher=MinHasher(num_perm=64), bands=10)
+
+
+class TestFilterNearDuplicates:
+    """Тесты фильтрации источников"""
+
+    def test_keeps_first_of_similar_sources(self, monkeypatch):
+        """Из группы похожих остаётся первый по приоритету"""
+        monkeypatch.setattr("app.utils.dedup.settings.dedup_threshold", 0.6)
+        sources = [
+            make_source(NEWS, "https://docs.ozon.ru/news"),
+            make_source(OTHER, "https://wb.ru/api"),
+            make_source(REPRINT, "https://aggregator.ru/ozon"),
+        ]
+
+        unique = filter_near_duplicates(sources)
+
+        assert [s['url'] for s in unique] == ["https://docs.ozon.ru/news", "https://wb.ru/api"]
+
+    def test_skips_sources_used_in_past_posts(self, monkeypatch, tmp_path):
+        """Источники, похожие на использованные ранее, отбрасываются"""
+        monkeypatch.setattr("app.utils.dedup.settings.dedup_threshold", 0.6)
+        used_index = LSHIndex(threshold=0.6)
+        remember_used_sources([make_source(NEWS, "https://docs.ozon.ru/news")], used_index, tmp_path / "used.json")
+
+        unique = filter_near_duplicates(
+            [make_source(REPRINT, "https://aggregator.ru/ozon"), make_source(OTHER, "https://wb.ru/api")],
+            used_index=used_index
+        )
+
+        assert [s['url'] for s in unique] == ["https://wb.ru/api"]
+        assert (tmp_path / "used.json").exists()
@@ -0,0 +1,201 @@
+"""
+Тесты Exa парсера
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.parsers.exa_searcher import ExaSearcher
+from app.utils.cache import SQLiteCache
+from app.utils.rate_limiter import TokenBucket
+
+
+@pytest.fixture(autouse=True)
+def no_shared_cache(monkeypatch):
+    """Тесты не должны писать в общий кэш data/exa_cache.sqlite3"""
+    monkeypatch.setattr("app.parsers.exa_searcher.get_exa_cache", lambda: None)
+
+
+def make_searcher(handler, cache=None) -> ExaSearcher:
+    """ExaSearcher с подменённым транспортом вместо реального API"""
+    client = httpx.AsyncClient(
+        base_url=ExaSearcher.BASE_URL,
+        transport=httpx.MockTransport(handler)
+    )
+    return ExaSearcher(api_key="test-key", client=client, cache=cache)
+
+
+def exa_response(request: httpx.Request) -> httpx.Response:
+    """Ответ Exa с одним результатом на запрос"""
+    query = json.loads(request.content)["query"]
+    return httpx.Response(200, json={
+        "results": [{
+            "title": f"Result for {query}",
+            "url": f"https://example.com/{abs(hash(query))}",
+            "text": "Текст статьи",
+            "score": 0.9,
+        }]
+    })
+
+
+class TestSharedClient:
+    """Тесты общего HTTP клиента"""
+
+    @pytest.mark.asyncio
+    async def test_reuses_single_client_for_all_queries(self):
+        """Все запросы идут через один клиент"""
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return exa_response(request)
+
+        searcher = make_searcher(handler)
+        client = searcher.client
+
+        await searcher.search_latest_news("ozon", num_results=1)
+        await searcher.search_technical_content("wildberries", num_results=1)
+
+        assert searcher.client is client
+        assert len(requests) == 2
+        assert all(r.url.path == "/search" for r in requests)
+
+        await searcher.close()
+
+    @pytest.mark.asyncio
+    async def test_close_via_context_manager(self):
+        """Клиент закрывается при выходе из async with"""
+        async with make_searcher(exa_response) as searcher:
+            results = await searcher.search_latest_news("ozon", num_results=1)
+
+        assert len(results) == 1
+        assert searcher.client.is_closed
+
+    def test_default_client_has_connection_pool(self):
+        """По умолчанию создаётся клиент с base_url и ключом в заголовках"""
+        searcher = ExaSearcher(api_key="test-key")
+
+        assert str(searcher.client.base_url).startswith(ExaSearcher.BASE_URL)
+        assert searcher.client.headers["x-api-key"] == "test-key"
+
+    @pytest.mark.asyncio
+    async def test_api_error_returns_empty_list(self):
+        """Ошибка API не роняет поиск"""
+        searcher = make_searcher(lambda request: httpx.Response(500, text="boom"))
+
+        results = await searcher.search_latest_news("ozon")
+
+        assert results == []
+        await searcher.close()
+
+
+class TestConcurrentFanOut:
+    """Тесты параллельных запросов"""
+
+    @pytest.mark.asyncio
+    async def test_queries_run_concurrently(self):
+        """Запросы выполняются параллельно, а не последовательно"""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def handler(request):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return exa_response(request)
+
+        searcher = make_searcher(handler)
+        searcher.rate_limiter = TokenBucket(rate=100, burst=10)
+
+        queries = [f"query {i}" for i in range(10)]
+        results = await searcher.search_all_sources(queries, num_results_per_query=1)
+
+        assert len(results) == 10
+        assert max_in_flight > 1
+        # Порядок результатов совпадает с порядком запросов
+        assert results[0]["metadata"]["search_query"] == "query 0"
+
+        await searcher.close()
+
+    @pytest.mark.asyncio
+    async def test_rate_limiter_is_applied(self):
+        """Каждый запрос проходит через лимитер"""
+        searcher = make_searcher(exa_response)
+        searcher.rate_limiter = TokenBucket(rate=100, burst=10)
+        acquired = 0
+        original_acquire = searcher.rate_limiter.acquire
+
+        async def counting_acquire(tokens=1.0):
+            nonlocal acquired
+            acquired += 1
+            await original_acquire(tokens)
+
+        searcher.rate_limiter.acquire = counting_acquire
+
+        await searcher.search_api_documentation(num_results=1)
+
+        assert acquired == 5
+        await searcher.close()
+
+
+class TestResponseCache:
+    """Тесты дискового кэша ответов"""
+
+    @pytest.mark.asyncio
+    async def test_repeated_query_served_from_cache(self, tmp_path):
+        """Повторный запрос не идёт в API"""
+        calls = 0
+
+        def handler(request):
+            nonlocal calls
+            calls += 1
+            return exa_response(request)
+
+        cache = SQLiteCache(tmp_path / "cache.sqlite3", namespace="exa_search")
+        searcher = make_searcher(handler, cache=cache)
+
+        first = await searcher.search_latest_news("ozon", num_results=1)
+        second = await searcher.search_latest_news("ozon", num_results=1)
+
+        assert calls == 1
+        assert first == second
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+        await searcher.close()
+
+    @pytest.mark.asyncio
+    async def test_cache_survives_new_searcher(self, tmp_path):
+        """Кэш лежит на диске и переживает пересоздание ExaSearcher"""
+        calls = 0
+
+        def handler(request):
+            nonlocal calls
+            calls += 1
+            return exa_response(request)
+
+        path = tmp_path / "cache.sqlite3"
+
+        async with make_searcher(handler, cache=SQLiteCache(path, "exa_search")) as searcher:
+            await searcher.search_technical_content("etl", num_results=1)
+
+        async with make_searcher(handler, cache=SQLiteCache(path, "exa_search")) as searcher:
+            results = await searcher.search_technical_content("etl", num_results=1)
+
+        assert calls == 1
+        assert len(results) == 1
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self, tmp_path):
+        """Ошибочные ответы не кэшируются"""
+        cache = SQLiteCache(tmp_path / "cache.sqlite3", namespace="exa_search")
+        searcher = make_searcher(lambda request: httpx.Response(500, text="boom"), cache=cache)
+
+        await searcher.search_latest_news("ozon")
+
+        assert len(cache) == 0
+        await searcher.close()
@@ -0,0 +1,121 @@
+"""
+Тесты кэша ответов FAQ
+"""
+import pytest
+
+from app.client_bot.services.faq_cache import FAQAnswerCache, key_terms, knowledge_version, normalize_question
+
+
+class TestNormalizeQuestion:
+    """Тесты нормализации вопросов"""
+
+    def test_drops_stopwords_and_endings(self):
+        """Регистр, стоп-слова и окончания не влияют на ключ"""
+        assert normalize_question("Сколько стоит интеграция с Ozon?") == \
+            normalize_question("сколько стоит интеграцию с OZON")
+
+    def test_empty_question(self):
+        """Вопрос из одних стоп-слов нормализуется в пустую строку"""
+        assert normalize_question("А вы?") == ""
+
+    def test_key_terms(self):
+        """Площадки, системы, числа и отрицания попадают в key_terms в одном написании"""
+        assert key_terms(normalize_question("Нельзя ли выгрузить из 1С в Озон за 5 дней?")) == \
+            {'не', '1c', 'ozon', '5'}
+        assert key_terms(normalize_question("Работаете с Wildberries?")) == \
+            key_terms(normalize_question("Работаете с ВБ?"))
+
+
+class TestFAQAnswerCache:
+    """Тесты поиска похожих вопросов"""
+
+    def test_returns_answer_for_paraphrase(self):
+        """Перефразированный вопрос получает сохранённый ответ"""
+        cache = FAQAnswerCache(version="v1")
+        cache.set("Сколько стоит интеграция с Ozon?", "От 30 000 ₽")
+
+        assert cache.get("Сколько будет стоить интеграция Ozon") == "От 30 000 ₽"
+        assert cache.hits == 1
+
+    def test_misses_different_question(self):
+        """Непохожий вопрос не получает чужой ответ"""
+        cache = FAQAnswerCache(version="v1")
+        cache.set("Сколько стоит интеграция с Ozon?", "От 30 000 ₽")
+
+        assert cache.get("Какие сроки разработки?") is None
+        assert cache.misses == 1
+
+    @pytest.mark.parametrize("cached, question", [
+        ("Сколько стоит интеграция с Ozon?", "Сколько стоит интеграция с WB?"),
+        ("Можно ли выгружать остатки из 1С в Ozon?", "Можно ли выгружать остатки из МойСклад в Ozon?"),
+        ("Можно ли выгружать остатки из 1С в Ozon?", "Нельзя ли выгружать остатки из 1С в Ozon?"),
+        ("Можно ли подключить Ozon?", "Не можно ли подключить Ozon?"),
+        ("Сделаете отчёт за 3 дня?", "Сделаете отчёт за 5 дней?"),
+    ])
+    def test_different_key_terms_miss(self, cached, question):
+        """Похожий текст с другой площадкой, системой, числом или отрицанием — промах"""
+        cache = FAQAnswerCache(version="v1")
+        cache.set(cached, "ответ")
+
+        assert cache.get(question) is None
+
+    def test_key_term_spellings_hit(self):
+        """Разные написания одной площадки считаются одним вопросом"""
+        cache = FAQAnswerCache(version="v1")
+        cache.set("Сколько стоит интеграция с Wildberries?", "От 30 000 ₽")
+
+        assert cache.get("Сколько стоит интеграция с ВБ?") == "От 30 000 ₽"
+
+    def test_lru_eviction(self):
+        """Сверх max_entries вытесняется давно не использованный вопрос"""
+        cache = FAQAnswerCache(version="v1", max_entries=2)
+        cache.set("Сколько стоит интеграция?", "цена")
+        cache.set("Какие сроки разработки?", "сроки")
+        cache.get("Сколько стоит интеграция?")
+
+        cache.set("Работаете с Яндекс Маркетом?", "да")
+
+        assert len(cache) == 2
+        assert cache.get("Какие сроки разработки?") is None
+        assert cache.get("Сколько стоит интеграция?") == "цена"
+
+    def test_save_and_load(self, tmp_path):
+        """Ответы переживают перезапуск при той же базе знаний"""
+        path = tmp_path / "faq.json"
+        cache = FAQAnswerCache(version=knowledge_version("база"))
+        cache.set("Сколько стоит интеграция?", "цена")
+        cache.save(path)
+
+        restored = FAQAnswerCache(version=knowledge_version("база"))
+        restored.load(path)
+
+        assert restored.get("сколько стоит интеграция") == "цена"
+
+    def test_save_replaces_file_atomically(self, tmp_path, monkeypatch):
+        """Сбой записи не портит сохранённый файл и не оставляет временных"""
+        path = tmp_path / "faq.json"
+        cache = FAQAnswerCache(version="v1")
+        cache.set("Сколько стоит интеграция?", "цена")
+        cache.save(path)
+
+        cache.set("Какие сроки разработки?", "сроки")
+        monkeypatch.setattr("app.client_bot.services.faq_cache.json.dump", lambda *args, **kwargs: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            cache.save(path)
+
+        restored = FAQAnswerCache(version="v1")
+        restored.load(path)
+        assert len(restored) == 1
+        assert [p.name for p in tmp_path.iterdir()] == ["faq.json"]
+
+    def test_changed_knowledge_base_drops_answers(self, tmp_path):
+        """После изменения базы знаний сохранённые ответы не используются"""
+        path = tmp_path / "faq.json"
+        cache = FAQAnswerCache(version=knowledge_version("база"))
+        cache.set("Сколько стоит интеграция?", "старая цена")
+        cache.save(path)
+
+        restored = FAQAnswerCache(version=knowledge_version("новая база"))
+        restored.load(path)
+
+        assert len(restored) == 0
@@ -0,0 +1,276 @@
+"""
+Тесты Habr парсера
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from app.parsers.habr_parser import HabrParser, parse_search_page
+from app.utils.rate_limiter import HostThrottle
+
+
+def make_search_page(tag: str, count: int = 3) -> str:
+    """HTML страницы поиска Habr с `count` свежими статьями"""
+    now = datetime.now(timezone.utc)
+    blocks = []
+    for i in range(count):
+        published = (now - timedelta(hours=i + 1)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        blocks.append(f"""
+        <article class="tm-articles-list__item">
+          <h2 class="tm-title"><a href="/ru/articles/{tag}-{i}/">Статья {i} про {tag}</a></h2>
+          <time datetime="{published}">сегодня</time>
+          <div class="tm-article-snippet__lead">Краткое описание статьи {i}</div>
+        </article>""")
+    return f"<html><body><div class='tm-articles-list'>{''.join(blocks)}</div></body></html>"
+
+
+def make_parser(handler, throttle=None, **kwargs) -> HabrParser:
+    """HabrParser с подменённым транспортом"""
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    kwargs.setdefault("incremental", False)
+    return HabrParser(
+        client=client,
+        throttle=throttle or HostThrottle(max_concurrency=5, min_interval=0),
+        **kwargs
+    )
+
+
+def search_handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, text=make_search_page(request.url.params["q"]))
+
+
+class TestParseArticlesByTags:
+    """Тесты парсинга по тегам"""
+
+    @pytest.mark.asyncio
+    async def test_parses_articles_for_all_tags(self):
+        """Статьи всех тегов собираются и дедуплицируются"""
+        parser = make_parser(search_handler)
+
+        articles = await parser.parse_articles_by_tags(["etl", "ozon", "etl"], max_articles_per_tag=2)
+
+        assert len(articles) == 4
+        assert articles[0]["url"] == "https://habr.com/ru/articles/etl-0/"
+        assert articles[0]["source_type"] == "habr"
+        assert articles[0]["metadata"]["description"] == "Краткое описание статьи 0"
+
+        await parser.close()
+
+    @pytest.mark.asyncio
+    async def test_tags_are_fetched_concurrently(self):
+        """Страницы тегов запрашиваются параллельно"""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def handler(request):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return search_handler(request)
+
+        parser = make_parser(handler, throttle=HostThrottle(max_concurrency=3, min_interval=0))
+
+        await parser.parse_articles_by_tags(["a", "b", "c", "d", "e"])
+
+        assert max_in_flight == 3
+        await parser.close()
+
+    @pytest.mark.asyncio
+    async def test_http_error_skips_tag(self):
+        """Ошибка одного тега не ломает остальные"""
+        def handler(request):
+            if request.url.params["q"] == "broken":
+                return httpx.Response(503)
+            return search_handler(request)
+
+        parser = make_parser(handler)
+
+        articles = await parser.parse_articles_by_tags(["broken", "ozon"], max_articles_per_tag=1)
+
+        assert [a["metadata"]["tag"] for a in articles] == ["ozon"]
+        await parser.close()
+
+
+class TestIncrementalCrawl:
+    """Тесты инкрементального краулинга"""
+
+    @pytest.mark.asyncio
+    async def test_sends_conditional_request_and_handles_304(self, tmp_path):
+        """Повторный запрос уходит с If-None-Match, ответ 304 не парсится"""
+        seen_headers = []
+
+        def handler(request):
+            seen_headers.append(request.headers.get("If-None-Match"))
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, text=make_search_page("etl"), headers={"ETag": '"v1"'})
+
+        state_file = tmp_path / "state.json"
+        parser = make_parser(handler, incremental=True, state_file=state_file)
+        first = await parser.parse_articles_by_tags(["etl"])
+        await parser.close()
+
+        # Новый экземпляр читает состояние с диска
+        parser = make_parser(handler, incremental=True, state_file=state_file)
+        second = await parser.parse_articles_by_tags(["etl"])
+        await parser.close()
+
+        assert len(first) == 3
+        assert second == []
+        assert seen_headers == [None, '"v1"']
+
+    @pytest.mark.asyncio
+    async def test_returns_only_articles_newer_than_watermark(self, tmp_path):
+        """При изменённой странице возвращаются только новые статьи"""
+        pages = [make_search_page("etl", count=2), make_search_page("etl", count=2)]
+        # Во второй выдаче появилась статья новее всех прежних
+        fresh = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        pages[1] = pages[1].replace(
+            "<div class='tm-articles-list'>",
+            "<div class='tm-articles-list'><article class='tm-articles-list__item'>"
+            "<h2 class='tm-title'><a href='/ru/articles/new/'>Новая статья</a></h2>"
+            f"<time datetime='{fresh}'>только что</time></article>"
+        )
+
+        def handler(request):
+            return httpx.Response(200, text=pages.pop(0))
+
+        parser = make_parser(handler, incremental=True, state_file=tmp_path / "state.json")
+
+        first = await parser.parse_articles_by_tags(["etl"])
+        second = await parser.parse_articles_by_tags(["etl"])
+
+        assert len(first) == 2
+        assert [a["title"] for a in second] == ["Новая статья"]
+        await parser.close()
+
+    @pytest.mark.asyncio
+    async def test_state_saved_only_on_request(self, tmp_path):
+        """С save_state=False состояние пишется только явным save_crawl_state"""
+        state_file = tmp_path / "state.json"
+        parser = make_parser(search_handler, incremental=True, state_file=state_file)
+
+        articles = await parser.parse_articles_by_tags(["etl"], save_state=False)
+        assert len(articles) == 3
+        assert not state_file.exists()
+
+        # Статьи не сохранились — повторный проход снова их вернёт
+        parser.discard_crawl_state()
+        assert len(await parser.parse_articles_by_tags(["etl"], save_state=False)) == 3
+
+        parser.save_crawl_state()
+        assert state_file.exists()
+        await parser.close()
+
+    @pytest.mark.asyncio
+    async def test_non_incremental_mode_keeps_no_state(self, tmp_path):
+        """Без инкрементального режима состояние не пишется"""
+        state_file = tmp_path / "state.json"
+        parser = make_parser(search_handler, incremental=False, state_file=state_file)
+
+        await parser.parse_articles_by_tags(["etl"])
+        articles = await parser.parse_articles_by_tags(["etl"])
+
+        assert len(articles) == 3
+        assert not state_file.exists()
+        await parser.close()
+
+
+class TestParseSearchPage:
+    """Тесты разбора HTML страницы поиска"""
+
+    def test_backends_give_same_result(self):
+        """lxml и html.parser дают одинаковый результат"""
+        html = make_search_page("etl", count=3)
+
+        with_lxml = parse_search_page(html, "etl", features="lxml")
+        with_html_parser = parse_search_page(html, "etl", features="html.parser")
+
+        assert len(with_lxml) == 3
+        assert [a["url"] for a in with_lxml] == [a["url"] for a in with_html_parser]
+
+    def test_ignores_markup_outside_articles(self):
+        """Разметка вне карточек статей не попадает в результат"""
+        html = make_search_page("etl", count=1).replace(
+            "<body>",
+            "<body><nav><h2 class='tm-title'><a href='/ru/hub/'>Навигация</a></h2></nav>"
+        )
+
+        articles = parse_search_page(html, "etl")
+
+        assert [a["title"] for a in articles] == ["Статья 0 про etl"]
+
+    def test_stops_at_already_seen_articles(self):
+        """Разбор останавливается на первой уже виденной статье"""
+        html = make_search_page("etl", count=5)
+        stop_at = datetime.now(timezone.utc) - timedelta(hours=2, minutes=30)
+
+        articles = parse_search_page(html, "etl", stop_at=stop_at)
+
+        # Статьи опубликованы 1ч, 2ч, 3ч... назад — новее отметки только две
+        assert len(articles) == 2
+
+    def test_respects_max_articles(self):
+        """Возвращается не больше max_articles статей"""
+        articles = parse_search_page(make_search_page("etl", count=5), "etl", max_articles=2)
+
+        assert len(articles) == 2
+
+    @pytest.mark.asyncio
+    async def test_parsing_runs_outside_event_loop_thread(self, monkeypatch):
+        """Парсинг выполняется в пуле, а не в потоке event loop"""
+        import threading
+        import app.parsers.habr_parser as habr_module
+
+        loop_thread = threading.get_ident()
+        parse_threads = []
+        original = habr_module.parse_search_page
+
+        def tracking_parse(*args, **kwargs):
+            parse_threads.append(threading.get_ident())
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(habr_module, "parse_search_page", tracking_parse)
+        parser = make_parser(search_handler)
+
+        await parser.parse_articles_by_tags(["etl"])
+
+        assert parse_threads and parse_threads[0] != loop_thread
+        await parser.close()
+
+
+class TestHostThrottle:
+    """Тесты вежливого ограничителя"""
+
+    @pytest.mark.asyncio
+    async def test_spaces_out_request_starts(self):
+        """Старты запросов к одному хосту разнесены на min_interval"""
+        throttle = HostThrottle(max_concurrency=5, min_interval=0.05)
+        starts = []
+
+        async def request():
+            async with throttle.slot("habr.com"):
+                starts.append(time.monotonic())
+
+        await asyncio.gather(*(request() for _ in range(3)))
+
+        gaps = [b - a for a, b in zip(starts, starts[1:])]
+        assert all(gap >= 0.045 for gap in gaps)
+
+    @pytest.mark.asyncio
+    async def test_hosts_are_independent(self):
+        """Разные хосты не ждут друг друга"""
+        throttle = HostThrottle(max_concurrency=1, min_interval=1.0)
+
+        started = time.monotonic()
+        async with throttle.slot("habr.com"):
+            pass
+        async with throttle.slot("example.com"):
+            pass
+
+        assert time.monotonic() - started < 0.1
@@ -0,0 +1,86 @@
+"""
+Тесты локального роутера вопросов FAQ
+"""
+import pytest
+import yaml
+
+from app.config import settings
+from app.client_bot.services.intent_router import IntentRouter
+
+INTENTS_PATH = settings.base_dir / settings.intent_router_file
+
+
+def fixture_examples():
+    with open(INTENTS_PATH, 'r', encoding='utf-8') as f:
+        intents = yaml.safe_load(f)['intents']
+    return [(intent, question) for intent, spec in intents.items() for question in spec.get('examples', [])]
+
+
+@pytest.fixture(scope="module")
+def router():
+    router = IntentRouter()
+    router.load(INTENTS_PATH)
+    return router
+
+
+class TestIntentRouter:
+    """Тесты классификации вопросов по темам FAQ"""
+
+    @pytest.mark.parametrize("intent, question", fixture_examples())
+    def test_fixture_examples(self, router, intent, question):
+        """Примеры из data/faq_intents.yaml попадают в свою тему"""
+        assert router.classify(question) == intent
+
+    @pytest.mark.parametrize("question", [
+        "Сколько стоит выгрузка с Wildberries и за сколько дней сделаете?",
+        "У меня 500 SKU на Ozon, как лучше настроить репрайсер?",
+        "Работаете с мегамаркетом?",
+        "Можно ли интегрировать с моей CRM Битрикс?",
+        "Есть ли гарантия?",
+    ])
+    def test_ambiguous_questions_escalate(self, router, question):
+        """Неуверенные и смешанные вопросы уходят в Claude"""
+        assert router.classify(question) is None
+
+    @pytest.mark.parametrize("question", [
+        "Сколько стоит хранение на складе Wildberries?",
+        "Какой бюджет ставить на рекламу в Ozon?",
+        "Сколько дней хранится товар на складе Ozon?",
+        "Почему у меня не готов отчёт в личном кабинете?",
+        "Как быстро растут продажи после рекламы?",
+        "Сколько стоит реклама на Ozon?",
+        "Какие сроки поставки на склад Wildberries?",
+        "Как работает алгоритм ранжирования на Ozon?",
+        "Как подключить рекламу в Ozon?",
+        "Когда Wildberries выплачивает деньги?",
+        "Какая цена хранения на Яндекс Маркете?",
+    ])
+    def test_marketplace_questions_escalate(self, router, question):
+        """Вопросы про сами маркетплейсы с одним словом темы не получают готовый ответ"""
+        assert router.classify(question) is None
+
+    def test_single_keyword_needs_second_signal(self):
+        """Одно слово темы проходит только со словом про услуги или без посторонних слов"""
+        router = IntentRouter(threshold=3, margin=1)
+        router.set_keywords({"cost": {"стоит": 2}}, anchors=["ваш*"], filler=["сколько"])
+
+        assert router.classify("Сколько стоит?") == "cost"
+        assert router.classify("Сколько стоит ваша работа?") == "cost"
+        assert router.classify("Сколько стоит склад?") is None
+
+    def test_prefix_and_exact_keywords(self):
+        """Слово со * совпадает по началу, без * — только целиком"""
+        router = IntentRouter(threshold=2, margin=1)
+        router.set_keywords({"cost": {"стоимост*": 2}, "technical": {"работает": 2}})
+
+        assert router.classify("Какова стоимость?") == "cost"
+        assert router.classify("Как это работает?") == "technical"
+        assert router.classify("Работаете с Ozon?") is None
+
+    def test_missing_file_disables_router(self, tmp_path):
+        """Без файла тем роутер ничего не классифицирует"""
+        router = IntentRouter()
+        router.load(tmp_path / "missing.yaml")
+
+        assert router.intents == []
+        assert router.classify("Сколько стоит?") is None
@@ -0,0 +1,167 @@
+"""
+Тесты ограничителей частоты запросов
+"""
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from telegram.ext import ApplicationHandlerStop
+
+from app.utils.rate_limiter import GCRALimiter, RedisGCRALimiter, TokenBucket
+
+
+class TestTokenBucket:
+    """Тесты token bucket"""
+
+    @pytest.mark.asyncio
+    async def test_burst_passes_without_waiting(self):
+        """Запросы в пределах burst проходят сразу"""
+        bucket = TokenBucket(rate=1, burst=5)
+
+        started = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+
+        assert time.monotonic() - started < 0.05
+
+    @pytest.mark.asyncio
+    async def test_waits_when_bucket_is_empty(self):
+        """После исчерпания burst запросы идут со скоростью rate"""
+        bucket = TokenBucket(rate=20, burst=1)
+
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(3)))
+
+        # 1 токен сразу + 2 по 50 мс
+        assert time.monotonic() - started >= 0.09
+
+    def test_rejects_invalid_rate(self):
+        """Нулевая скорость недопустима"""
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+
+class TestGCRALimiter:
+    """Тесты GCRA-лимитера по ключу"""
+
+    def test_allows_burst_then_rejects(self):
+        """limit запросов подряд проходят, следующий получает отказ"""
+        limiter = GCRALimiter(limit=3, period=60)
+
+        results = [limiter.check("user", now=100.0) for _ in range(4)]
+
+        assert [allowed for allowed, _ in results] == [True, True, True, False]
+        # Следующий слот освободится через period / limit
+        assert results[-1][1] == pytest.approx(20.0)
+
+    def test_recovers_over_time(self):
+        """После интервала снова можно отправить запрос"""
+        limiter = GCRALimiter(limit=3, period=60)
+        for _ in range(3):
+            limiter.check("user", now=100.0)
+
+        assert limiter.check("user", now=110.0)[0] is False
+        assert limiter.check("user", now=120.0)[0] is True
+
+    def test_keys_are_independent(self):
+        """Лимит одного пользователя не влияет на другого"""
+        limiter = GCRALimiter(limit=1, period=60)
+
+        assert limiter.check("a", now=0.0)[0] is True
+        assert limiter.check("a", now=0.0)[0] is False
+        assert limiter.check("b", now=0.0)[0] is True
+
+    def test_sweeps_expired_keys(self, monkeypatch):
+        """Устаревшие ключи удаляются, память не растёт без предела"""
+        monkeypatch.setattr(GCRALimiter, "SWEEP_THRESHOLD", 2)
+        limiter = GCRALimiter(limit=10, period=10)
+        limiter.check("a", now=0.0)
+        limiter.check("b", now=0.0)
+
+        limiter.check("c", now=100.0)
+
+        assert set(limiter._tat) == {"c"}
+
+
+class TestRedisGCRALimiter:
+    """Тесты GCRA-лимитера на Redis"""
+
+    def make_limiter(self, script):
+        client = MagicMock()
+        client.register_script.return_value = script
+        return RedisGCRALimiter(client, limit=20, period=60)
+
+    @pytest.mark.asyncio
+    async def test_passes_parameters_to_script(self):
+        """Ключ и параметры GCRA уходят в Lua-скрипт одним вызовом"""
+        script = AsyncMock(return_value=[0, b"2.5"])
+        limiter = self.make_limiter(script)
+
+        allowed, retry_after = await limiter.allow("123")
+
+        assert (allowed, retry_after) == (False, 2.5)
+        script.assert_awaited_once_with(keys=["rate_limit:123"], args=[3.0, 60.0])
+
+    @pytest.mark.asyncio
+    async def test_fails_open_when_redis_is_down(self):
+        """Недоступный Redis не блокирует пользователей"""
+        limiter = self.make_limiter(AsyncMock(side_effect=ConnectionError("refused")))
+
+        assert await limiter.allow("123") == (True, 0.0)
+
+
+class TestRateLimitHandler:
+    """Тесты обработчика ограничения частоты в клиентском боте"""
+
+    def make_update(self, callback=False):
+        update = MagicMock()
+        update.effective_user.id = 123
+        update.callback_query = AsyncMock() if callback else None
+        update.effective_message.reply_text = AsyncMock()
+        return update
+
+    @pytest.fixture
+    def limiter(self, monkeypatch):
+        limiter = GCRALimiter(limit=1, period=60)
+        monkeypatch.setattr("app.client_bot.handlers.rate_limit.get_user_rate_limiter", lambda: limiter)
+        return limiter
+
+    @pytest.mark.asyncio
+    async def test_passes_within_limit(self, limiter):
+        """В пределах лимита апдейт идёт дальше"""
+        from app.client_bot.handlers.rate_limit import rate_limit_handler
+
+        update = self.make_update()
+        await rate_limit_handler(update, MagicMock(user_data={}))
+
+        update.effective_message.reply_text.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stops_excess_updates_and_warns_once(self, limiter):
+        """Лишние апдейты останавливаются, предупреждение — одно на период"""
+        from app.client_bot.handlers.rate_limit import rate_limit_handler
+
+        context = MagicMock(user_data={})
+        update = self.make_update()
+        await rate_limit_handler(update, context)
+
+        for _ in range(2):
+            with pytest.raises(ApplicationHandlerStop):
+                await rate_limit_handler(update, context)
+
+        update.effective_message.reply_text.assert_called_once()
+        assert "Подождите" in update.effective_message.reply_text.call_args[0][0]
+
+    @pytest.mark.asyncio
+    async def test_answers_callback_query(self, limiter):
+        """Нажатие кнопки сверх лимита получает ответ на callback"""
+        from app.client_bot.handlers.rate_limit import rate_limit_handler
+
+        update = self.make_update(callback=True)
+        await rate_limit_handler(update, MagicMock(user_data={}))
+
+        with pytest.raises(ApplicationHandlerStop):
+            await rate_limit_handler(update, MagicMock(user_data={}))
+
+        update.callback_query.answer.assert_awaited_once()
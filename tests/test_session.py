@@ -0,0 +1,139 @@
+"""
+Тесты слоя подключения к БД
+"""
+import threading
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.database.crud import store_sources_bulk
+from app.database.models import Source
+from app.database.session import (
+    dispose_engines,
+    engine_options,
+    get_async_db,
+    get_db,
+    get_engine,
+    run_in_session,
+    to_async_url,
+)
+
+
+@pytest.fixture
+async def sqlite_db(tmp_path, monkeypatch):
+    """Файловая SQLite с таблицей sources вместо DATABASE_URL"""
+    await dispose_engines()
+    monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path / 'test.db'}")
+    Source.__table__.create(get_engine())
+    yield
+    await dispose_engines()
+
+
+class TestEngineOptions:
+    """Тесты параметров engine"""
+
+    @pytest.mark.parametrize("url, expected", [
+        ("postgresql://user:pass@db:5432/app", "postgresql+asyncpg://user:pass@db:5432/app"),
+        ("postgres://user:pass@db/app", "postgresql+asyncpg://user:pass@db/app"),
+        ("postgresql+psycopg2://user@db/app", "postgresql+asyncpg://user@db/app"),
+        ("sqlite:///data/app.db", "sqlite+aiosqlite:///data/app.db"),
+        ("postgresql+asyncpg://user@db/app", "postgresql+asyncpg://user@db/app"),
+    ])
+    def test_async_url(self, url, expected):
+        """Синхронный URL переводится на асинхронный драйвер"""
+        assert to_async_url(url) == expected
+
+    def test_postgres_pool_and_timeouts(self, monkeypatch):
+        """Для PostgreSQL пул, таймаут подключения и statement_timeout берутся из настроек"""
+        monkeypatch.setattr(settings, "db_pool_size", 7)
+        monkeypatch.setattr(settings, "db_connect_timeout", 3)
+        monkeypatch.setattr(settings, "db_statement_timeout_ms", 5000)
+
+        sync_options = engine_options("postgresql://user@db/app")
+        async_options = engine_options("postgresql+asyncpg://user@db/app", is_async=True)
+
+        assert sync_options['pool_size'] == 7
+        assert sync_options['pool_pre_ping'] is True
+        assert sync_options['connect_args'] == {
+            'connect_timeout': 3,
+            'options': '-c statement_timeout=5000',
+        }
+        assert async_options['connect_args'] == {
+            'timeout': 3,
+            'server_settings': {'statement_timeout': '5000'},
+        }
+
+    def test_timeouts_can_be_disabled(self, monkeypatch):
+        """Нулевые таймауты не передаются в соединение"""
+        monkeypatch.setattr(settings, "db_connect_timeout", 0)
+        monkeypatch.setattr(settings, "db_statement_timeout_ms", 0)
+
+        assert 'connect_args' not in engine_options("postgresql://user@db/app")
+
+    def test_in_memory_sqlite_shares_one_connection(self):
+        """SQLite в памяти видна из всех потоков"""
+        assert engine_options("sqlite://")['poolclass'] is StaticPool
+
+
+class TestSessions:
+    """Тесты сессий"""
+
+    @pytest.mark.asyncio
+    async def test_get_db_rolls_back_on_error(self, sqlite_db):
+        """При исключении изменения откатываются"""
+        with pytest.raises(RuntimeError):
+            with get_db() as db:
+                db.add(Source(source_type='habr', title='Черновик', url='https://example.com/1'))
+                db.flush()
+                raise RuntimeError("boom")
+
+        with get_db() as db:
+            assert db.query(Source).count() == 0
+
+    @pytest.mark.asyncio
+    async def test_async_session_sees_sync_writes(self, sqlite_db):
+        """Асинхронная сессия работает с той же базой"""
+        with get_db() as db:
+            store_sources_bulk(db, [{'title': 'Статья', 'url': 'https://example.com/1'}])
+
+        async with get_async_db() as db:
+            titles = (await db.execute(select(Source.title))).scalars().all()
+            assert (await db.execute(text("SELECT 1"))).scalar() == 1
+
+        assert titles == ['Статья']
+
+    @pytest.mark.asyncio
+    async def test_run_in_session_runs_off_event_loop(self, sqlite_db):
+        """CRUD-функция выполняется в потоке, а не в event loop"""
+        loop_thread = threading.get_ident()
+
+        def store(db, sources):
+            return threading.get_ident(), store_sources_bulk(db, sources)
+
+        thread, ids = await run_in_session(store, [{'title': 'Статья', 'url': 'https://example.com/1'}])
+
+        assert thread != loop_thread
+        assert len(ids) == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_calls_share_engine(self, tmp_path, monkeypatch):
+        """Одновременные первые вызовы get_engine из потоков создают один engine"""
+        await dispose_engines()
+        monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path / 'test.db'}")
+        barrier = threading.Barrier(8)
+        engines = []
+
+        def first_call():
+            barrier.wait()
+            engines.append(get_engine())
+
+        threads = [threading.Thread(target=first_call) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len({id(engine) for engine in engines}) == 1
+        await dispose_engines()
@@ -0,0 +1,139 @@
+"""
+Тесты CRUD операций с источниками
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from app.database.crud import get_unused_sources, mark_sources_used, source_to_dict, store_sources_bulk
+from app.database.models import Source
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Source.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def make_source(i: int, **overrides) -> dict:
+    source = {
+        'title': f'Статья {i}',
+        'content': f'Контент {i}',
+        'url': f'https://example.com/{i}',
+        'source_type': 'habr',
+        'published_at': datetime(2026, 1, 1, 12, tzinfo=timezone.utc),
+        'relevance_score': 0.8,
+        'metadata': {'tag': 'etl'},
+    }
+    source.update(overrides)
+    return source
+
+
+class TestStoreSourcesBulk:
+    """Тесты массового сохранения источников"""
+
+    def test_stores_batch_in_single_statement(self, db):
+        """50 источников сохраняются одним INSERT"""
+        statements = []
+        event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        ids = store_sources_bulk(db, [make_source(i) for i in range(50)])
+
+        assert len(ids) == 50
+        assert len([s for s in statements if s.startswith("INSERT")]) == 1
+        assert not [s for s in statements if s.startswith("SELECT")]
+        assert db.query(Source).count() == 50
+
+    def test_upsert_updates_existing_and_keeps_used_flag(self, db):
+        """Повторная загрузка обновляет источник, не сбрасывая used и оценку"""
+        [source_id] = store_sources_bulk(db, [make_source(1)])
+        db.get(Source, source_id).used = True
+        db.commit()
+
+        ids = store_sources_bulk(db, [make_source(1, title='Новый заголовок', relevance_score=None)])
+
+        source = db.get(Source, source_id)
+        db.refresh(source)
+        assert ids == [source_id]
+        assert source.title == 'Новый заголовок'
+        assert source.used is True
+        assert source.relevance_score == 0.8
+
+    def test_maps_parser_fields(self, db):
+        """ISO-даты приводятся к datetime, metadata пишется в extra_data"""
+        [source_id] = store_sources_bulk(db, [make_source(1, published_at="2026-01-02T10:00:00.000Z")])
+
+        source = db.get(Source, source_id)
+        assert source.published_at == datetime(2026, 1, 2, 10)
+        assert source.extra_data == {'tag': 'etl'}
+
+    def test_skips_duplicates_and_sources_without_url(self, db):
+        """Дубли URL внутри пачки и источники без URL не сохраняются"""
+        ids = store_sources_bulk(db, [make_source(1), make_source(1), make_source(2, url=None)])
+
+        assert len(ids) == 1
+        assert store_sources_bulk(db, []) == []
+
+
+class TestSourceWarehouse:
+    """Тесты выдачи источников со склада"""
+
+    def test_returns_unused_sources_by_relevance(self, db):
+        """Склад отдаёт неиспользованные источники, самые релевантные первыми"""
+        store_sources_bulk(db, [
+            make_source(1, relevance_score=0.75),
+            make_source(2, relevance_score=0.95),
+            make_source(3, relevance_score=0.85),
+            make_source(4, relevance_score=0.3),
+        ])
+
+        sources = get_unused_sources(db, limit=2, min_relevance=0.7)
+
+        assert [s.url for s in sources] == ["https://example.com/2", "https://example.com/3"]
+
+    def test_unscored_sources_use_default_relevance(self, db):
+        """Неоценённый источник выдаётся со складом с релевантностью по умолчанию"""
+        store_sources_bulk(db, [make_source(1, relevance_score=None), make_source(2, relevance_score=0.9)])
+
+        assert [s.url for s in get_unused_sources(db, min_relevance=0.0)] == \
+            ["https://example.com/2", "https://example.com/1"]
+        assert [s.url for s in get_unused_sources(db, min_relevance=0.5)] == \
+            ["https://example.com/2", "https://example.com/1"]
+        assert [s.url for s in get_unused_sources(db, min_relevance=0.7)] == ["https://example.com/2"]
+
+    def test_stale_sources_are_not_returned(self, db):
+        """Старый релевантный источник не обходит свежий"""
+        now = datetime.now(timezone.utc)
+        store_sources_bulk(db, [
+            make_source(1, relevance_score=0.9, published_at=now - timedelta(days=21)),
+            make_source(2, relevance_score=0.85, published_at=now - timedelta(hours=3)),
+            make_source(3, relevance_score=0.8, published_at=None),
+        ])
+
+        sources = get_unused_sources(db, min_relevance=0.7, max_age_days=7)
+
+        # Без даты публикации возраст считается от даты сбора
+        assert [s.url for s in sources] == ["https://example.com/2", "https://example.com/3"]
+
+    def test_used_sources_are_not_returned_again(self, db):
+        """Использованные источники отмечаются одним UPDATE и больше не выдаются"""
+        store_sources_bulk(db, [make_source(1), make_source(2)])
+
+        count = mark_sources_used(db, ["https://example.com/1", "https://unknown.example.com"])
+
+        assert count == 1
+        assert [s.url for s in get_unused_sources(db, min_relevance=0.0)] == ["https://example.com/2"]
+
+    def test_source_to_dict_matches_parser_format(self, db):
+        """Источник из БД возвращается в формате парсеров"""
+        store_sources_bulk(db, [make_source(1)])
+
+        [source] = [source_to_dict(row) for row in get_unused_sources(db)]
+
+        assert source['url'] == "https://example.com/1"
+        assert source['metadata'] == {'tag': 'etl'}
+        assert source['relevance_score'] == 0.8